@@ -1,11 +1,15 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, Boolean, ForeignKey, Table, Text, JSON, Date
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, Boolean, ForeignKey, Table, Text, JSON, Date, Index, func
 from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.dialects.postgresql import JSONB
 #from sqlalchemy.ext.declarative import declarative_base # Base is imported, declarative_base not directly used
 from datetime import datetime
 #import json # SQLAlchemy's JSON type handles serialization
 import json
 from .db.base import Base # Import Base from the new database.py
 
+# Columns holding Python dicts/lists are stored as binary JSONB on Postgres, plain JSON elsewhere
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
 # Association table for Outfit and WardrobeItem (many-to-many)
 outfit_item_association = Table('outfit_item_association', Base.metadata,
     Column('outfit_id', Integer, ForeignKey('outfits.id'), primary_key=True),
@@ -46,13 +50,13 @@ class WardrobeItem(Base):
     ai_dominant_colors = Column(JSON, nullable=True)
     
     # New ML-related fields
-    ai_classification = Column(JSON, nullable=True)  # Stores MobileNetV2 classification results
-    dominant_color_rgb = Column(JSON, nullable=True)  # Stores RGB values [r, g, b]
+    ai_classification = Column(JSONDocument, nullable=True)  # Stores MobileNetV2 classification results
+    dominant_color_rgb = Column(JSONDocument, nullable=True)  # Stores RGB values [r, g, b]
     dominant_color_hex = Column(String(7), nullable=True)  # Stores hex color code #RRGGBB
     dominant_color_name = Column(String(50), nullable=True)  # Stores color name (e.g., "red", "blue")
-    color_palette = Column(JSON, nullable=True)  # Stores full color palette from ColorThief
-    color_properties = Column(JSON, nullable=True)  # Stores color analysis (brightness, saturation, temperature)
-    style_features = Column(JSON, nullable=True)  # Stores extracted style features for recommendations
+    color_palette = Column(JSON, nullable=True)  # Stores full color palette from the color detector
+    color_properties = Column(JSONDocument, nullable=True)  # Stores color analysis (brightness, saturation, temperature)
+    style_features = Column(JSONDocument, nullable=True)  # Stores extracted style features for recommendations
     color = Column(String(255), nullable=True) # Field for general color description
     notes = Column(Text, nullable=True) # Field for user notes
     
@@ -67,6 +71,9 @@ class WardrobeItem(Base):
     outfits_associated = relationship("Outfit", secondary=outfit_item_association, back_populates="items")
     style_history_entries = relationship("StyleHistory", back_populates="item_worn")
 
+    # Per-user category/season lookups (weather-filtered recommendations)
+    __table_args__ = (Index("ix_wardrobeitem_user_cat_season", "user_id", "category", "season"),)
+
 
     @property
     def tags(self):
@@ -253,7 +260,7 @@ class UserStyleProfile(Base):
     style_keywords = Column(JSON, nullable=True)  # Extracted style keywords
     seasonal_preferences = Column(JSON, nullable=True)  # Seasonal style preferences
     occasion_preferences = Column(JSON, nullable=True)  # Occasion-based preferences
-    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    last_updated = Column(DateTime, server_default=func.now(), onupdate=func.now()) # Set by the database, not per update in Python
     
     user = relationship("User")
 
@@ -14,7 +14,7 @@ import asyncio # Ensure asyncio is imported
 
 # Use async versions of services
 from app.services.clothing_classifier import classify_clothing_image_async, get_clothing_classifier_async
-from app.services.color_detector import detect_dominant_color_async,get_color_detector, extract_color_palette_async, get_color_detector_async
+from app.services.color_detector import detect_dominant_color_async,get_color_detector, extract_color_palette_async, get_color_detector_async, analyze_colors_async
 from app.services.outfit_recommendation_engine import get_outfit_recommendations, get_similar_items, get_recommendation_engine # These might need async versions too
 from app.db.database import get_db
 from app.model import WardrobeItem, Outfit, User, ItemClassification, ColorAnalysis, OutfitRecommendation # Assuming these are SQLAlchemy models
@@ -87,7 +87,7 @@ async def detect_dominant_color_endpoint(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Upload a clothing item image and detect its dominant color using ColorThief.
+    Upload a clothing item image and detect its dominant color.
     
     - **Image File**: Upload the image of the clothing item.
     - **Returns**: Dominant color information (RGB, hex, name) and color properties.
@@ -361,15 +361,16 @@ async def process_and_update_item_ml_data(
             )
             db.add(new_classification)
         
-        # Detect dominant color and palette
-        color_result = detect_dominant_color(image_data)
+        # Detect dominant color and palette from a single image decode
+        color_analysis = await analyze_colors_async(image_data)
+        color_result = color_analysis["dominant"]
+        palette_result = color_analysis["palette"]
         if color_result.get("success"):
             item.dominant_color_rgb = color_result["dominant_color"]["rgb"]
             item.dominant_color_hex = color_result["dominant_color"]["hex"]
             item.dominant_color_name = color_result["dominant_color"]["name"]
             item.color_properties = color_result["properties"]
             
-            palette_result = extract_color_palette(image_data)
             if palette_result.get("success"):
                 item.color_palette = palette_result["palette"]
             
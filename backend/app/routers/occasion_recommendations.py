@@ -433,7 +433,7 @@ def _get_occasion_specific_outfits(
         compatibility_result = intelligent_matcher._calculate_item_compatibility(
             combination[0], combination[1] if len(combination) > 1 else combination[0],
             request.occasion_type.value
-        )
+        ).total
         
         # Calculate occasion appropriateness
         occasion_scores = [item.get("occasion_score", 0.5) for item in combination]
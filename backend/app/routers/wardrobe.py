@@ -17,7 +17,7 @@ from .. import tables as schemas
 from .. import model as models
 # Import async versions of services
 from ..services.ai_embedding import get_image_embedding_async, get_image_embedding # Keep sync for now if needed elsewhere
-from ..services.color_detector import get_color_detector_async, detect_dominant_color_async, extract_color_palette_async, get_color_detector # Keep sync
+from ..services.color_detector import get_color_detector_async, analyze_colors_async, get_color_detector # Keep sync
 from ..services.clothing_classifier import get_clothing_classifier_async, classify_clothing_image_async, get_clothing_classifier # Keep sync
 from ..services import user_style_profile_service # Import the new service
 from ..security import get_current_user
@@ -143,13 +143,18 @@ async def create_wardrobe_item( # Now an async function
 
             results = []
             if pil_image_for_embedding:
-                results = await asyncio.gather(
+                results = list(await asyncio.gather(
                     get_image_embedding_async(pil_image_for_embedding),
-                    detect_dominant_color_async(image_bytes_content),
-                    extract_color_palette_async(image_bytes_content),
+                    analyze_colors_async(image_bytes_content), # Dominant color + palette from one decode
                     classify_clothing_image_async(image_bytes_content),
                     return_exceptions=True # To handle individual failures
-                )
+                ))
+                # Split the combined color analysis back into the dominant color and palette slots
+                color_analysis = results[1]
+                if isinstance(color_analysis, Exception):
+                    results[1:2] = [color_analysis, color_analysis]
+                else:
+                    results[1:2] = [color_analysis["dominant"], color_analysis["palette"]]
             else: # Only run text-based or non-image dependent AI services if PIL failed
                  results = [None] * 4 # Match structure, assuming embedding, color, palette, classification failed
 
@@ -362,13 +367,17 @@ async def update_wardrobe_item( # Already async, good.
 
             ai_results = []
             if pil_image_for_embedding:
-                ai_results = await asyncio.gather(
+                ai_results = list(await asyncio.gather(
                     get_image_embedding_async(pil_image_for_embedding),
-                    detect_dominant_color_async(image_bytes_content),
-                    extract_color_palette_async(image_bytes_content),
+                    analyze_colors_async(image_bytes_content),
                     classify_clothing_image_async(image_bytes_content),
                     return_exceptions=True
-                )
+                ))
+                color_analysis = ai_results[1]
+                if isinstance(color_analysis, Exception):
+                    ai_results[1:2] = [color_analysis, color_analysis]
+                else:
+                    ai_results[1:2] = [color_analysis["dominant"], color_analysis["palette"]]
             else:
                 ai_results = [None] * 4
 
@@ -1,14 +1,19 @@
 """
-Color Detection Service using ColorThief
+Color Detection Service
 
 This module provides functionality to extract dominant colors from clothing images
-using the ColorThief library for color palette analysis.
+using Pillow's octree quantizer for color palette analysis.
 """
 
+import copy
 import io
+import os
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple, Optional
-from colorthief import ColorThief
 from PIL import Image
 import webcolors
 import numpy as np
@@ -17,9 +22,92 @@ import asyncio
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Maximum number of analysis results kept per detector, keyed by image content hash
+RESULT_CACHE_SIZE = 512
+
+# Images are downsampled to fit this size once before any color analysis
+THUMBNAIL_SIZE = (100, 100)
+
+# Lab-based color properties: brightness = L*/100, saturation = chroma/_LAB_CHROMA_SCALE,
+# and |b*| above _LAB_TEMPERATURE_THRESHOLD marks a color as warm (yellow) or cool (blue)
+_LAB_CHROMA_SCALE = 128.0
+_LAB_TEMPERATURE_THRESHOLD = 10.0
+
+# Neutral colors suggested alongside any dominant color
+NEUTRAL_COLORS = (
+    (255, 255, 255),  # white
+    (240, 240, 240),  # light gray
+    (128, 128, 128),  # medium gray
+    (64, 64, 64),     # dark gray
+    (0, 0, 0),        # black
+    (245, 245, 220),  # beige
+    (139, 69, 19)     # brown
+)
+
+# Three-level categorization: value < 0.3 -> 0, 0.3 <= value <= 0.7 -> 1, value > 0.7 -> 2
+# (use with np.searchsorted(..., side="right"))
+_LEVEL_CUTS = np.array([0.3, np.nextafter(0.7, np.inf)])
+_BRIGHTNESS_LABELS = np.array(["dark", "medium", "light"])
+_LEVEL_LABELS = np.array(["low", "medium", "high"])
+
+def _level_label(labels: np.ndarray, value):
+    """
+    Map a value (or array of values) onto one of three labels without branching.
+    """
+    return labels[np.searchsorted(_LEVEL_CUTS, value, side="right")]
+
+# sRGB (D65) -> CIE XYZ conversion matrix and reference white
+_RGB_TO_XYZ = np.array([
+    [0.412453, 0.357580, 0.180423],
+    [0.212671, 0.715160, 0.072169],
+    [0.019334, 0.119193, 0.950227],
+])
+_XYZ_WHITE_D65 = np.array([0.950456, 1.0, 1.088754])
+
+def _load_webcolor_exact_names() -> Dict[Tuple[int, int, int], str]:
+    """
+    Build an RGB -> CSS3 color name table matching webcolors.rgb_to_name.
+    
+    Returns:
+        Dictionary mapping exact RGB tuples to their CSS3 color name
+    """
+    if hasattr(webcolors, "names"):
+        css3_names = webcolors.names("css3")
+    else:  # webcolors < 24.6
+        css3_names = webcolors.CSS3_NAMES_TO_HEX.keys()
+    
+    exact_names = {}
+    for name in css3_names:
+        rgb = tuple(webcolors.name_to_rgb(name))
+        # rgb_to_name resolves aliases such as gray/grey to a single canonical name
+        exact_names[rgb] = webcolors.rgb_to_name(rgb)
+    return exact_names
+
+_WEBCOLOR_EXACT_NAMES = _load_webcolor_exact_names()
+
+def rgb_to_lab(rgb) -> np.ndarray:
+    """
+    Convert 8-bit sRGB colors to CIE Lab (D65 illuminant).
+    
+    Args:
+        rgb: RGB tuple or array-like of shape (..., 3) with values in 0-255
+        
+    Returns:
+        Float32 array of the same shape holding L*, a*, b* values
+    """
+    arr = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(arr > 0.04045, ((arr + 0.055) / 1.055) ** 2.4, arr / 12.92)
+    xyz = (linear @ _RGB_TO_XYZ.T) / _XYZ_WHITE_D65
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16.0 / 116.0)
+    lab = np.empty_like(f)
+    lab[..., 0] = 116.0 * f[..., 1] - 16.0
+    lab[..., 1] = 500.0 * (f[..., 0] - f[..., 1])
+    lab[..., 2] = 200.0 * (f[..., 1] - f[..., 2])
+    return lab.astype(np.float32)
+
 class ColorDetector:
     """
-    Color detection service using ColorThief for dominant color extraction.
+    Color detection service for dominant color extraction.
     
     This class provides methods to extract dominant colors and color palettes
     from clothing item images.
@@ -28,6 +116,64 @@ class ColorDetector:
     def __init__(self):
         """Initialize the color detector."""
         self.color_names = self._load_color_names()
+        # Named colors in CIE Lab so nearest-name lookups are a single perceptual distance pass
+        self._color_name_list = list(self.color_names.keys())
+        self._color_name_lab = rgb_to_lab(list(self.color_names.values()))
+        # The neutral suggestions never change, so resolve their hex and names once
+        self._neutrals_block = tuple(
+            {
+                "rgb": color,
+                "hex": self._rgb_to_hex(color),
+                "name": self._get_closest_color_name(color)
+            }
+            for color in NEUTRAL_COLORS
+        )
+        self._result_cache: "OrderedDict[Tuple, Dict[str, any]]" = OrderedDict()
+        self._result_cache_lock = threading.Lock()
+    
+    @staticmethod
+    def _image_digest(image_data: bytes) -> bytes:
+        """
+        Hash raw image bytes into a compact cache key.
+        
+        Args:
+            image_data: Raw image bytes
+            
+        Returns:
+            16-byte BLAKE2b digest of the image data
+        """
+        return hashlib.blake2b(image_data, digest_size=16).digest()
+    
+    def _get_cached_result(self, key: Tuple) -> Optional[Dict[str, any]]:
+        """
+        Look up a previous analysis result, marking it as recently used.
+        
+        Args:
+            key: Cache key built from the image digest and extraction parameters
+            
+        Returns:
+            Copy of the cached result dictionary, so callers can mutate it, or None on a miss
+        """
+        with self._result_cache_lock:
+            result = self._result_cache.get(key)
+            if result is not None:
+                self._result_cache.move_to_end(key)
+        return copy.deepcopy(result)
+    
+    def _store_cached_result(self, key: Tuple, result: Dict[str, any]) -> None:
+        """
+        Store an analysis result, evicting the least recently used entry when full.
+        
+        Args:
+            key: Cache key built from the image digest and extraction parameters
+            result: Successful analysis result to cache; a copy is stored, so the caller keeps ownership
+        """
+        result = copy.deepcopy(result)
+        with self._result_cache_lock:
+            self._result_cache[key] = result
+            self._result_cache.move_to_end(key)
+            if len(self._result_cache) > RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
     
     def _load_color_names(self) -> Dict[str, Tuple[int, int, int]]:
         """
@@ -94,103 +240,267 @@ class ColorDetector:
             'chocolate': (210, 105, 30)
         }
     
-    def extract_dominant_color(self, image_data: bytes, quality: int = 1) -> Dict[str, any]:
+    def _decode_image(self, image_data: bytes) -> Image.Image:
+        """
+        Decode image bytes into a small RGB thumbnail shared by all color analyses.
+        
+        Args:
+            image_data: Raw image bytes
+            
+        Returns:
+            RGB PIL image no larger than THUMBNAIL_SIZE
+        """
+        image = Image.open(io.BytesIO(image_data))
+        # thumbnail() lets the JPEG decoder downscale while decoding
+        image.thumbnail(THUMBNAIL_SIZE, Image.Resampling.BILINEAR)
+        return image.convert('RGB')
+    
+    def analyze(self, image_data: bytes, color_count: int = 5, quality: int = 1) -> Dict[str, any]:
+        """
+        Extract both the dominant color and the color palette from a single decode.
+        
+        Args:
+            image_data: Raw image bytes
+            color_count: Number of colors to extract for the palette
+            quality: Quality setting for color extraction
+            
+        Returns:
+            Dictionary with the "dominant" and "palette" results
+        """
+        digest = self._image_digest(image_data)
+        dominant = self._get_cached_result((digest, "dominant", quality))
+        palette = self._get_cached_result((digest, "palette", color_count, quality))
+        
+        if dominant is None or palette is None:
+            try:
+                image = self._decode_image(image_data)
+            except Exception as e:
+                # Let each extractor report the failure in its usual result format
+                logger.error(f"Error decoding image for color analysis: {str(e)}")
+                image = None
+            
+            if dominant is None:
+                dominant = self.extract_dominant_color(image_data, quality, image=image)
+            if palette is None:
+                palette = self.extract_color_palette(image_data, color_count, quality, image=image)
+        
+        return {
+            "dominant": dominant,
+            "palette": palette,
+            "success": dominant["success"] and palette["success"]
+        }
+    
+    def extract_dominant_color(self, image_data: bytes, quality: int = 1, image: Optional[Image.Image] = None) -> Dict[str, any]:
         """
         Extract the dominant color from an image.
         
         Args:
             image_data: Raw image bytes
-            quality: Quality setting for color extraction (1=best, 10=fastest)
+            quality: Quality setting for color extraction (kept for API compatibility;
+                images are always analyzed as a THUMBNAIL_SIZE thumbnail)
+            image: Optional thumbnail already produced by _decode_image
             
         Returns:
             Dictionary containing dominant color information
         """
+        cache_key = (self._image_digest(image_data), "dominant", quality)
+        cached = self._get_cached_result(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            # Create a BytesIO object from image data
-            image_stream = io.BytesIO(image_data)
-            
-            # Create ColorThief object
-            color_thief = ColorThief(image_stream)
+            if image is None:
+                image = self._decode_image(image_data)
             
             # Get dominant color (RGB tuple)
-            dominant_color_rgb = color_thief.get_color(quality=quality)
-            
-            # Convert to hex
-            dominant_color_hex = self._rgb_to_hex(dominant_color_rgb)
-            
-            # Get closest color name
-            color_name = self._get_closest_color_name(dominant_color_rgb)
+            result = self._build_dominant_result(self._dominant_rgbs([image])[0])
+            self._store_cached_result(cache_key, result)
+            return result
             
-            # Calculate color properties
-            color_properties = self._analyze_color_properties(dominant_color_rgb)
+        except Exception as e:
+            logger.error(f"Error extracting dominant color: {str(e)}")
+            return self._dominant_error_result(e)
+    
+    def extract_dominant_colors_batch(
+        self,
+        images_data: List[bytes],
+        quality: int = 1,
+        images: Optional[List[Optional[Image.Image]]] = None
+    ) -> List[Dict[str, any]]:
+        """
+        Extract the dominant color of several images with one histogram pass.
+        
+        Args:
+            images_data: List of raw image bytes
+            quality: Quality setting for color extraction (kept for API compatibility)
+            images: Optional thumbnails already produced by _decode_image, aligned with
+                images_data (None entries are decoded here)
             
-            result = {
-                "dominant_color": {
-                    "rgb": dominant_color_rgb,
-                    "hex": dominant_color_hex,
-                    "name": color_name
-                },
-                "properties": color_properties,
-                "success": True
-            }
+        Returns:
+            List of dominant color results in the same order as images_data
+        """
+        results: List[Optional[Dict[str, any]]] = [None] * len(images_data)
+        pending_keys, pending_indices, pending_images = [], [], []
+        
+        for index, image_data in enumerate(images_data):
+            cache_key = (self._image_digest(image_data), "dominant", quality)
+            cached = self._get_cached_result(cache_key)
+            if cached is not None:
+                results[index] = cached
+                continue
+            try:
+                image = images[index] if images is not None else None
+                if image is None:
+                    image = self._decode_image(image_data)
+            except Exception as e:
+                logger.error(f"Error extracting dominant color: {str(e)}")
+                results[index] = self._dominant_error_result(e)
+                continue
+            pending_keys.append(cache_key)
+            pending_indices.append(index)
+            pending_images.append(image)
+        
+        if pending_images:
+            for cache_key, index, rgb in zip(pending_keys, pending_indices, self._dominant_rgbs(pending_images)):
+                result = self._build_dominant_result(rgb)
+                self._store_cached_result(cache_key, result)
+                results[index] = result
+        
+        return results
+    
+    def _dominant_rgbs(self, images: List[Image.Image]) -> List[Tuple[int, int, int]]:
+        """
+        Find the dominant color of each image from a shared 4096-bin color histogram.
+        
+        Pixels are bucketed by the top 4 bits of each channel; the dominant color is
+        the mean of the pixels in each image's most populated bucket.
+        
+        Args:
+            images: RGB thumbnails produced by _decode_image
             
-            logger.info(f"Extracted dominant color: {color_name} ({dominant_color_hex})")
+        Returns:
+            List of dominant RGB tuples, one per image
+        """
+        pixels = [np.asarray(image, dtype=np.uint8).reshape(-1, 3) for image in images]
+        image_count = len(pixels)
+        stacked = np.concatenate(pixels)
+        owner = np.repeat(np.arange(image_count), [len(p) for p in pixels])
+        
+        buckets = (
+            ((stacked[:, 0] >> 4).astype(np.intp) << 8)
+            | ((stacked[:, 1] >> 4).astype(np.intp) << 4)
+            | (stacked[:, 2] >> 4)
+        )
+        keys = owner * 4096 + buckets
+        histogram = np.bincount(keys, minlength=image_count * 4096).reshape(image_count, 4096)
+        best = histogram.argmax(axis=1)
+        
+        in_best = keys == (np.arange(image_count) * 4096 + best)[owner]
+        winners = owner[in_best]
+        sums = np.stack([
+            np.bincount(winners, weights=stacked[in_best, channel], minlength=image_count)
+            for channel in range(3)
+        ], axis=1)
+        means = np.rint(sums / histogram[np.arange(image_count), best][:, None]).astype(int)
+        
+        return [tuple(rgb) for rgb in means.tolist()]
+    
+    def _build_dominant_result(self, dominant_color_rgb: Tuple[int, int, int]) -> Dict[str, any]:
+        """
+        Package a dominant color into the extract_dominant_color result format.
+        
+        Args:
+            dominant_color_rgb: Dominant RGB tuple
             
-            return result
+        Returns:
+            Dictionary containing dominant color information
+        """
+        # Convert to hex
+        dominant_color_hex = self._rgb_to_hex(dominant_color_rgb)
+        
+        # Convert to Lab once for both the name lookup and the color properties
+        lab = rgb_to_lab([dominant_color_rgb])
+        color_name = self._get_closest_color_name(dominant_color_rgb, lab[0])
+        properties, _ = self._analyze_palette([dominant_color_rgb], lab)
+        
+        logger.info(f"Extracted dominant color: {color_name} ({dominant_color_hex})")
+        
+        return {
+            "dominant_color": {
+                "rgb": dominant_color_rgb,
+                "hex": dominant_color_hex,
+                "name": color_name
+            },
+            "properties": properties[0],
+            "success": True
+        }
+    
+    def _dominant_error_result(self, error: Exception) -> Dict[str, any]:
+        """
+        Build the fallback result returned when dominant color extraction fails.
+        
+        Args:
+            error: Exception raised during extraction
             
-        except Exception as e:
-            logger.error(f"Error extracting dominant color: {str(e)}")
-            return {
-                "dominant_color": {
-                    "rgb": (128, 128, 128),
-                    "hex": "#808080",
-                    "name": "gray"
-                },
-                "properties": {
-                    "brightness": "medium",
-                    "saturation": "medium",
-                    "temperature": "neutral"
-                },
-                "success": False,
-                "error": str(e)
-            }
+        Returns:
+            Dictionary with neutral gray defaults and the error message
+        """
+        return {
+            "dominant_color": {
+                "rgb": (128, 128, 128),
+                "hex": "#808080",
+                "name": "gray"
+            },
+            "properties": {
+                "brightness": "medium",
+                "saturation": "medium",
+                "temperature": "neutral"
+            },
+            "success": False,
+            "error": str(error)
+        }
     
-    def extract_color_palette(self, image_data: bytes, color_count: int = 5, quality: int = 1) -> Dict[str, any]:
+    def extract_color_palette(self, image_data: bytes, color_count: int = 5, quality: int = 1, image: Optional[Image.Image] = None) -> Dict[str, any]:
         """
         Extract a color palette from an image.
         
         Args:
             image_data: Raw image bytes
             color_count: Number of colors to extract
-            quality: Quality setting for color extraction
+            quality: Quality setting for color extraction (kept for API compatibility;
+                images are always analyzed as a THUMBNAIL_SIZE thumbnail)
+            image: Optional thumbnail already produced by _decode_image
             
         Returns:
             Dictionary containing color palette information
         """
+        cache_key = (self._image_digest(image_data), "palette", color_count, quality)
+        cached = self._get_cached_result(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            # Create a BytesIO object from image data
-            image_stream = io.BytesIO(image_data)
-            
-            # Create ColorThief object
-            color_thief = ColorThief(image_stream)
+            if image is None:
+                image = self._decode_image(image_data)
             
             # Get color palette
-            palette_rgb = color_thief.get_palette(color_count=color_count, quality=quality)
+            palette_rgb = self._quantize_palette(image, color_count)
+            
+            # Convert to Lab once for naming, per-color properties and palette harmony
+            palette_lab = rgb_to_lab(palette_rgb).reshape(-1, 3)
+            properties, harmony_analysis = self._analyze_palette(palette_rgb, palette_lab)
             
             # Process each color in the palette
             palette = []
-            for rgb in palette_rgb:
+            for rgb, lab, color_properties in zip(palette_rgb, palette_lab, properties):
                 color_info = {
                     "rgb": rgb,
                     "hex": self._rgb_to_hex(rgb),
-                    "name": self._get_closest_color_name(rgb),
-                    "properties": self._analyze_color_properties(rgb)
+                    "name": self._get_closest_color_name(rgb, lab),
+                    "properties": color_properties
                 }
                 palette.append(color_info)
             
-            # Analyze palette harmony
-            harmony_analysis = self._analyze_color_harmony(palette_rgb)
-            
             result = {
                 "palette": palette,
                 "dominant_color": palette[0] if palette else None,
@@ -201,6 +511,7 @@ class ColorDetector:
             
             logger.info(f"Extracted color palette with {len(palette)} colors")
             
+            self._store_cached_result(cache_key, result)
             return result
             
         except Exception as e:
@@ -218,6 +529,27 @@ class ColorDetector:
                 "error": str(e)
             }
     
+    def _quantize_palette(self, image: Image.Image, color_count: int) -> List[Tuple[int, int, int]]:
+        """
+        Quantize an image with Pillow's octree quantizer and return its palette.
+        
+        Args:
+            image: RGB PIL image
+            color_count: Maximum number of colors to extract
+            
+        Returns:
+            List of RGB tuples ordered from most to least frequent
+        """
+        quantized = image.quantize(colors=color_count, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+        raw_palette = quantized.getpalette()[:3 * color_count]
+        counts = np.bincount(np.asarray(quantized).ravel(), minlength=color_count)[:color_count]
+        
+        return [
+            tuple(raw_palette[3 * index:3 * index + 3])
+            for index in np.argsort(-counts, kind='stable')
+            if counts[index] > 0
+        ]
+    
     def _rgb_to_hex(self, rgb: Tuple[int, int, int]) -> str:
         """
         Convert RGB tuple to hex string.
@@ -228,46 +560,49 @@ class ColorDetector:
         Returns:
             Hex color string
         """
-        return "#{:02x}{:02x}{:02x}".format(rgb[0], rgb[1], rgb[2])
+        # bytes.hex() formats all three channels in one C call; values must be 0-255
+        return "#" + bytes(rgb[:3]).hex()
     
-    def _get_closest_color_name(self, rgb: Tuple[int, int, int]) -> str:
+    def _get_closest_color_name(self, rgb: Tuple[int, int, int], lab: Optional[np.ndarray] = None) -> str:
         """
         Get the closest color name for an RGB value.
         
         Args:
             rgb: RGB color tuple
+            lab: Optional precomputed Lab value of rgb
             
         Returns:
             Closest color name
         """
-        try:
-            # Try to get exact match from webcolors
-            return webcolors.rgb_to_name(rgb)
-        except ValueError:
-            # Find closest color from our predefined colors
-            min_distance = float('inf')
-            closest_color = 'gray'
-            
-            for color_name, color_rgb in self.color_names.items():
-                distance = self._color_distance(rgb, color_rgb)
-                if distance < min_distance:
-                    min_distance = distance
-                    closest_color = color_name
-            
-            return closest_color
+        # Exact CSS3 names first, without webcolors' exception-driven miss path
+        exact_name = _WEBCOLOR_EXACT_NAMES.get(tuple(rgb))
+        if exact_name is not None:
+            return exact_name
+        
+        # Find the perceptually closest predefined color (squared Lab distance keeps the argmin)
+        if lab is None:
+            lab = rgb_to_lab(rgb)
+        diff = self._color_name_lab - lab
+        distances = np.einsum('ij,ij->i', diff, diff)
+        return self._color_name_list[int(distances.argmin())]
     
-    def _color_distance(self, color1: Tuple[int, int, int], color2: Tuple[int, int, int]) -> float:
+    def _color_distance(self, color1: Tuple[int, int, int], color2: Tuple[int, int, int]) -> int:
         """
-        Calculate Euclidean distance between two RGB colors.
+        Calculate the squared Euclidean distance between two RGB colors.
+        
+        The square root is skipped since callers only compare distances.
         
         Args:
             color1: First RGB color
             color2: Second RGB color
             
         Returns:
-            Distance between colors
+            Squared distance between colors
         """
-        return np.sqrt(sum((c1 - c2) ** 2 for c1, c2 in zip(color1, color2)))
+        dr = int(color1[0]) - int(color2[0])
+        dg = int(color1[1]) - int(color2[1])
+        db = int(color1[2]) - int(color2[2])
+        return dr * dr + dg * dg + db * db
     
     def _analyze_color_properties(self, rgb: Tuple[int, int, int]) -> Dict[str, str]:
         """
@@ -279,52 +614,84 @@ class ColorDetector:
         Returns:
             Dictionary of color properties
         """
-        r, g, b = rgb
+        properties, _ = self._analyze_palette([rgb])
+        return properties[0]
+    
+    def _lab_features(self, lab: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Derive brightness, saturation and warm/cool flags from Lab colors.
         
-        # Calculate brightness (perceived luminance)
-        brightness_value = (0.299 * r + 0.587 * g + 0.114 * b) / 255
-        if brightness_value < 0.3:
-            brightness = "dark"
-        elif brightness_value > 0.7:
-            brightness = "light"
-        else:
-            brightness = "medium"
+        Args:
+            lab: Array of shape (N, 3) holding L*, a*, b* values
+            
+        Returns:
+            Tuple of (brightness, saturation, warm, cool) arrays of length N
+        """
+        brightness = lab[:, 0] / 100.0
+        saturation = np.minimum(np.hypot(lab[:, 1], lab[:, 2]) / _LAB_CHROMA_SCALE, 1.0)
+        warm = lab[:, 2] > _LAB_TEMPERATURE_THRESHOLD
+        cool = lab[:, 2] < -_LAB_TEMPERATURE_THRESHOLD
+        return brightness, saturation, warm, cool
+    
+    def _analyze_palette(
+        self,
+        palette_rgb: List[Tuple[int, int, int]],
+        lab: Optional[np.ndarray] = None
+    ) -> Tuple[List[Dict[str, str]], Dict[str, str]]:
+        """
+        Analyze per-color properties and palette harmony in a single vectorized pass.
         
-        # Calculate saturation
-        max_val = max(r, g, b)
-        min_val = min(r, g, b)
-        if max_val == 0:
-            saturation_value = 0
-        else:
-            saturation_value = (max_val - min_val) / max_val
+        Args:
+            palette_rgb: List of RGB color tuples
+            lab: Optional precomputed Lab values of palette_rgb, shape (N, 3)
+            
+        Returns:
+            Tuple of (list of per-color property dicts, harmony analysis dict)
+        """
+        if not palette_rgb:
+            return [], self._analyze_color_harmony(palette_rgb)
         
-        if saturation_value < 0.3:
-            saturation = "low"
-        elif saturation_value > 0.7:
-            saturation = "high"
-        else:
-            saturation = "medium"
+        if lab is None:
+            lab = rgb_to_lab(palette_rgb)
+        brightness_values, saturation_values, warm, cool = self._lab_features(lab.reshape(-1, 3))
         
-        # Calculate color temperature (warm/cool)
-        if r > b + 20:
-            temperature = "warm"
-        elif b > r + 20:
-            temperature = "cool"
-        else:
-            temperature = "neutral"
+        brightness_labels = _level_label(_BRIGHTNESS_LABELS, brightness_values)
+        saturation_labels = _level_label(_LEVEL_LABELS, saturation_values)
+        temperature_labels = np.select([warm, cool], ["warm", "cool"], "neutral")
         
-        return {
-            "brightness": brightness,
-            "saturation": saturation,
-            "temperature": temperature
-        }
+        properties = [
+            {
+                "brightness": str(brightness),
+                "saturation": str(saturation),
+                "temperature": str(temperature)
+            }
+            for brightness, saturation, temperature in zip(brightness_labels, saturation_labels, temperature_labels)
+        ]
+        
+        harmony = self._analyze_color_harmony(
+            palette_rgb,
+            warm_count=int(warm.sum()),
+            cool_count=int(cool.sum()),
+            brightness_range=float(np.ptp(brightness_values))
+        )
+        
+        return properties, harmony
     
-    def _analyze_color_harmony(self, palette_rgb: List[Tuple[int, int, int]]) -> Dict[str, str]:
+    def _analyze_color_harmony(
+        self,
+        palette_rgb: List[Tuple[int, int, int]],
+        warm_count: Optional[int] = None,
+        cool_count: Optional[int] = None,
+        brightness_range: Optional[float] = None
+    ) -> Dict[str, str]:
         """
         Analyze color harmony in a palette.
         
         Args:
             palette_rgb: List of RGB color tuples
+            warm_count: Precomputed number of warm colors (computed if omitted)
+            cool_count: Precomputed number of cool colors (computed if omitted)
+            brightness_range: Precomputed brightness spread (computed if omitted)
             
         Returns:
             Dictionary of harmony analysis
@@ -336,17 +703,13 @@ class ColorDetector:
                 "contrast": "low"
             }
         
-        # Analyze temperature distribution
-        warm_count = 0
-        cool_count = 0
-        
-        for rgb in palette_rgb:
-            r, g, b = rgb
-            if r > b + 20:
-                warm_count += 1
-            elif b > r + 20:
-                cool_count += 1
+        if warm_count is None or cool_count is None or brightness_range is None:
+            brightness_values, _, warm, cool = self._lab_features(rgb_to_lab(palette_rgb).reshape(-1, 3))
+            warm_count = int(warm.sum())
+            cool_count = int(cool.sum())
+            brightness_range = float(np.ptp(brightness_values))
         
+        # Analyze temperature distribution
         if warm_count > cool_count * 2:
             temperature = "warm"
         elif cool_count > warm_count * 2:
@@ -355,19 +718,7 @@ class ColorDetector:
             temperature = "mixed"
         
         # Analyze contrast
-        brightness_values = []
-        for rgb in palette_rgb:
-            r, g, b = rgb
-            brightness = (0.299 * r + 0.587 * g + 0.114 * b) / 255
-            brightness_values.append(brightness)
-        
-        brightness_range = max(brightness_values) - min(brightness_values)
-        if brightness_range < 0.3:
-            contrast = "low"
-        elif brightness_range > 0.7:
-            contrast = "high"
-        else:
-            contrast = "medium"
+        contrast = str(_level_label(_LEVEL_LABELS, brightness_range))
         
         # Determine color scheme
         if len(set(palette_rgb)) == 1:
@@ -412,17 +763,6 @@ class ColorDetector:
                 new_b = max(0, min(255, b - shift // 2))
                 analogous.append((new_r, new_g, new_b))
             
-            # Generate neutral colors that work well
-            neutrals = [
-                (255, 255, 255),  # white
-                (240, 240, 240),  # light gray
-                (128, 128, 128),  # medium gray
-                (64, 64, 64),     # dark gray
-                (0, 0, 0),        # black
-                (245, 245, 220),  # beige
-                (139, 69, 19)     # brown
-            ]
-            
             suggestions = {
                 "complementary": [
                     {
@@ -439,14 +779,7 @@ class ColorDetector:
                     }
                     for color in analogous
                 ],
-                "neutrals": [
-                    {
-                        "rgb": color,
-                        "hex": self._rgb_to_hex(color),
-                        "name": self._get_closest_color_name(color)
-                    }
-                    for color in neutrals
-                ]
+                "neutrals": list(self._neutrals_block)
             }
             
             return suggestions
@@ -459,20 +792,41 @@ class ColorDetector:
                 "neutrals": []
             }
 
+# Dedicated pool for color analysis so it never queues behind other asyncio.to_thread work
+_COLOR_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="color")
+
+async def _run_in_color_executor(func, *args):
+    """
+    Run a blocking color analysis call on the dedicated color thread pool.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_COLOR_EXECUTOR, func, *args)
+
+def shutdown_color_executor() -> None:
+    """
+    Shut down the color analysis thread pool (called on application shutdown).
+    """
+    _COLOR_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+
 # Global color detector instance
 _color_detector_instance = None
-_color_detector_lock = asyncio.Lock() # For async instance creation
+_color_detector_lock: Optional[asyncio.Lock] = None # Created lazily inside the running event loop
+_color_detector_sync_lock = threading.Lock() # For sync instance creation across threads
 
 async def get_color_detector_async() -> ColorDetector:
     """
     Asynchronously get or create the global ColorDetector instance.
     """
-    global _color_detector_instance
-    if _color_detector_instance is None:
-        async with _color_detector_lock:
-            if _color_detector_instance is None: # Double check
-                # ColorDetector init is lightweight, but for consistency:
-                _color_detector_instance = await asyncio.to_thread(ColorDetector)
+    global _color_detector_instance, _color_detector_lock
+    detector = _color_detector_instance
+    if detector is not None:
+        return detector
+    if _color_detector_lock is None:
+        _color_detector_lock = asyncio.Lock()
+    async with _color_detector_lock:
+        if _color_detector_instance is None: # Double check
+            # ColorDetector init only builds small lookup tables; a thread hop costs more
+            _color_detector_instance = ColorDetector()
     return _color_detector_instance
 
 def get_color_detector() -> ColorDetector:
@@ -480,17 +834,21 @@ def get_color_detector() -> ColorDetector:
     Get or create the global color detector instance (synchronous).
     """
     global _color_detector_instance
-    if _color_detector_instance is None:
-        _color_detector_instance = ColorDetector()
+    detector = _color_detector_instance
+    if detector is not None:
+        return detector
+    with _color_detector_sync_lock:
+        if _color_detector_instance is None: # Double check
+            _color_detector_instance = ColorDetector()
     return _color_detector_instance
 
 async def detect_dominant_color_async(image_data: bytes, quality: int = 1) -> Dict[str, any]:
     """
     Asynchronously detect dominant color from image.
-    Offloads ColorThief operations to a thread pool.
+    Offloads the color analysis to the dedicated color thread pool.
     """
     detector = await get_color_detector_async()
-    return await asyncio.to_thread(detector.extract_dominant_color, image_data, quality)
+    return await _run_in_color_executor(detector.extract_dominant_color, image_data, quality)
 
 def detect_dominant_color(image_data: bytes, quality: int = 1) -> Dict[str, any]:
     """
@@ -499,13 +857,56 @@ def detect_dominant_color(image_data: bytes, quality: int = 1) -> Dict[str, any]
     detector = get_color_detector()
     return detector.extract_dominant_color(image_data, quality)
 
+def _decode_image_or_none(detector: ColorDetector, image_data: bytes) -> Optional[Image.Image]:
+    """
+    Decode an image thumbnail, returning None so the batch call reports the error.
+    """
+    try:
+        return detector._decode_image(image_data)
+    except Exception:
+        return None
+
+async def detect_dominant_colors_batch_async(images_data: List[bytes], quality: int = 1) -> List[Dict[str, any]]:
+    """
+    Asynchronously detect dominant colors for several images.
+    Decodes the images in parallel on the color thread pool, then scores them in one batch.
+    """
+    detector = await get_color_detector_async()
+    images = await asyncio.gather(*(
+        _run_in_color_executor(_decode_image_or_none, detector, image_data)
+        for image_data in images_data
+    ))
+    return await _run_in_color_executor(detector.extract_dominant_colors_batch, images_data, quality, list(images))
+
+def detect_dominant_colors_batch(images_data: List[bytes], quality: int = 1) -> List[Dict[str, any]]:
+    """
+    Convenience function to detect dominant colors for several images (synchronous).
+    """
+    detector = get_color_detector()
+    return detector.extract_dominant_colors_batch(images_data, quality)
+
+async def analyze_colors_async(image_data: bytes, color_count: int = 5, quality: int = 1) -> Dict[str, any]:
+    """
+    Asynchronously extract dominant color and palette from a single image decode.
+    Offloads the color analysis to the dedicated color thread pool.
+    """
+    detector = await get_color_detector_async()
+    return await _run_in_color_executor(detector.analyze, image_data, color_count, quality)
+
+def analyze_colors(image_data: bytes, color_count: int = 5, quality: int = 1) -> Dict[str, any]:
+    """
+    Convenience function to extract dominant color and palette from image (synchronous).
+    """
+    detector = get_color_detector()
+    return detector.analyze(image_data, color_count, quality)
+
 async def extract_color_palette_async(image_data: bytes, color_count: int = 5, quality: int = 1) -> Dict[str, any]:
     """
     Asynchronously extract color palette from image.
-    Offloads ColorThief operations to a thread pool.
+    Offloads the color analysis to the dedicated color thread pool.
     """
     detector = await get_color_detector_async()
-    return await asyncio.to_thread(detector.extract_color_palette, image_data, color_count, quality)
+    return await _run_in_color_executor(detector.extract_color_palette, image_data, color_count, quality)
 
 def extract_color_palette(image_data: bytes, color_count: int = 5, quality: int = 1) -> Dict[str, any]:
     """
@@ -6,38 +6,125 @@ based on color theory, style compatibility, occasion appropriateness, and user p
 """
 
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
-from sklearn.metrics.pairwise import cosine_similarity
-from itertools import combinations
+from typing import List, Dict, Any, Optional, Tuple, Union, Callable
+import heapq
+from functools import lru_cache
+from dataclasses import dataclass
+from collections import OrderedDict
+import hashlib
+import threading
 import colorsys
 import logging
 
 logger = logging.getLogger(__name__)
 
+def _hue_harmony_tier(hue_diff: float) -> Tuple[float, bool]:
+    """Harmony score of two saturated colors by hue difference, and whether they are complementary"""
+    # Monochromatic (same hue, different saturation/value)
+    if hue_diff < 15:
+        return 0.9, False
+    
+    # Analogous colors (adjacent on color wheel)
+    if hue_diff < 60:
+        return 0.85, False
+    
+    # Complementary colors (opposite on color wheel), scored by saturation balance
+    if 150 <= hue_diff <= 210:
+        return 0.7, True
+    
+    # Triadic colors (120 degrees apart)
+    if 100 <= hue_diff <= 140:
+        return 0.65, False
+    
+    # Split complementary
+    if 120 <= hue_diff <= 180:
+        return 0.6, False
+    
+    # Default for other combinations
+    return 0.5, False
+
+# Tier lookup by whole degree of hue difference (0-180). Every tier edge is a whole degree
+# that belongs to the tier above it, except the closed 140 degree edge of the triadic band,
+# so floor(hue_diff) picks the right entry once (140, 141) is moved to bucket 141.
+_HUE_HARMONY_LUT = np.array([_hue_harmony_tier(degree)[0] for degree in range(181)])
+_HUE_COMPLEMENTARY_LUT = np.array([_hue_harmony_tier(degree)[1] for degree in range(181)])
+_HUE_HARMONY_LUT[141] = _hue_harmony_tier(140.5)[0]
+# Plain-Python copies for the scalar kernel, where indexing a tuple and getting back a float
+# is cheaper than indexing an ndarray and unboxing a NumPy scalar
+_HUE_HARMONY_SCORES = tuple(_HUE_HARMONY_LUT.tolist())
+_HUE_COMPLEMENTARY_FLAGS = tuple(_HUE_COMPLEMENTARY_LUT.tolist())
+
+def _build_pair_table(vocabulary: List[str], score) -> Tuple[Dict[str, int], np.ndarray]:
+    """
+    Dense score(a, b) table over a vocabulary of lower-case names, for vectorized lookups.
+    
+    The extra last row/column stands for any name outside the vocabulary; its diagonal
+    holds the score of two different unknown names.
+    """
+    ids = {name: index for index, name in enumerate(vocabulary)}
+    rows = list(vocabulary) + ["\0unknown-row"]
+    columns = list(vocabulary) + ["\0unknown-column"]
+    return ids, np.array([[score(row, column) for column in columns] for row in rows])
+
+def _encode_names(ids: Dict[str, int], names: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Lower-case names as an array, plus their _build_pair_table ids (-1 outside the vocabulary)"""
+    names_lower = np.array([name.lower() for name in names], dtype=str)
+    return names_lower, np.array([ids.get(name, -1) for name in names_lower.tolist()], dtype=np.intp)
+
+def _lookup_pair_matrix(
+    table: np.ndarray, score, row_names: np.ndarray, row_ids: np.ndarray,
+    column_names: np.ndarray, column_ids: np.ndarray
+) -> np.ndarray:
+    """score(row, column) for every pair of _encode_names encoded names with one gather from their table"""
+    scores = table[row_ids[:, None], column_ids[None, :]]
+    for row in np.flatnonzero(row_ids < 0).tolist():
+        # An unknown name still pairs with itself like any other name
+        name = str(row_names[row])
+        scores[row, column_names == name] = score(name, name)
+    return scores
+
+def _lookup_pair_scores(
+    ids: Dict[str, int], table: np.ndarray, score, target: str, names_lower: np.ndarray, name_ids: np.ndarray
+) -> np.ndarray:
+    """score(target, name) for every _encode_names encoded name with one gather from its table"""
+    target_names, target_ids = _encode_names(ids, [target])
+    return _lookup_pair_matrix(table, score, target_names, target_ids, names_lower, name_ids)[0]
+
 class ColorTheory:
     """Advanced color theory implementation for clothing matching"""
     
     @staticmethod
+    @lru_cache(maxsize=4096)
     def hex_to_rgb(hex_color: str) -> Tuple[int, int, int]:
         """Convert hex color to RGB"""
         hex_color = hex_color.lstrip('#')
         if len(hex_color) != 6:
             return (128, 128, 128)
         try:
-            return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+            # Parse the triplet once and split it into bytes; int() alone would also
+            # accept signs, underscores and surrounding whitespace
+            if not hex_color.isalnum():
+                raise ValueError(hex_color)
+            value = int(hex_color, 16)
         except ValueError:
             return (128, 128, 128)
+        return (value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF
     
     @staticmethod
     def rgb_to_hsv(r: int, g: int, b: int) -> Tuple[float, float, float]:
         """Convert RGB to HSV for better color analysis"""
         return colorsys.rgb_to_hsv(r/255.0, g/255.0, b/255.0)
     
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def hex_to_hsv(hex_color: str) -> Tuple[float, float, float]:
+        """Convert hex color straight to HSV (cached, hex strings are immutable)"""
+        return ColorTheory.rgb_to_hsv(*ColorTheory.hex_to_rgb(hex_color))
+    
     @staticmethod
     def get_color_temperature(hex_color: str) -> str:
         """Determine if color is warm, cool, or neutral"""
-        r, g, b = ColorTheory.hex_to_rgb(hex_color)
-        h, s, v = ColorTheory.rgb_to_hsv(r, g, b)
+        h, s, v = ColorTheory.hex_to_hsv(hex_color)
         
         # Convert hue to degrees
         hue_degrees = h * 360
@@ -58,33 +145,110 @@ class ColorTheory:
             return 1.0
         
         # Remove duplicates
-        unique_colors = list(set(colors))
+        unique_colors = list(dict.fromkeys(colors))
         if len(unique_colors) == 1:
             return 1.0
         
-        harmony_score = 0.0
-        total_comparisons = 0
-        
-        for i, color1 in enumerate(unique_colors):
-            for color2 in unique_colors[i+1:]:
-                score = ColorTheory._calculate_pair_harmony(color1, color2)
-                harmony_score += score
-                total_comparisons += 1
+        # Mean harmony over every distinct pair (upper triangle of the pair table)
+        pair_table = ColorTheory.pair_harmony_table(unique_colors)
+        return float(pair_table[np.triu_indices(len(unique_colors), k=1)].mean())
+    
+    @staticmethod
+    def hsv_array(colors: List[str]) -> np.ndarray:
+        """Convert hex colors to an (N, 2) array of hue in degrees and saturation"""
+        hsv = np.empty((len(colors), 2))
+        for index, color in enumerate(colors):
+            h, s, _ = ColorTheory.hex_to_hsv(color)
+            hsv[index] = (h * 360, s)
+        return hsv
+    
+    @staticmethod
+    def pair_harmony_array(
+        hue1: np.ndarray, sat1: np.ndarray, hue2: np.ndarray, sat2: np.ndarray
+    ) -> np.ndarray:
+        """Vectorized _calculate_pair_harmony over broadcastable hue (degrees) / saturation arrays"""
+        abs_diff = np.abs(hue1 - hue2)
+        hue_diff = np.minimum(abs_diff, 360 - abs_diff)
+        neutral = (sat1 < 0.2) | (sat2 < 0.2)
+        saturation_balance = 1 - np.abs(sat1 - sat2)
+        
+        index = hue_diff.astype(np.intp)
+        index += (index == 140) & (hue_diff > 140)
+        scores = np.where(_HUE_COMPLEMENTARY_LUT[index], 0.7 * saturation_balance, _HUE_HARMONY_LUT[index])
+        return np.where(neutral, 0.95, scores)
+    
+    @staticmethod
+    def pair_harmony_table(colors: List[str]) -> np.ndarray:
+        """(N, N) table of _calculate_pair_harmony between every two of N hex colors"""
+        hsv = ColorTheory.hsv_array(colors)
+        return ColorTheory.pair_harmony_array(
+            hsv[:, None, 0], hsv[:, None, 1], hsv[None, :, 0], hsv[None, :, 1]
+        )
+    
+    @staticmethod
+    def batch_pair_harmony_scores(base_colors: List[str], extra_colors_list: List[List[str]]) -> np.ndarray:
+        """
+        Harmony score of base_colors + extra_colors for every entry of extra_colors_list.
         
-        return harmony_score / total_comparisons if total_comparisons > 0 else 0.0
+        Equivalent to calling calculate_color_harmony_score(base_colors + extra_colors) per
+        entry, but the pair harmonies of all entries are evaluated in a few array operations.
+        """
+        base_unique = list(dict.fromkeys(base_colors))
+        base_set = set(base_unique)
+        # Colors that each entry adds on top of the base colors (duplicates removed)
+        extras = [[c for c in dict.fromkeys(colors) if c not in base_set] for colors in extra_colors_list]
+        
+        entry_count = len(extras)
+        max_extra = max((len(e) for e in extras), default=0)
+        
+        # Wardrobes reuse the same few colors, so give each distinct color an id (base
+        # colors first) and evaluate every pair harmony exactly once
+        color_ids = {color: index for index, color in enumerate(base_unique)}
+        for colors in extras:
+            for color in colors:
+                color_ids.setdefault(color, len(color_ids))
+        pair_table = ColorTheory.pair_harmony_table(list(color_ids))
+        
+        base_count = len(base_unique)
+        base_sum = float(np.triu(pair_table[:base_count, :base_count], k=1).sum())
+        
+        pair_sums = np.full(entry_count, base_sum)
+        extra_counts = np.zeros(entry_count, dtype=int)
+        if max_extra:
+            extra_ids = np.zeros((entry_count, max_extra), dtype=np.intp)
+            mask = np.zeros((entry_count, max_extra), dtype=bool)
+            for index, colors in enumerate(extras):
+                if colors:
+                    extra_ids[index, :len(colors)] = [color_ids[color] for color in colors]
+                    mask[index, :len(colors)] = True
+            extra_counts = mask.sum(axis=1)
+            
+            # Extra x base pairs
+            if base_count:
+                cross = pair_table[extra_ids, :base_count]
+                pair_sums += (cross * mask[:, :, None]).sum(axis=(1, 2))
+            
+            # Extra x extra pairs (upper triangle only)
+            within = pair_table[extra_ids[:, :, None], extra_ids[:, None, :]]
+            pair_mask = mask[:, :, None] & mask[:, None, :] & np.triu(np.ones((max_extra, max_extra), dtype=bool), k=1)
+            pair_sums += (within * pair_mask).sum(axis=(1, 2))
+        
+        color_counts = len(base_unique) + extra_counts
+        pair_counts = color_counts * (color_counts - 1) / 2
+        return np.where(color_counts < 2, 1.0, pair_sums / np.maximum(pair_counts, 1))
     
     @staticmethod
+    @lru_cache(maxsize=16384)
     def _calculate_pair_harmony(color1: str, color2: str) -> float:
         """Calculate harmony score between two colors"""
-        r1, g1, b1 = ColorTheory.hex_to_rgb(color1)
-        r2, g2, b2 = ColorTheory.hex_to_rgb(color2)
-        
-        h1, s1, v1 = ColorTheory.rgb_to_hsv(r1, g1, b1)
-        h2, s2, v2 = ColorTheory.rgb_to_hsv(r2, g2, b2)
-        
-        # Convert to degrees
-        h1_deg, h2_deg = h1 * 360, h2 * 360
+        h1, s1, _ = ColorTheory.hex_to_hsv(color1)
+        h2, s2, _ = ColorTheory.hex_to_hsv(color2)
         
+        return ColorTheory._pair_harmony_hsv(h1 * 360, s1, h2 * 360, s2)
+    
+    @staticmethod
+    def _pair_harmony_hsv(h1_deg: float, s1: float, h2_deg: float, s2: float) -> float:
+        """Calculate harmony score between two colors given hue (degrees) and saturation"""
         # Calculate hue difference
         hue_diff = min(abs(h1_deg - h2_deg), 360 - abs(h1_deg - h2_deg))
         
@@ -92,30 +256,15 @@ class ColorTheory:
         if s1 < 0.2 or s2 < 0.2:
             return 0.95
         
-        # Monochromatic (same hue, different saturation/value)
-        if hue_diff < 15:
-            return 0.9
-        
-        # Analogous colors (adjacent on color wheel)
-        if hue_diff < 60:
-            return 0.85
+        index = int(hue_diff)
+        if index == 140 and hue_diff > 140:
+            index = 141
         
-        # Complementary colors (opposite on color wheel)
-        if 150 <= hue_diff <= 210:
-            # Complementary can work but need balance
-            saturation_balance = 1 - abs(s1 - s2)
-            return 0.7 * saturation_balance
+        # Complementary can work but need balance
+        if _HUE_COMPLEMENTARY_FLAGS[index]:
+            return 0.7 * (1 - abs(s1 - s2))
         
-        # Triadic colors (120 degrees apart)
-        if 100 <= hue_diff <= 140:
-            return 0.65
-        
-        # Split complementary
-        if 120 <= hue_diff <= 180:
-            return 0.6
-        
-        # Default for other combinations
-        return 0.5
+        return _HUE_HARMONY_SCORES[index]
 
 class StyleCompatibility:
     """Style compatibility analysis for clothing items"""
@@ -136,6 +285,13 @@ class StyleCompatibility:
         "minimalist": ["minimalist", "classic", "modern", "clean"]
     }
     
+    # Compatibility is symmetric, so both directions collapse into one unordered pair
+    COMPATIBLE_PAIRS = frozenset(
+        frozenset((style.lower(), other.lower()))
+        for style, compatible in STYLE_COMPATIBILITY.items()
+        for other in compatible
+    )
+    
     @staticmethod
     def calculate_style_compatibility(style1: str, style2: str) -> float:
         """Calculate compatibility score between two styles"""
@@ -145,16 +301,18 @@ class StyleCompatibility:
         if style1_lower == style2_lower:
             return 1.0
         
-        compatible_styles = StyleCompatibility.STYLE_COMPATIBILITY.get(style1_lower, [])
-        if style2_lower in compatible_styles:
-            return 0.8
-        
-        # Check reverse compatibility
-        compatible_styles_reverse = StyleCompatibility.STYLE_COMPATIBILITY.get(style2_lower, [])
-        if style1_lower in compatible_styles_reverse:
+        if frozenset((style1_lower, style2_lower)) in StyleCompatibility.COMPATIBLE_PAIRS:
             return 0.8
         
         return 0.3  # Low compatibility for unrelated styles
+    
+    @staticmethod
+    def style_compatibility_array(style: str, styles: List[str]) -> np.ndarray:
+        """Vectorized calculate_style_compatibility of style against every entry of styles"""
+        return _lookup_pair_scores(
+            _STYLE_IDS, _STYLE_MATRIX, StyleCompatibility.calculate_style_compatibility,
+            style, *_encode_names(_STYLE_IDS, styles)
+        )
 
 class OccasionMatcher:
     """Occasion-based clothing matching"""
@@ -197,62 +355,156 @@ class OccasionMatcher:
         }
     }
     
+    # Formality level of each style (0.0 = very casual, 1.0 = very formal)
+    STYLE_FORMALITY = {
+        "formal": 0.9,
+        "business": 0.8,
+        "elegant": 0.85,
+        "classic": 0.7,
+        "smart-casual": 0.5,
+        "casual": 0.3,
+        "sporty": 0.2,
+        "bohemian": 0.4,
+        "trendy": 0.5,
+        "artistic": 0.4,
+        "minimalist": 0.6
+    }
+    
     @staticmethod
     def calculate_occasion_score(item_style: str, occasion: str) -> float:
         """Calculate how well an item fits an occasion"""
         occasion_lower = occasion.lower()
-        item_style_lower = item_style.lower()
-        
-        if occasion_lower not in OccasionMatcher.OCCASION_STYLES:
-            return 0.5  # Neutral score for unknown occasions
-        
-        occasion_info = OccasionMatcher.OCCASION_STYLES[occasion_lower]
-        
-        # Check if style is preferred for this occasion
-        if item_style_lower in occasion_info["preferred_styles"]:
-            return 0.9
-        
-        # Check if style should be avoided
-        if item_style_lower in occasion_info["avoid_styles"]:
-            return 0.2
-        
-        # Calculate based on formality level
-        style_formality = StyleCompatibility._get_style_formality(item_style_lower)
-        occasion_formality = occasion_info["formality_level"]
-        
-        formality_diff = abs(style_formality - occasion_formality)
-        return max(0.3, 1.0 - formality_diff)
+        score = _OCCASION_STYLE_SCORES.get((occasion_lower, item_style.lower()))
+        if score is None:
+            # Unknown occasions are neutral, unknown styles get the occasion's default
+            return _OCCASION_DEFAULT_SCORES.get(occasion_lower, 0.5)
+        return score
+    
+    @staticmethod
+    def occasion_score_array(style_ids: np.ndarray, occasion: str) -> np.ndarray:
+        """Vectorized calculate_occasion_score over style table ids (as stored by build_bank)"""
+        occasion_id = _OCCASION_IDS.get(occasion.lower())
+        if occasion_id is None:
+            return np.full(len(style_ids), 0.5)  # Neutral score for unknown occasions
+        return _OCCASION_STYLE_MATRIX[occasion_id, style_ids]
     
     @staticmethod
     def _get_style_formality(style: str) -> float:
         """Get formality level of a style (0.0 = very casual, 1.0 = very formal)"""
-        formality_map = {
-            "formal": 0.9,
-            "business": 0.8,
-            "elegant": 0.85,
-            "classic": 0.7,
-            "smart-casual": 0.5,
-            "casual": 0.3,
-            "sporty": 0.2,
-            "bohemian": 0.4,
-            "trendy": 0.5,
-            "artistic": 0.4,
-            "minimalist": 0.6
-        }
-        return formality_map.get(style, 0.5)
+        return OccasionMatcher.STYLE_FORMALITY.get(style, 0.5)
+
+# Every style name the matchers know about, whether from compatibility, formality or occasions
+_STYLE_VOCABULARY = sorted(
+    {
+        name.lower()
+        for style, compatible in StyleCompatibility.STYLE_COMPATIBILITY.items()
+        for name in [style, *compatible]
+    }
+    | set(OccasionMatcher.STYLE_FORMALITY)
+    | {
+        style
+        for occasion_info in OccasionMatcher.OCCASION_STYLES.values()
+        for style in occasion_info["preferred_styles"] + occasion_info["avoid_styles"]
+    }
+)
+_STYLE_IDS, _STYLE_MATRIX = _build_pair_table(_STYLE_VOCABULARY, StyleCompatibility.calculate_style_compatibility)
+# Formality by style id; the extra last entry stands for styles outside the vocabulary
+_STYLE_FORMALITY_VECTOR = np.array([OccasionMatcher._get_style_formality(style) for style in _STYLE_VOCABULARY] + [0.5])
+
+def _build_occasion_matrix() -> Tuple[Dict[str, int], np.ndarray]:
+    """(occasions, styles + 1) table of occasion scores indexed by occasion and style id"""
+    occasion_ids = {}
+    rows = []
+    for occasion, occasion_info in OccasionMatcher.OCCASION_STYLES.items():
+        occasion_ids[occasion] = len(rows)
+        # Based on formality level, unless the style is avoided or (taking precedence) preferred
+        scores = np.maximum(0.3, 1.0 - np.abs(_STYLE_FORMALITY_VECTOR - occasion_info["formality_level"]))
+        scores[[_STYLE_IDS[style] for style in occasion_info["avoid_styles"]]] = 0.2
+        scores[[_STYLE_IDS[style] for style in occasion_info["preferred_styles"]]] = 0.9
+        rows.append(scores)
+    return occasion_ids, np.vstack(rows)
+
+_OCCASION_IDS, _OCCASION_STYLE_MATRIX = _build_occasion_matrix()
+# Plain dicts of the same table for scalar lookups by name
+_OCCASION_STYLE_SCORES = {
+    (occasion, style): scores[_STYLE_IDS[style]]
+    for occasion, scores in zip(_OCCASION_IDS, _OCCASION_STYLE_MATRIX.tolist())
+    for style in _STYLE_VOCABULARY
+}
+# Styles outside the vocabulary are neither preferred nor avoided and have the default formality
+_OCCASION_DEFAULT_SCORES = {
+    occasion: scores[-1] for occasion, scores in zip(_OCCASION_IDS, _OCCASION_STYLE_MATRIX.tolist())
+}
+
+@dataclass
+class CompatScores:
+    """Overall compatibility score of an item pair and its weighted components"""
+    total: float
+    color: float
+    style: float
+    category: float
+    occasion: float
+    preference: float
+
+@dataclass
+class ItemBank:
+    """Wardrobe items laid out column-wise (struct of arrays) for vectorized scoring"""
+    items: List[Dict[str, Any]]
+    ids: np.ndarray
+    styles: np.ndarray  # Lower-cased, "casual" when missing
+    style_ids: np.ndarray  # Rows of the style table, -1 outside its vocabulary
+    categories: np.ndarray  # Lower-cased, "" when missing
+    category_ids: np.ndarray  # Rows of the category table, -1 outside its vocabulary
+    colors: List[List[str]]
+    digest: bytes  # Fingerprint of every field that affects scoring, for result caching
+
+def _neutral_preference_score(item1: Dict[str, Any], item2: Dict[str, Any]) -> float:
+    """Preference score when no preferences apply"""
+    return 0.5
+
+def _scoring_fields(item: Dict[str, Any]) -> Tuple:
+    """The item fields that compatibility scores depend on"""
+    return item["id"], item.get("style"), item.get("category"), item.get("colors")
+
+def build_bank(items: List[Dict[str, Any]]) -> ItemBank:
+    """Build an ItemBank once so repeated matching passes skip the per-item dict lookups"""
+    ids = np.empty(len(items), dtype=object)
+    ids[:] = [item["id"] for item in items]
+    styles, style_ids = _encode_names(_STYLE_IDS, [item.get("style", "casual") for item in items])
+    categories, category_ids = _encode_names(_CATEGORY_IDS, [item.get("category", "") for item in items])
+    return ItemBank(
+        items=items,
+        ids=ids,
+        styles=styles,
+        style_ids=style_ids,
+        categories=categories,
+        category_ids=category_ids,
+        colors=[item.get("colors", []) for item in items],
+        digest=hashlib.blake2b(
+            repr([_scoring_fields(item) for item in items]).encode(), digest_size=16
+        ).digest()
+    )
 
 class IntelligentMatchingAlgorithm:
     """Main intelligent matching algorithm that combines all factors"""
     
+    # Weights for color, style, category, occasion and preference scores
+    SCORE_WEIGHTS = np.array([0.30, 0.25, 0.20, 0.15, 0.10])
+    MATCH_THRESHOLD = 0.4
+    RESULT_CACHE_SIZE = 256
+    
     def __init__(self):
         self.color_theory = ColorTheory()
         self.style_compatibility = StyleCompatibility()
         self.occasion_matcher = OccasionMatcher()
+        # Ranked (index, score, reasons) of recent find_matching_items calls
+        self._result_cache: "OrderedDict[Tuple, List[Tuple[int, float, List[str]]]]" = OrderedDict()
+        self._result_cache_lock = threading.Lock()
     
     def find_matching_items(
         self,
         target_item: Dict[str, Any],
-        wardrobe_items: List[Dict[str, Any]],
+        wardrobe_items: Union[List[Dict[str, Any]], ItemBank],
         occasion: Optional[str] = None,
         user_preferences: Optional[Dict[str, Any]] = None,
         max_suggestions: int = 5
@@ -262,7 +514,7 @@ class IntelligentMatchingAlgorithm:
         
         Args:
             target_item: The item to find matches for
-            wardrobe_items: List of available wardrobe items
+            wardrobe_items: List of available wardrobe items, or an ItemBank built from them
             occasion: Optional occasion context
             user_preferences: Optional user style preferences
             max_suggestions: Maximum number of suggestions to return
@@ -270,26 +522,225 @@ class IntelligentMatchingAlgorithm:
         Returns:
             List of matching items with compatibility scores
         """
-        matches = []
+        bank = wardrobe_items if isinstance(wardrobe_items, ItemBank) else build_bank(wardrobe_items)
+        
+        # The ranking only depends on the scoring fields, so it is cached on those and the
+        # match dicts are rebuilt from the current items (names etc. may have changed)
+        cache_key = (
+            repr(_scoring_fields(target_item)),
+            bank.digest,
+            occasion,
+            self._preference_sets(user_preferences) if user_preferences else None,
+            max_suggestions
+        )
+        ranked = self._get_cached_result(cache_key)
+        if ranked is None:
+            ranked = self._rank_matches(target_item, bank, occasion, user_preferences, max_suggestions)
+            self._store_cached_result(cache_key, ranked)
+        
+        return [
+            {**bank.items[index], "compatibility_score": score, "match_reasons": list(reasons)}
+            for index, score, reasons in ranked
+        ]
+    
+    def _get_cached_result(self, key: Tuple) -> Optional[List[Tuple[int, float, List[str]]]]:
+        """Look up a previous ranking, marking it as recently used"""
+        with self._result_cache_lock:
+            result = self._result_cache.get(key)
+            if result is not None:
+                self._result_cache.move_to_end(key)
+            return result
+    
+    def _store_cached_result(self, key: Tuple, result: List[Tuple[int, float, List[str]]]) -> None:
+        """Store a ranking, evicting the least recently used entry when full"""
+        with self._result_cache_lock:
+            self._result_cache[key] = result
+            self._result_cache.move_to_end(key)
+            if len(self._result_cache) > self.RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+    
+    def _rank_matches(
+        self,
+        target_item: Dict[str, Any],
+        bank: ItemBank,
+        occasion: Optional[str],
+        user_preferences: Optional[Dict[str, Any]],
+        max_suggestions: int
+    ) -> List[Tuple[int, float, List[str]]]:
+        """Bank index, compatibility score and match reasons of the best matches, best first"""
+        # Skip the target item itself
+        is_candidate = bank.ids != target_item["id"]
+        if not is_candidate.any():
+            return []
+        
+        compatibility_scores, component_scores = self._calculate_batch_compatibility(
+            target_item, bank, occasion, user_preferences, min_score=self.MATCH_THRESHOLD
+        )
         
-        for item in wardrobe_items:
-            if item["id"] == target_item["id"]:
-                continue  # Skip the target item itself
-            
-            compatibility_score = self._calculate_item_compatibility(
-                target_item, item, occasion, user_preferences
+        # Top matches by compatibility score (stable for ties, like a full sort); reasons
+        # are only built for the matches that are returned
+        total_scores = compatibility_scores.tolist()
+        top_indices = heapq.nlargest(
+            max_suggestions,
+            np.flatnonzero(is_candidate & (compatibility_scores > self.MATCH_THRESHOLD)).tolist(),
+            key=total_scores.__getitem__
+        )
+        
+        ranked = []
+        for index in top_indices:
+            scores = CompatScores(total_scores[index], *component_scores[:, index].tolist())
+            ranked.append((index, scores.total, self._get_match_reasons(target_item, bank.items[index], scores)))
+        return ranked
+    
+    def _calculate_batch_compatibility(
+        self,
+        target_item: Dict[str, Any],
+        bank: ItemBank,
+        occasion: Optional[str] = None,
+        user_preferences: Optional[Dict[str, Any]] = None,
+        min_score: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized _calculate_item_compatibility of target_item against every item of bank
+        
+        Returns the clipped total scores and a (5, N) array of the color, style,
+        category, occasion and preference component scores. When min_score is given,
+        color harmony is skipped for items that cannot score above it even with
+        perfect harmony; those items get a total (and color score) of 0.0.
+        """
+        item_count = len(bank.items)
+        
+        # Cheap table lookups first so the costly color harmony can be skipped
+        # 1. Category compatibility
+        category_scores = _lookup_pair_scores(
+            _CATEGORY_IDS, _CATEGORY_MATRIX, self._calculate_category_compatibility,
+            target_item.get("category", ""), bank.categories, bank.category_ids
+        )
+        
+        # 2. Style compatibility
+        target_style = target_item.get("style", "casual")
+        style_scores = _lookup_pair_scores(
+            _STYLE_IDS, _STYLE_MATRIX, self.style_compatibility.calculate_style_compatibility,
+            target_style, bank.styles, bank.style_ids
+        )
+        
+        # 3. Occasion appropriateness
+        if occasion:
+            target_occasion_score = self.occasion_matcher.calculate_occasion_score(target_style, occasion)
+            occasion_scores = (
+                target_occasion_score + self.occasion_matcher.occasion_score_array(bank.style_ids, occasion)
+            ) / 2
+        else:
+            occasion_scores = np.ones(item_count)
+        
+        # 4. User preference alignment
+        if user_preferences:
+            preference_scores = self._preference_scores_from_flags(
+                self._preference_flags([target_item], user_preferences),
+                self._preference_flags(bank.items, user_preferences)
+            )
+        else:
+            preference_scores = np.full(item_count, 0.5)
+        
+        # Weighted combination (same term order as _calculate_item_compatibility)
+        color_weight, style_weight, category_weight, occasion_weight, preference_weight = self.SCORE_WEIGHTS
+        
+        def weighted_total(color_scores):
+            return (
+                color_scores * color_weight +
+                style_scores * style_weight +
+                category_scores * category_weight +
+                occasion_scores * occasion_weight +
+                preference_scores * preference_weight
             )
-            
-            if compatibility_score > 0.4:  # Minimum threshold
-                matches.append({
-                    **item,
-                    "compatibility_score": compatibility_score,
-                    "match_reasons": self._get_match_reasons(target_item, item, compatibility_score)
-                })
         
-        # Sort by compatibility score and return top matches
-        matches.sort(key=lambda x: x["compatibility_score"], reverse=True)
-        return matches[:max_suggestions]
+        # 5. Color compatibility in one batched harmony pass, limited to items whose
+        # score with a perfect harmony of 1.0 would still clear min_score
+        if min_score is None:
+            reachable = np.ones(item_count, dtype=bool)
+        else:
+            reachable = weighted_total(1.0) > min_score
+        color_scores = np.zeros(item_count)
+        color_scores[reachable] = self.color_theory.batch_pair_harmony_scores(
+            target_item.get("colors", []),
+            [bank.colors[index] for index in np.flatnonzero(reachable)]
+        )
+        
+        total_scores = np.where(reachable, weighted_total(color_scores), 0.0)
+        component_scores = np.vstack([
+            color_scores, style_scores, category_scores, occasion_scores, preference_scores
+        ])
+        return np.clip(total_scores, 0.0, 1.0), component_scores
+    
+    def compatibility_matrix(
+        self,
+        target_items: List[Dict[str, Any]],
+        wardrobe_items: Union[List[Dict[str, Any]], ItemBank],
+        occasion: Optional[str] = None,
+        user_preferences: Optional[Dict[str, Any]] = None
+    ) -> np.ndarray:
+        """
+        Score several target items against a whole wardrobe in one pass
+        
+        Args:
+            target_items: The T items to score (e.g. every item of an outfit being planned)
+            wardrobe_items: List of N wardrobe items, or an ItemBank built from them
+            occasion: Optional occasion context
+            user_preferences: Optional user style preferences
+        
+        Returns:
+            (T, N) array where entry [t, n] equals
+            _calculate_item_compatibility(target_items[t], wardrobe item n).total.
+            Pairs of an item with itself are not excluded.
+        """
+        bank = wardrobe_items if isinstance(wardrobe_items, ItemBank) else build_bank(wardrobe_items)
+        targets = build_bank(target_items)
+        if not target_items or not bank.items:
+            return np.zeros((len(target_items), len(bank.items)))
+        
+        # 1. Color compatibility, one batched harmony pass per target
+        color_scores = np.vstack([
+            self.color_theory.batch_pair_harmony_scores(colors, bank.colors) for colors in targets.colors
+        ])
+        
+        # 2. Style compatibility
+        style_scores = _lookup_pair_matrix(
+            _STYLE_MATRIX, self.style_compatibility.calculate_style_compatibility,
+            targets.styles, targets.style_ids, bank.styles, bank.style_ids
+        )
+        
+        # 3. Category compatibility
+        category_scores = _lookup_pair_matrix(
+            _CATEGORY_MATRIX, self._calculate_category_compatibility,
+            targets.categories, targets.category_ids, bank.categories, bank.category_ids
+        )
+        
+        # 4. Occasion appropriateness
+        if occasion:
+            target_occasion_scores = self.occasion_matcher.occasion_score_array(targets.style_ids, occasion)
+            item_occasion_scores = self.occasion_matcher.occasion_score_array(bank.style_ids, occasion)
+            occasion_scores = (target_occasion_scores[:, None] + item_occasion_scores[None, :]) / 2
+        else:
+            occasion_scores = np.ones_like(style_scores)
+        
+        # 5. User preference alignment
+        if user_preferences:
+            preference_scores = self._preference_scores_from_flags(
+                [flags[:, None] for flags in self._preference_flags(targets.items, user_preferences)],
+                [flags[None, :] for flags in self._preference_flags(bank.items, user_preferences)]
+            )
+        else:
+            preference_scores = np.full(style_scores.shape, 0.5)
+        
+        # Weighted combination (same term order as _calculate_item_compatibility)
+        color_weight, style_weight, category_weight, occasion_weight, preference_weight = self.SCORE_WEIGHTS
+        total_scores = (
+            color_scores * color_weight +
+            style_scores * style_weight +
+            category_scores * category_weight +
+            occasion_scores * occasion_weight +
+            preference_scores * preference_weight
+        )
+        return np.clip(total_scores, 0.0, 1.0)
     
     def _calculate_item_compatibility(
         self,
@@ -297,7 +748,7 @@ class IntelligentMatchingAlgorithm:
         item2: Dict[str, Any],
         occasion: Optional[str] = None,
         user_preferences: Optional[Dict[str, Any]] = None
-    ) -> float:
+    ) -> CompatScores:
         """Calculate overall compatibility score between two items"""
         
         # 1. Color compatibility (30% weight)
@@ -335,29 +786,41 @@ class IntelligentMatchingAlgorithm:
             preference_score * 0.10
         )
         
-        return min(1.0, max(0.0, total_score))
+        return CompatScores(
+            total=min(1.0, max(0.0, total_score)),
+            color=color_score,
+            style=style_score,
+            category=category_score,
+            occasion=occasion_score,
+            preference=preference_score
+        )
+    
+    # Compatible category combinations
+    CATEGORY_COMPATIBILITY = {
+        ("tops", "bottoms"): 0.9,
+        ("tops", "outerwear"): 0.8,
+        ("bottoms", "shoes"): 0.8,
+        ("tops", "accessories"): 0.7,
+        ("bottoms", "accessories"): 0.7,
+        ("outerwear", "accessories"): 0.6,
+        ("shoes", "accessories"): 0.6,
+    }
+    # The same combinations keyed by unordered pair
+    CATEGORY_PAIRS = {
+        frozenset((category1.lower(), category2.lower())): score
+        for (category1, category2), score in CATEGORY_COMPATIBILITY.items()
+    }
     
-    def _calculate_category_compatibility(self, category1: str, category2: str) -> float:
+    @staticmethod
+    def _calculate_category_compatibility(category1: str, category2: str) -> float:
         """Calculate compatibility between clothing categories"""
-        
-        # Define compatible category combinations
-        compatible_combinations = {
-            ("tops", "bottoms"): 0.9,
-            ("tops", "outerwear"): 0.8,
-            ("bottoms", "shoes"): 0.8,
-            ("tops", "accessories"): 0.7,
-            ("bottoms", "accessories"): 0.7,
-            ("outerwear", "accessories"): 0.6,
-            ("shoes", "accessories"): 0.6,
-        }
-        
         cat1_lower = category1.lower()
         cat2_lower = category2.lower()
         
         # Check direct compatibility
-        combo_key = tuple(sorted([cat1_lower, cat2_lower]))
-        if combo_key in compatible_combinations:
-            return compatible_combinations[combo_key]
+        score = IntelligentMatchingAlgorithm.CATEGORY_PAIRS.get(frozenset((cat1_lower, cat2_lower)))
+        if score is not None:
+            return score
         
         # Same category items usually don't match well together
         if cat1_lower == cat2_lower:
@@ -372,69 +835,132 @@ class IntelligentMatchingAlgorithm:
         user_preferences: Optional[Dict[str, Any]]
     ) -> float:
         """Calculate score based on user preferences"""
+        return self.compile_preference_scorer(user_preferences)(item1, item2)
+    
+    @staticmethod
+    def compile_preference_scorer(
+        user_preferences: Optional[Dict[str, Any]]
+    ) -> Callable[[Dict[str, Any], Dict[str, Any]], float]:
+        """Preference scorer specialized to the preference lists that are actually set"""
         if not user_preferences:
-            return 0.5  # Neutral score
-        
-        score = 0.5
+            return _neutral_preference_score
+        return IntelligentMatchingAlgorithm._compile_preference_scorer(
+            *IntelligentMatchingAlgorithm._preference_sets(user_preferences)
+        )
+    
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _compile_preference_scorer(
+        preferred_colors: frozenset, preferred_styles: frozenset, avoided_colors: frozenset
+    ) -> Callable[[Dict[str, Any], Dict[str, Any]], float]:
+        """Build (once per distinct preferences) a scorer with only the applicable checks"""
+        adjustments = []
         
         # Check preferred colors
-        preferred_colors = user_preferences.get("preferred_colors", [])
         if preferred_colors:
-            item_colors = item1.get("colors", []) + item2.get("colors", [])
-            color_matches = sum(1 for color in item_colors if color in preferred_colors)
-            if color_matches > 0:
-                score += 0.2
+            def has_preferred_color(item1, item2):
+                return not (
+                    preferred_colors.isdisjoint(item1.get("colors", []))
+                    and preferred_colors.isdisjoint(item2.get("colors", []))
+                )
+            adjustments.append((has_preferred_color, 0.2))
         
         # Check preferred styles
-        preferred_styles = user_preferences.get("preferred_styles", [])
         if preferred_styles:
-            item_styles = [item1.get("style", ""), item2.get("style", "")]
-            style_matches = sum(1 for style in item_styles if style in preferred_styles)
-            if style_matches > 0:
-                score += 0.2
+            def has_preferred_style(item1, item2):
+                return item1.get("style", "") in preferred_styles or item2.get("style", "") in preferred_styles
+            adjustments.append((has_preferred_style, 0.2))
         
         # Check avoided items
-        avoided_colors = user_preferences.get("avoided_colors", [])
         if avoided_colors:
-            item_colors = item1.get("colors", []) + item2.get("colors", [])
-            color_conflicts = sum(1 for color in item_colors if color in avoided_colors)
-            if color_conflicts > 0:
-                score -= 0.3
-        
-        return min(1.0, max(0.0, score))
+            def has_avoided_color(item1, item2):
+                return not (
+                    avoided_colors.isdisjoint(item1.get("colors", []))
+                    and avoided_colors.isdisjoint(item2.get("colors", []))
+                )
+            adjustments.append((has_avoided_color, -0.3))
+        
+        if not adjustments:
+            return _neutral_preference_score
+        
+        def score_preferences(item1: Dict[str, Any], item2: Dict[str, Any]) -> float:
+            score = 0.5
+            for applies, adjustment in adjustments:
+                if applies(item1, item2):
+                    score += adjustment
+            return min(1.0, max(0.0, score))
+        
+        return score_preferences
+    
+    @staticmethod
+    def _preference_sets(user_preferences: Dict[str, Any]) -> Tuple[frozenset, frozenset, frozenset]:
+        """Preferred colors, preferred styles and avoided colors as sets for O(1) membership tests"""
+        return (
+            frozenset(user_preferences.get("preferred_colors", [])),
+            frozenset(user_preferences.get("preferred_styles", [])),
+            frozenset(user_preferences.get("avoided_colors", [])),
+        )
+    
+    @staticmethod
+    def _preference_flags(
+        items: List[Dict[str, Any]], user_preferences: Dict[str, Any]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Per item: whether it has a preferred color, a preferred style and an avoided color"""
+        preferred_colors, preferred_styles, avoided_colors = IntelligentMatchingAlgorithm._preference_sets(
+            user_preferences
+        )
+        return (
+            np.array([not preferred_colors.isdisjoint(item.get("colors", [])) for item in items], dtype=bool),
+            np.array([item.get("style", "") in preferred_styles for item in items], dtype=bool),
+            np.array([not avoided_colors.isdisjoint(item.get("colors", [])) for item in items], dtype=bool),
+        )
     
-    def _get_match_reasons(self, item1: Dict[str, Any], item2: Dict[str, Any], score: float) -> List[str]:
-        """Generate human-readable reasons for the match"""
+    @staticmethod
+    def _preference_scores_from_flags(flags1, flags2) -> np.ndarray:
+        """Vectorized _calculate_preference_score from broadcastable _preference_flags of the two sides"""
+        # Every preference rule asks whether either item of the pair has a property
+        has_preferred_color, has_preferred_style, has_avoided_color = (
+            side1 | side2 for side1, side2 in zip(flags1, flags2)
+        )
+        scores = np.full(np.broadcast(has_preferred_color, has_avoided_color).shape, 0.5)
+        scores = np.where(has_preferred_color, scores + 0.2, scores)
+        scores = np.where(has_preferred_style, scores + 0.2, scores)
+        scores = np.where(has_avoided_color, scores - 0.3, scores)
+        return np.clip(scores, 0.0, 1.0)
+    
+    def _get_match_reasons(self, item1: Dict[str, Any], item2: Dict[str, Any], scores: CompatScores) -> List[str]:
+        """Generate human-readable reasons for the match from its already computed scores"""
         reasons = []
         
         # Color harmony
-        colors1 = item1.get("colors", [])
-        colors2 = item2.get("colors", [])
-        if colors1 and colors2:
-            color_score = self.color_theory.calculate_color_harmony_score(colors1 + colors2)
-            if color_score > 0.7:
+        if item1.get("colors", []) and item2.get("colors", []):
+            if scores.color > 0.7:
                 reasons.append("Excellent color harmony")
-            elif color_score > 0.5:
+            elif scores.color > 0.5:
                 reasons.append("Good color compatibility")
         
         # Style compatibility
         style1 = item1.get("style", "")
         style2 = item2.get("style", "")
         if style1 and style2:
-            style_score = self.style_compatibility.calculate_style_compatibility(style1, style2)
-            if style_score > 0.8:
+            if scores.style > 0.8:
                 reasons.append(f"Perfect style match ({style1} + {style2})")
-            elif style_score > 0.6:
+            elif scores.style > 0.6:
                 reasons.append(f"Compatible styles ({style1} + {style2})")
         
         # Overall score
-        if score > 0.8:
+        if scores.total > 0.8:
             reasons.append("Highly recommended combination")
-        elif score > 0.6:
+        elif scores.total > 0.6:
             reasons.append("Good pairing option")
         
         return reasons if reasons else ["Compatible items"]
 
+_CATEGORY_IDS, _CATEGORY_MATRIX = _build_pair_table(
+    sorted({category for pair in IntelligentMatchingAlgorithm.CATEGORY_COMPATIBILITY for category in pair}),
+    IntelligentMatchingAlgorithm._calculate_category_compatibility
+)
+
 # Usage example and testing
 if __name__ == "__main__":
     # Example usage
@@ -7,17 +7,110 @@ and preferences to provide personalized clothing recommendations.
 
 import numpy as np
 import pandas as pd
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, FrozenSet
+from dataclasses import dataclass
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
 import logging
+from collections import defaultdict
 from datetime import datetime, timedelta
+import copy
+import hashlib
 import json
+import math
+import os
 
 logger = logging.getLogger(__name__)
 
+# Directory where trained models are cached by training data digest, anchored to the backend
+# directory rather than the working directory
+MODEL_CACHE_DIR = os.getenv(
+    "RECOMMENDATION_MODEL_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "tmp", "recommendation_models"),
+)
+# Most cached models kept; the least recently used ones are deleted beyond this
+MODEL_CACHE_MAX_ENTRIES = int(os.getenv("RECOMMENDATION_MODEL_CACHE_MAX_ENTRIES", "32"))
+# Bumped when the saved model layout changes so older cache files are not reused
+_MODEL_FORMAT_VERSION = 2
+
+# Item feature layout: palette color flags, style one-hot, category one-hot, normalized price
+_COLOR_PALETTE = ["#FF0000", "#00FF00", "#0000FF", "#FFFF00", "#FF00FF", "#00FFFF", "#000000", "#FFFFFF"]
+_STYLE_VOCABULARY = ["casual", "formal", "business", "sporty", "elegant", "trendy"]
+_CATEGORY_VOCABULARY = ["tops", "bottoms", "shoes", "accessories", "outerwear", "dresses"]
+_COLOR_BITS = {color: 1 << bit for bit, color in enumerate(_COLOR_PALETTE)}
+_STYLE_COLUMNS = {style: len(_COLOR_PALETTE) + column for column, style in enumerate(_STYLE_VOCABULARY)}
+_CATEGORY_COLUMNS = {
+    category: len(_COLOR_PALETTE) + len(_STYLE_VOCABULARY) + column
+    for column, category in enumerate(_CATEGORY_VOCABULARY)
+}
+_PRICE_COLUMN = len(_COLOR_PALETTE) + len(_STYLE_VOCABULARY) + len(_CATEGORY_VOCABULARY)
+_FEATURE_COUNT = _PRICE_COLUMN + 1
+# Normalized features are stored in half precision and multiplied in single precision;
+# similarities only feed a 15% score weight, so ~3 decimal digits are plenty
+_FEATURE_STORAGE_DTYPE = np.float16
+_FEATURE_COMPUTE_DTYPE = np.float32
+
+# Season of each month number; index 0 stands for an unknown month
+_SEASON_BY_MONTH = (
+    None, "winter", "winter", "spring", "spring", "spring",
+    "summer", "summer", "summer", "autumn", "autumn", "autumn", "winter",
+)
+
+# Weights of the color, style, category, occasion and similarity subscores
+_SCORE_WEIGHTS = (0.25, 0.25, 0.15, 0.20, 0.15)
+
+def _combine_subscores(subscores: np.ndarray) -> np.ndarray:
+    """Weighted sum of the (5, K) subscore rows, clipped to [0, 1]"""
+    scores = np.zeros(subscores.shape[1])
+    term = np.empty_like(scores)
+    # Accumulate one row at a time into preallocated buffers, in the weights' order
+    for row, weight in zip(subscores, _SCORE_WEIGHTS):
+        np.multiply(row, weight, out=term)
+        scores += term
+    return np.clip(scores, 0.0, 1.0, out=scores)
+
+@dataclass(frozen=True)
+class ReasonSets:
+    """Profile keys that trigger each recommendation reason"""
+    preferred_colors: FrozenSet[str]
+    preferred_styles: FrozenSet[str]
+    known_occasions: FrozenSet[str]
+    
+    @classmethod
+    def from_profile(cls, user_profile: Dict[str, Any]) -> "ReasonSets":
+        color_prefs = user_profile.get("color_preferences", {})
+        style_prefs = user_profile.get("style_preferences", {})
+        return cls(
+            preferred_colors=frozenset(color for color, value in color_prefs.items() if value > 0.1),
+            preferred_styles=frozenset(style for style, value in style_prefs.items() if value > 0.2),
+            known_occasions=frozenset(user_profile.get("occasion_patterns", {})),
+        )
+
+@dataclass
+class PriceStats:
+    """Single-pass price statistics (Welford's running mean and variance)"""
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    
+    def add(self, price: float):
+        self.count += 1
+        delta = price - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (price - self.mean)
+        if self.min_price is None or price < self.min_price:
+            self.min_price = price
+        if self.max_price is None or price > self.max_price:
+            self.max_price = price
+    
+    @property
+    def std(self) -> float:
+        """Population standard deviation"""
+        return math.sqrt(self.m2 / self.count) if self.count else 0.0
+
 class UserBehaviorAnalyzer:
     """Analyzes user behavior patterns to understand preferences"""
     
@@ -25,210 +118,156 @@ class UserBehaviorAnalyzer:
         self.scaler = StandardScaler()
         self.kmeans = KMeans(n_clusters=5, random_state=42)
         self.tfidf_vectorizer = TfidfVectorizer(max_features=100, stop_words='english')
+        # user_id -> (digest of the analyzed user data, preferences)
+        self._preference_cache: Dict[str, Tuple[str, Dict[str, Any]]] = {}
     
     def analyze_user_preferences(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Analyze user behavior to extract preferences
         
+        Results are memoized per user until their data changes; callers must not
+        mutate the returned dictionary.
+        
         Args:
             user_data: Dictionary containing user's wardrobe, outfits, and interaction history
         
         Returns:
             Dictionary with analyzed preferences
         """
-        preferences = {
-            "color_preferences": self._analyze_color_preferences(user_data),
-            "style_preferences": self._analyze_style_preferences(user_data),
-            "category_preferences": self._analyze_category_preferences(user_data),
-            "occasion_patterns": self._analyze_occasion_patterns(user_data),
-            "seasonal_preferences": self._analyze_seasonal_preferences(user_data),
-            "brand_preferences": self._analyze_brand_preferences(user_data),
-            "price_sensitivity": self._analyze_price_sensitivity(user_data)
-        }
+        user_id = user_data.get("user_id")
+        if user_id is None:
+            return self._compute_user_preferences(user_data)
+        
+        digest = self._user_data_digest(user_data)
+        cached = self._preference_cache.get(user_id)
+        if cached is not None and cached[0] == digest:
+            return cached[1]
         
+        preferences = self._compute_user_preferences(user_data)
+        self._preference_cache[user_id] = (digest, preferences)
         return preferences
     
-    def _analyze_color_preferences(self, user_data: Dict[str, Any]) -> Dict[str, float]:
-        """Analyze user's color preferences based on wardrobe and outfit history"""
-        color_counts = {}
-        total_items = 0
-        
-        # Analyze wardrobe items
-        wardrobe_items = user_data.get("wardrobe_items", [])
-        for item in wardrobe_items:
-            colors = item.get("colors", [])
-            for color in colors:
-                color_counts[color] = color_counts.get(color, 0) + 1
-                total_items += 1
-        
-        # Analyze outfit history (items used more frequently get higher weight)
-        outfit_history = user_data.get("outfit_history", [])
-        for outfit in outfit_history:
-            items = outfit.get("items", [])
-            for item in items:
-                colors = item.get("colors", [])
-                for color in colors:
-                    # Weight by frequency of use
-                    color_counts[color] = color_counts.get(color, 0) + 2
-                    total_items += 2
-        
-        # Convert to preferences (normalized scores)
-        if total_items > 0:
-            color_preferences = {color: count / total_items for color, count in color_counts.items()}
-        else:
-            color_preferences = {}
-        
-        return color_preferences
+    def invalidate(self, user_id: str):
+        """Drop the memoized preferences of a user"""
+        self._preference_cache.pop(user_id, None)
     
-    def _analyze_style_preferences(self, user_data: Dict[str, Any]) -> Dict[str, float]:
-        """Analyze user's style preferences"""
-        style_counts = {}
-        total_items = 0
-        
-        # Analyze wardrobe items
-        wardrobe_items = user_data.get("wardrobe_items", [])
-        for item in wardrobe_items:
-            style = item.get("style", "casual")
-            style_counts[style] = style_counts.get(style, 0) + 1
-            total_items += 1
-        
-        # Analyze outfit history with higher weight
-        outfit_history = user_data.get("outfit_history", [])
-        for outfit in outfit_history:
-            items = outfit.get("items", [])
-            for item in items:
-                style = item.get("style", "casual")
-                style_counts[style] = style_counts.get(style, 0) + 3
-                total_items += 3
-        
-        # Normalize
-        if total_items > 0:
-            style_preferences = {style: count / total_items for style, count in style_counts.items()}
-        else:
-            style_preferences = {}
-        
-        return style_preferences
+    @staticmethod
+    def _user_data_digest(user_data: Dict[str, Any]) -> str:
+        payload = json.dumps(user_data, sort_keys=True, default=str)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
     
-    def _analyze_category_preferences(self, user_data: Dict[str, Any]) -> Dict[str, float]:
-        """Analyze user's category preferences"""
-        category_counts = {}
-        total_items = 0
+    def _compute_user_preferences(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Analyze all preferences in one pass over the wardrobe and one over the outfit history"""
+        # Keys are gathered per source and counted at the end with one bincount each
+        wardrobe_colors = []
+        wardrobe_styles = []
+        wardrobe_categories = []
+        wardrobe_brands = []
+        history_colors = []
+        history_styles = []
+        price_stats = PriceStats()
+        occasion_patterns = {}
+        seasonal_patterns = {season: defaultdict(int) for season in ("spring", "summer", "autumn", "winter")}
         
         wardrobe_items = user_data.get("wardrobe_items", [])
         for item in wardrobe_items:
-            category = item.get("category", "unknown")
-            category_counts[category] = category_counts.get(category, 0) + 1
-            total_items += 1
-        
-        if total_items > 0:
-            category_preferences = {cat: count / total_items for cat, count in category_counts.items()}
-        else:
-            category_preferences = {}
-        
-        return category_preferences
-    
-    def _analyze_occasion_patterns(self, user_data: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
-        """Analyze patterns for different occasions"""
-        occasion_patterns = {}
+            wardrobe_colors.extend(item.get("colors", []))
+            wardrobe_styles.append(item.get("style", "casual"))
+            wardrobe_categories.append(item.get("category", "unknown"))
+            
+            brand = item.get("brand", "unknown")
+            if brand and brand != "unknown":
+                wardrobe_brands.append(brand)
+            
+            price = item.get("price", 0)
+            if price > 0:
+                price_stats.add(price)
         
+        # Outfit history: items used more frequently get higher weight
         outfit_history = user_data.get("outfit_history", [])
-        for outfit in outfit_history:
+        outfit_seasons = self._get_outfit_seasons(outfit_history)
+        for outfit, season in zip(outfit_history, outfit_seasons):
             occasion = outfit.get("occasion", "casual")
             if occasion not in occasion_patterns:
-                occasion_patterns[occasion] = {"styles": {}, "colors": {}, "categories": {}}
+                occasion_patterns[occasion] = {
+                    "styles": defaultdict(int), "colors": defaultdict(int), "categories": defaultdict(int)
+                }
+            patterns = occasion_patterns[occasion]
+            style_counts = patterns["styles"]
+            color_counts = patterns["colors"]
+            category_counts = patterns["categories"]
+            season_counts = seasonal_patterns[season] if season else None
             
-            items = outfit.get("items", [])
-            for item in items:
-                # Track styles for this occasion
+            for item in outfit.get("items", []):
                 style = item.get("style", "casual")
-                occasion_patterns[occasion]["styles"][style] = \
-                    occasion_patterns[occasion]["styles"].get(style, 0) + 1
+                history_styles.append(style)
+                style_counts[style] += 1
                 
-                # Track colors for this occasion
                 colors = item.get("colors", [])
+                history_colors.extend(colors)
                 for color in colors:
-                    occasion_patterns[occasion]["colors"][color] = \
-                        occasion_patterns[occasion]["colors"].get(color, 0) + 1
+                    color_counts[color] += 1
                 
-                # Track categories for this occasion
                 category = item.get("category", "unknown")
-                occasion_patterns[occasion]["categories"][category] = \
-                    occasion_patterns[occasion]["categories"].get(category, 0) + 1
+                category_counts[category] += 1
+                if season_counts is not None:
+                    season_counts[category] += 1
         
-        # Normalize each occasion's patterns
-        for occasion, patterns in occasion_patterns.items():
+        # Normalize each occasion's and season's counts
+        for patterns in occasion_patterns.values():
             for pattern_type, counts in patterns.items():
-                total = sum(counts.values())
-                if total > 0:
-                    occasion_patterns[occasion][pattern_type] = \
-                        {item: count / total for item, count in counts.items()}
-        
-        return occasion_patterns
-    
-    def _analyze_seasonal_preferences(self, user_data: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
-        """Analyze seasonal preferences"""
-        seasonal_patterns = {"spring": {}, "summer": {}, "autumn": {}, "winter": {}}
-        
-        outfit_history = user_data.get("outfit_history", [])
-        for outfit in outfit_history:
-            date_str = outfit.get("date", "")
-            if not date_str:
-                continue
-            
-            try:
-                date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                season = self._get_season(date)
-                
-                items = outfit.get("items", [])
-                for item in items:
-                    category = item.get("category", "unknown")
-                    seasonal_patterns[season][category] = \
-                        seasonal_patterns[season].get(category, 0) + 1
-            except:
-                continue
-        
-        # Normalize
+                patterns[pattern_type] = self._normalize_counts(counts, sum(counts.values()))
         for season, categories in seasonal_patterns.items():
-            total = sum(categories.values())
-            if total > 0:
-                seasonal_patterns[season] = {cat: count / total for cat, count in categories.items()}
+            seasonal_patterns[season] = self._normalize_counts(categories, sum(categories.values()))
         
-        return seasonal_patterns
+        return {
+            "color_preferences": self._weighted_shares((wardrobe_colors, 1), (history_colors, 2)),
+            "style_preferences": self._weighted_shares((wardrobe_styles, 1), (history_styles, 3)),
+            "category_preferences": self._weighted_shares((wardrobe_categories, 1)),
+            "occasion_patterns": occasion_patterns,
+            "seasonal_preferences": seasonal_patterns,
+            "brand_preferences": self._weighted_shares((wardrobe_brands, 1)),
+            "price_sensitivity": self._price_sensitivity(price_stats)
+        }
     
-    def _analyze_brand_preferences(self, user_data: Dict[str, Any]) -> Dict[str, float]:
-        """Analyze brand preferences"""
-        brand_counts = {}
-        total_items = 0
-        
-        wardrobe_items = user_data.get("wardrobe_items", [])
-        for item in wardrobe_items:
-            brand = item.get("brand", "unknown")
-            if brand and brand != "unknown":
-                brand_counts[brand] = brand_counts.get(brand, 0) + 1
-                total_items += 1
-        
-        if total_items > 0:
-            brand_preferences = {brand: count / total_items for brand, count in brand_counts.items()}
-        else:
-            brand_preferences = {}
-        
-        return brand_preferences
+    @staticmethod
+    def _weighted_shares(*groups: Tuple[List[str], int]) -> Dict[str, float]:
+        """Share of the total weight held by each key, where every key in a group counts with the group's weight"""
+        # Intern keys to small ints in first-seen order so the counting is one bincount
+        vocabulary = {}
+        codes = [vocabulary.setdefault(key, len(vocabulary)) for keys, _ in groups for key in keys]
+        if not codes:
+            return {}
+        
+        weights = np.repeat([weight for _, weight in groups], [len(keys) for keys, _ in groups])
+        counts = np.bincount(codes, weights=weights, minlength=len(vocabulary))
+        return dict(zip(vocabulary, (counts / counts.sum()).tolist()))
     
-    def _analyze_price_sensitivity(self, user_data: Dict[str, Any]) -> Dict[str, float]:
-        """Analyze user's price sensitivity"""
-        prices = []
-        
-        wardrobe_items = user_data.get("wardrobe_items", [])
-        for item in wardrobe_items:
-            price = item.get("price", 0)
-            if price > 0:
-                prices.append(price)
-        
-        if not prices:
+    @staticmethod
+    def _normalize_counts(counts: Dict[str, float], total: float) -> Dict[str, float]:
+        """Turn counts into shares of the total"""
+        if total > 0:
+            return {key: count / total for key, count in counts.items()}
+        return {}
+    
+    @staticmethod
+    def _get_outfit_seasons(outfit_history: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """Season each outfit was worn in, or None when its date is missing or invalid"""
+        # Parse only the calendar date so the month is the one written in the
+        # timestamp, whatever its UTC offset
+        dates = [outfit.get("date", "") for outfit in outfit_history]
+        date_parts = pd.Series([date[:10] if isinstance(date, str) else "" for date in dates], dtype=object)
+        months = pd.to_datetime(date_parts, format="%Y-%m-%d", errors="coerce").dt.month
+        return [_SEASON_BY_MONTH[month] for month in months.fillna(0).astype(int)]
+    
+    @staticmethod
+    def _price_sensitivity(price_stats: PriceStats) -> Dict[str, float]:
+        """Summarize user's price sensitivity from their item price statistics"""
+        if not price_stats.count:
             return {"average_price": 0, "price_range": "unknown", "sensitivity": "medium"}
         
-        avg_price = np.mean(prices)
-        price_std = np.std(prices)
+        avg_price = price_stats.mean
+        price_std = price_stats.std
         
         # Categorize price sensitivity
         if avg_price < 50:
@@ -242,29 +281,32 @@ class UserBehaviorAnalyzer:
             "average_price": avg_price,
             "price_std": price_std,
             "sensitivity": sensitivity,
-            "min_price": min(prices),
-            "max_price": max(prices)
+            "min_price": price_stats.min_price,
+            "max_price": price_stats.max_price
         }
     
     def _get_season(self, date: datetime) -> str:
         """Determine season from date"""
-        month = date.month
-        if month in [12, 1, 2]:
-            return "winter"
-        elif month in [3, 4, 5]:
-            return "spring"
-        elif month in [6, 7, 8]:
-            return "summer"
-        else:
-            return "autumn"
+        return _SEASON_BY_MONTH[date.month]
 
 class PersonalizedRecommendationModel:
     """ML model for personalized recommendations"""
     
-    def __init__(self):
+    def __init__(self, cache_dir: Optional[str] = MODEL_CACHE_DIR):
+        """
+        Args:
+            cache_dir: Directory for trained models keyed by their training data;
+                None disables the cache
+        """
+        self.cache_dir = cache_dir
         self.behavior_analyzer = UserBehaviorAnalyzer()
-        self.item_similarity_matrix = None
+        # L2-normalized item feature rows (float16); cosine similarity is the dot product of two rows
+        self.item_features_norm = None
+        self.item_ids = []
+        self.item_id_to_idx = {}
         self.user_profiles = {}
+        # user_id -> (profile the sets were built from, reason sets)
+        self._reason_sets: Dict[str, Tuple[Dict[str, Any], ReasonSets]] = {}
         self.item_features = None
         self.is_trained = False
     
@@ -275,6 +317,15 @@ class PersonalizedRecommendationModel:
         Args:
             training_data: List of user data dictionaries
         """
+        # Only a fresh model is fully determined by training_data, so only it can use the cache
+        cache_path = self._training_cache_path(training_data) if not self.user_profiles else None
+        if cache_path and os.path.exists(cache_path):
+            self.load_model(cache_path)
+            if self.is_trained:
+                logger.info(f"Loaded trained model from cache {cache_path}")
+                self._touch_cache_entry(cache_path)
+                return
+        
         logger.info("Training personalized recommendation model...")
         
         # Extract user profiles
@@ -293,52 +344,108 @@ class PersonalizedRecommendationModel:
         
         self.is_trained = True
         logger.info(f"Model trained with {len(self.user_profiles)} user profiles and {len(all_items)} items")
+        
+        if cache_path:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self.save_model(cache_path)
+                self._prune_cache()
+            except (OSError, TypeError, ValueError) as e:
+                logger.warning(f"Could not cache trained model: {e}")
+    
+    def _training_cache_path(self, training_data: List[Dict[str, Any]]) -> Optional[str]:
+        """Cache file of a model trained on training_data, or None when caching is disabled"""
+        if not self.cache_dir:
+            return None
+        payload = json.dumps(training_data, sort_keys=True, default=str)
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"v{_MODEL_FORMAT_VERSION}-{digest}.npz")
+    
+    def _touch_cache_entry(self, cache_path: str):
+        """Mark a cached model as recently used so pruning keeps it"""
+        for path in (cache_path, self._sidecar_path(cache_path)):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+    
+    def _prune_cache(self):
+        """Delete the least recently used cached models beyond MODEL_CACHE_MAX_ENTRIES"""
+        try:
+            entries = [
+                entry for entry in os.scandir(self.cache_dir)
+                if entry.is_file() and self._is_npz_path(entry.name)
+            ]
+        except OSError as e:
+            logger.warning(f"Could not list model cache: {e}")
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in entries[MODEL_CACHE_MAX_ENTRIES:]:
+            for path in (entry.path, self._sidecar_path(entry.path)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
     
     def _build_item_similarity_matrix(self, items: List[Dict[str, Any]]):
-        """Build item-to-item similarity matrix"""
-        # Create feature vectors for items
-        item_features = []
-        item_ids = []
-        
-        for item in items:
-            features = self._extract_item_features(item)
-            item_features.append(features)
-            item_ids.append(item.get("id", ""))
-        
-        if item_features:
-            # Convert to numpy array and calculate similarity
-            feature_matrix = np.array(item_features)
-            self.item_similarity_matrix = cosine_similarity(feature_matrix)
-            self.item_ids = item_ids
+        """Build the normalized item features that item-to-item similarities are computed from"""
+        if items:
+            feature_matrix = self._build_feature_matrix(items)
+            # Only individual similarities are ever read, so store the O(N * D) normalized
+            # rows instead of the O(N^2) similarity matrix
+            norms = np.linalg.norm(feature_matrix, axis=1, keepdims=True)
+            self.item_features_norm = (feature_matrix / np.maximum(norms, 1e-12)).astype(_FEATURE_STORAGE_DTYPE)
+            self._set_item_ids([item.get("id", "") for item in items])
+    
+    def _set_item_ids(self, item_ids: List[str]):
+        """Store the feature row ids along with their id -> row index lookup"""
+        self.item_ids = item_ids
+        self.item_id_to_idx = {}
+        for idx, item_id in enumerate(item_ids):
+            # Keep the first row of a repeated id, as list.index did
+            self.item_id_to_idx.setdefault(item_id, idx)
+    
+    @staticmethod
+    def _build_color_masks(items: List[Dict[str, Any]]) -> np.ndarray:
+        """Bitmask of the palette colors present in each item, bit i for _COLOR_PALETTE[i]"""
+        masks = np.zeros(len(items), dtype=np.uint8)
+        for row, item in enumerate(items):
+            mask = 0
+            for color in item.get("colors", []):
+                mask |= _COLOR_BITS.get(color, 0)
+            masks[row] = mask
+        return masks
+    
+    @staticmethod
+    def _build_feature_matrix(items: List[Dict[str, Any]]) -> np.ndarray:
+        """Extract the (len(items), 21) numerical feature matrix of items"""
+        rows = []
+        columns = []
+        prices = []
+        for row, item in enumerate(items):
+            # Style and category features (one-hot encoding)
+            for column in (
+                _STYLE_COLUMNS.get(item.get("style", "casual")),
+                _CATEGORY_COLUMNS.get(item.get("category", "unknown")),
+            ):
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+            
+            prices.append(item.get("price", 0))
+        
+        feature_matrix = np.zeros((len(items), _FEATURE_COUNT))
+        # Color features (simplified - flag the palette colors present)
+        color_masks = PersonalizedRecommendationModel._build_color_masks(items)
+        feature_matrix[:, :len(_COLOR_PALETTE)] = np.unpackbits(color_masks[:, None], axis=1, bitorder="little")
+        feature_matrix[rows, columns] = 1
+        # Price feature (normalized to 0-1 range)
+        feature_matrix[:, _PRICE_COLUMN] = np.minimum(np.array(prices, dtype=float) / 1000, 1.0)
+        return feature_matrix
     
     def _extract_item_features(self, item: Dict[str, Any]) -> List[float]:
         """Extract numerical features from an item"""
-        features = []
-        
-        # Color features (simplified - use color counts)
-        colors = item.get("colors", [])
-        color_features = [1 if color in colors else 0 for color in 
-                         ["#FF0000", "#00FF00", "#0000FF", "#FFFF00", "#FF00FF", "#00FFFF", "#000000", "#FFFFFF"]]
-        features.extend(color_features)
-        
-        # Style features (one-hot encoding)
-        style = item.get("style", "casual")
-        style_features = [1 if style == s else 0 for s in 
-                         ["casual", "formal", "business", "sporty", "elegant", "trendy"]]
-        features.extend(style_features)
-        
-        # Category features (one-hot encoding)
-        category = item.get("category", "unknown")
-        category_features = [1 if category == c else 0 for c in 
-                           ["tops", "bottoms", "shoes", "accessories", "outerwear", "dresses"]]
-        features.extend(category_features)
-        
-        # Price feature (normalized)
-        price = item.get("price", 0)
-        price_normalized = min(price / 1000, 1.0)  # Normalize to 0-1 range
-        features.append(price_normalized)
-        
-        return features
+        return self._build_feature_matrix([item])[0].tolist()
     
     def get_personalized_recommendations(
         self,
@@ -373,25 +480,31 @@ class PersonalizedRecommendationModel:
         if not available_items:
             available_items = []
         
+        scores = self._calculate_personalized_scores(
+            available_items, user_profile, target_item, occasion
+        )
+        
+        # Minimum threshold, then rank by score keeping the input order of ties
+        candidates = np.flatnonzero(scores > 0.3)
+        if 0 < num_recommendations < len(candidates):
+            # Partition out the k-th best score so only the top candidates (and ties) get sorted
+            kth_score = np.partition(scores[candidates], -num_recommendations)[-num_recommendations]
+            candidates = candidates[scores[candidates] >= kth_score]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        
+        reason_sets = self._get_reason_sets(user_id, user_profile)
         recommendations = []
+        for idx in ranked[:num_recommendations]:
+            item = available_items[idx]
+            recommendations.append({
+                **item,
+                "recommendation_score": float(scores[idx]),
+                "recommendation_reasons": self._get_recommendation_reasons(
+                    item, user_profile, target_item, occasion, reason_sets
+                )
+            })
         
-        for item in available_items:
-            score = self._calculate_personalized_score(
-                item, user_profile, target_item, occasion
-            )
-            
-            if score > 0.3:  # Minimum threshold
-                recommendations.append({
-                    **item,
-                    "recommendation_score": score,
-                    "recommendation_reasons": self._get_recommendation_reasons(
-                        item, user_profile, target_item, occasion
-                    )
-                })
-        
-        # Sort by score and return top recommendations
-        recommendations.sort(key=lambda x: x["recommendation_score"], reverse=True)
-        return recommendations[:num_recommendations]
+        return recommendations
     
     def _calculate_personalized_score(
         self,
@@ -401,25 +514,41 @@ class PersonalizedRecommendationModel:
         occasion: Optional[str] = None
     ) -> float:
         """Calculate personalized recommendation score"""
-        score = 0.0
+        return float(self._calculate_personalized_scores([item], user_profile, target_item, occasion)[0])
+    
+    def _calculate_personalized_scores(
+        self,
+        items: List[Dict[str, Any]],
+        user_profile: Dict[str, Any],
+        target_item: Optional[Dict[str, Any]] = None,
+        occasion: Optional[str] = None
+    ) -> np.ndarray:
+        """Calculate personalized recommendation scores for a batch of items"""
+        num_items = len(items)
+        item_colors = [item.get("colors", []) for item in items]
+        item_styles = [item.get("style", "casual") for item in items]
+        
+        # Every color of every item, with the index of the item it belongs to
+        flat_colors = [color for colors in item_colors for color in colors]
+        color_owners = np.repeat(np.arange(num_items), [len(colors) for colors in item_colors])
+        
+        def lookup(prefs: Dict[str, float], keys: List[str]) -> np.ndarray:
+            return np.fromiter((prefs.get(key, 0) for key in keys), dtype=np.float64, count=len(keys))
+        
+        def color_sums(prefs: Dict[str, float]) -> np.ndarray:
+            return np.bincount(color_owners, weights=lookup(prefs, flat_colors), minlength=num_items)
+        
+        subscores = np.zeros((len(_SCORE_WEIGHTS), num_items))
         
         # Color preference score (25% weight)
-        color_prefs = user_profile.get("color_preferences", {})
-        item_colors = item.get("colors", [])
-        color_score = sum(color_prefs.get(color, 0) for color in item_colors)
-        score += color_score * 0.25
+        subscores[0] = color_sums(user_profile.get("color_preferences", {}))
         
         # Style preference score (25% weight)
-        style_prefs = user_profile.get("style_preferences", {})
-        item_style = item.get("style", "casual")
-        style_score = style_prefs.get(item_style, 0)
-        score += style_score * 0.25
+        subscores[1] = lookup(user_profile.get("style_preferences", {}), item_styles)
         
         # Category preference score (15% weight)
-        category_prefs = user_profile.get("category_preferences", {})
-        item_category = item.get("category", "unknown")
-        category_score = category_prefs.get(item_category, 0)
-        score += category_score * 0.15
+        item_categories = [item.get("category", "unknown") for item in items]
+        subscores[2] = lookup(user_profile.get("category_preferences", {}), item_categories)
         
         # Occasion appropriateness (20% weight)
         if occasion:
@@ -428,32 +557,89 @@ class PersonalizedRecommendationModel:
                 occasion_style_prefs = occasion_patterns[occasion].get("styles", {})
                 occasion_color_prefs = occasion_patterns[occasion].get("colors", {})
                 
-                occasion_score = (
-                    occasion_style_prefs.get(item_style, 0) * 0.6 +
-                    sum(occasion_color_prefs.get(color, 0) for color in item_colors) * 0.4
+                subscores[3] = (
+                    lookup(occasion_style_prefs, item_styles) * 0.6 +
+                    color_sums(occasion_color_prefs) * 0.4
                 )
-                score += occasion_score * 0.20
         
         # Item similarity (if target item provided) (15% weight)
-        if target_item and self.item_similarity_matrix is not None:
-            similarity_score = self._get_item_similarity(target_item, item)
-            score += similarity_score * 0.15
+        if target_item and self.item_features_norm is not None:
+            subscores[4] = self._get_item_similarities(target_item, items)
+        
+        return _combine_subscores(subscores)
+    
+    def _get_item_similarities(self, target_item: Dict[str, Any], items: List[Dict[str, Any]]) -> np.ndarray:
+        """Get similarity scores between a target item and each of the given items"""
+        similarities = np.zeros(len(items))
+        num_rows = len(self.item_features_norm)
+        target_idx = self.item_id_to_idx.get(target_item.get("id", ""))
+        if target_idx is None or target_idx >= num_rows:
+            return similarities
+        
+        indices = np.fromiter(
+            (self.item_id_to_idx.get(item.get("id", ""), -1) for item in items), dtype=np.intp, count=len(items)
+        )
+        known = (indices >= 0) & (indices < num_rows)
+        similarities[known] = self._feature_rows(indices[known]) @ self._feature_rows(target_idx)
+        return similarities
+    
+    def _get_reason_sets(self, user_id: str, user_profile: Dict[str, Any]) -> ReasonSets:
+        """Reason sets of a user, rebuilt whenever their stored profile is replaced"""
+        cached = self._reason_sets.get(user_id)
+        if cached is None or cached[0] is not user_profile:
+            cached = (user_profile, ReasonSets.from_profile(user_profile))
+            self._reason_sets[user_id] = cached
+        return cached[1]
+    
+    def find_similar_items(self, target_item: Dict[str, Any], k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Find the trained items most similar to a target item
+        
+        Args:
+            target_item: Item to find neighbours of; must be one of the trained items
+            k: Number of neighbours to return
         
-        return min(1.0, max(0.0, score))
+        Returns:
+            (item id, cosine similarity) pairs, most similar first, excluding the target
+        """
+        if self.item_features_norm is None or k <= 0:
+            return []
+        
+        target_idx = self.item_id_to_idx.get(target_item.get("id", ""))
+        if target_idx is None or target_idx >= len(self.item_features_norm):
+            return []
+        
+        # Exact inner-product search over the normalized rows, O(N * D)
+        similarities = self._feature_rows(slice(None)) @ self._feature_rows(target_idx)
+        similarities[target_idx] = -np.inf
+        k = min(k, len(similarities) - 1)
+        if k <= 0:
+            return []
+        
+        top = np.argpartition(similarities, -k)[-k:]
+        top = top[np.argsort(-similarities[top], kind="stable")]
+        return [(self.item_ids[idx], float(similarities[idx])) for idx in top]
+    
+    def _feature_rows(self, indices) -> np.ndarray:
+        """Normalized feature rows at indices, widened to the compute precision"""
+        return self.item_features_norm[indices].astype(_FEATURE_COMPUTE_DTYPE)
     
     def _get_item_similarity(self, item1: Dict[str, Any], item2: Dict[str, Any]) -> float:
         """Get similarity score between two items"""
-        if not self.item_similarity_matrix:
+        if self.item_features_norm is None:
             return 0.0
         
         item1_id = item1.get("id", "")
         item2_id = item2.get("id", "")
         
+        idx1 = self.item_id_to_idx.get(item1_id)
+        idx2 = self.item_id_to_idx.get(item2_id)
+        if idx1 is None or idx2 is None:
+            return 0.0
+        
         try:
-            idx1 = self.item_ids.index(item1_id)
-            idx2 = self.item_ids.index(item2_id)
-            return self.item_similarity_matrix[idx1][idx2]
-        except (ValueError, IndexError):
+            return float(self._feature_rows(idx1) @ self._feature_rows(idx2))
+        except IndexError:
             return 0.0
     
     def _get_recommendation_reasons(
@@ -461,29 +647,26 @@ class PersonalizedRecommendationModel:
         item: Dict[str, Any],
         user_profile: Dict[str, Any],
         target_item: Optional[Dict[str, Any]] = None,
-        occasion: Optional[str] = None
+        occasion: Optional[str] = None,
+        reason_sets: Optional[ReasonSets] = None
     ) -> List[str]:
         """Generate human-readable reasons for the recommendation"""
+        if reason_sets is None:
+            reason_sets = ReasonSets.from_profile(user_profile)
         reasons = []
         
         # Check color preferences
-        color_prefs = user_profile.get("color_preferences", {})
-        item_colors = item.get("colors", [])
-        preferred_colors = [color for color in item_colors if color_prefs.get(color, 0) > 0.1]
-        if preferred_colors:
+        if not reason_sets.preferred_colors.isdisjoint(item.get("colors", [])):
             reasons.append(f"Matches your preferred colors")
         
         # Check style preferences
-        style_prefs = user_profile.get("style_preferences", {})
         item_style = item.get("style", "casual")
-        if style_prefs.get(item_style, 0) > 0.2:
+        if item_style in reason_sets.preferred_styles:
             reasons.append(f"Fits your {item_style} style preference")
         
         # Check occasion appropriateness
-        if occasion:
-            occasion_patterns = user_profile.get("occasion_patterns", {})
-            if occasion in occasion_patterns:
-                reasons.append(f"Perfect for {occasion} occasions")
+        if occasion and occasion in reason_sets.known_occasions:
+            reasons.append(f"Perfect for {occasion} occasions")
         
         # Check similarity to target item
         if target_item:
@@ -493,12 +676,16 @@ class PersonalizedRecommendationModel:
     
     def update_user_profile(self, user_id: str, new_data: Dict[str, Any]):
         """Update user profile with new data"""
+        # New data arrived for this user, so drop their memoized analysis
+        self.behavior_analyzer.invalidate(user_id)
         if user_id in self.user_profiles:
             # Merge new preferences with existing ones
             new_preferences = self.behavior_analyzer.analyze_user_preferences(new_data)
             
-            # Simple averaging for now (could be more sophisticated)
-            existing_prefs = self.user_profiles[user_id]
+            # Simple averaging for now (could be more sophisticated); merge into a copy
+            # since profiles may be shared with the analyzer's memoized results
+            existing_prefs = copy.deepcopy(self.user_profiles[user_id])
+            self.user_profiles[user_id] = existing_prefs
             for pref_type, prefs in new_preferences.items():
                 if pref_type in existing_prefs and isinstance(prefs, dict):
                     for key, value in prefs.items():
@@ -512,35 +699,78 @@ class PersonalizedRecommendationModel:
             self.user_profiles[user_id] = self.behavior_analyzer.analyze_user_preferences(new_data)
     
     def save_model(self, filepath: str):
-        """Save the trained model"""
-        model_data = {
-            "user_profiles": self.user_profiles,
-            "item_similarity_matrix": self.item_similarity_matrix.tolist() if self.item_similarity_matrix is not None else None,
-            "item_ids": getattr(self, "item_ids", []),
-            "is_trained": self.is_trained
-        }
+        """
+        Save the trained model
         
-        with open(filepath, 'w') as f:
-            json.dump(model_data, f, indent=2)
+        A ``.npz`` path stores the item features in a compressed NumPy archive next
+        to a ``.json`` sidecar for the ids and user profiles; any other path is
+        written as a single JSON document. User profiles are saved as
+        ``[user_id, profile]`` pairs so int user ids stay ints.
+        """
+        user_profiles = [[user_id, profile] for user_id, profile in self.user_profiles.items()]
+        if self._is_npz_path(filepath):
+            arrays = {}
+            if self.item_features_norm is not None:
+                arrays["item_features_norm"] = self.item_features_norm
+            np.savez_compressed(filepath, **arrays)
+            
+            # Ids go in the JSON sidecar, which keeps int and str ids apart (a NumPy str array would not)
+            with open(self._sidecar_path(filepath), 'w') as f:
+                json.dump({"user_profiles": user_profiles, "item_ids": self.item_ids, "is_trained": self.is_trained}, f)
+        else:
+            model_data = {
+                "user_profiles": user_profiles,
+                "item_features_norm": self.item_features_norm.tolist() if self.item_features_norm is not None else None,
+                "item_ids": self.item_ids,
+                "is_trained": self.is_trained
+            }
+            
+            with open(filepath, 'w') as f:
+                json.dump(model_data, f, indent=2)
         
         logger.info(f"Model saved to {filepath}")
     
     def load_model(self, filepath: str):
         """Load a trained model"""
         try:
-            with open(filepath, 'r') as f:
-                model_data = json.load(f)
+            if self._is_npz_path(filepath):
+                with open(self._sidecar_path(filepath), 'r') as f:
+                    model_data = json.load(f)
+                with np.load(filepath, allow_pickle=False) as arrays:
+                    if "item_features_norm" in arrays:
+                        self.item_features_norm = arrays["item_features_norm"].astype(_FEATURE_STORAGE_DTYPE)
+                    if "item_ids" in model_data:
+                        self._set_item_ids(model_data["item_ids"])
+                    elif "item_ids" in arrays: # Older archives kept the ids, as strings, in the .npz
+                        self._set_item_ids(arrays["item_ids"].tolist())
+            else:
+                with open(filepath, 'r') as f:
+                    model_data = json.load(f)
+                
+                item_features_norm = model_data.get("item_features_norm")
+                if item_features_norm:
+                    self.item_features_norm = np.array(item_features_norm, dtype=_FEATURE_STORAGE_DTYPE)
+                elif model_data.get("item_similarity_matrix"):
+                    logger.warning("Model file stores a similarity matrix; item similarities need retraining")
+                self._set_item_ids(model_data.get("item_ids", []))
             
-            self.user_profiles = model_data.get("user_profiles", {})
-            similarity_matrix = model_data.get("item_similarity_matrix")
-            if similarity_matrix:
-                self.item_similarity_matrix = np.array(similarity_matrix)
-            self.item_ids = model_data.get("item_ids", [])
+            user_profiles = model_data.get("user_profiles", {})
+            # Pairs keep the user id type; older files stored a dict with string keys
+            self.user_profiles = dict(user_profiles) if isinstance(user_profiles, list) else user_profiles
             self.is_trained = model_data.get("is_trained", False)
             
             logger.info(f"Model loaded from {filepath}")
         except Exception as e:
             logger.error(f"Error loading model: {e}")
+    
+    @staticmethod
+    def _is_npz_path(filepath: str) -> bool:
+        return filepath.lower().endswith(".npz")
+    
+    @staticmethod
+    def _sidecar_path(filepath: str) -> str:
+        """JSON file holding the non-array state of an .npz model"""
+        return os.path.splitext(filepath)[0] + ".json"
 
 # Example usage
 if __name__ == "__main__":
@@ -2,26 +2,94 @@
 # This module manages AI model loading, caching, and persistence to prevent re-downloading
 
 import os
-import json
+import orjson
 import hashlib
 import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Any, Optional, Union
+import numpy as np
 import tensorflow as tf
 import tensorflow_hub as hub
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# Graph optimizations applied when concrete functions are traced
+tf.config.optimizer.set_experimental_options({"layout_optimizer": True, "constant_folding": True})
+
+# Seconds an is_model_cached result is reused before the cache dir is checked again
+CACHE_CHECK_TTL = 60
+
+# Flatbuffer written next to the SavedModel of Keras models
+TFLITE_FILENAME = "model.tflite"
+
+
+class TFLiteModel:
+    """
+    Callable wrapper around a TFLite interpreter with the same call shape as a Keras model
+    """
+
+    def __init__(self, model_path: str):
+        self.interpreter = tf.lite.Interpreter(model_path=model_path)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        # Interpreters are not thread-safe
+        self._lock = threading.Lock()
+
+    def __call__(self, inputs):
+        """Run inference on a batch and return the first output as a tensor"""
+        inputs = np.asarray(inputs)
+        input_dtype = self.input_details["dtype"]
+        if np.issubdtype(input_dtype, np.integer) and not np.issubdtype(inputs.dtype, np.integer):
+            # Quantized models take integer inputs; map float inputs onto their scale
+            scale, zero_point = self.input_details["quantization"]
+            info = np.iinfo(input_dtype)
+            inputs = np.clip(np.round(inputs / scale + zero_point), info.min, info.max)
+        inputs = inputs.astype(input_dtype, copy=False)
+        with self._lock:
+            if tuple(self.input_details["shape"]) != inputs.shape:
+                self.interpreter.resize_tensor_input(self.input_details["index"], inputs.shape)
+                self.interpreter.allocate_tensors()
+                self.input_details = self.interpreter.get_input_details()[0]
+                self.output_details = self.interpreter.get_output_details()[0]
+            self.interpreter.set_tensor(self.input_details["index"], inputs)
+            self.interpreter.invoke()
+            outputs = self.interpreter.get_tensor(self.output_details["index"])
+        if np.issubdtype(outputs.dtype, np.integer):
+            scale, zero_point = self.output_details["quantization"]
+            outputs = (outputs.astype(np.float32) - zero_point) * scale
+        return tf.convert_to_tensor(outputs)
+
+
+class ConcreteFunctionModel:
+    """
+    Callable wrapper dispatching to a concrete function traced once from a model
+    """
+
+    def __init__(self, model, concrete_fn):
+        self.model = model
+        self.concrete_fn = concrete_fn
+
+    def __call__(self, inputs):
+        """Run the traced graph on a float32 batch"""
+        return self.concrete_fn(tf.convert_to_tensor(inputs, dtype=tf.float32))
+
+
 class ModelManager:
     """
     Centralized model management with persistent caching and version control
     """
     
-    def __init__(self, cache_dir: str = "tmp/wardrobe_models"):
+    def __init__(self, cache_dir: str = "tmp/wardrobe_models", preload: bool = False):
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.models_cache = {}
+        self._concrete_fns: Dict[str, Any] = {}
+        self._cached_ok: Dict[str, tuple] = {}
         self.model_metadata_file = self.cache_dir / "model_metadata.json"
         self.load_metadata()
         
@@ -31,7 +99,10 @@ class ModelManager:
                 "url": "https://tfhub.dev/google/imagenet/mobilenet_v2_100_224/feature_vector/5", # Updated URL
                 "input_shape": (224, 224, 3),
                 "cache_key": "mobilenet_v2_embedding",
-                "version": "1.1" # Bump version due to URL change
+                # int8 embeddings only approximate the float ones (see test_model_manager). Embeddings already stored in
+                # WardrobeItem.ai_embedding by the float model are compared against int8 ones until items are re-embedded.
+                "quantize": "int8",
+                "version": "1.2-int8" # Bump version so float caches are rebuilt quantized
             },
             "efficientdet_lite0": {
                 "url": "https://tfhub.dev/tensorflow/efficientdet/lite0/detection/1",
@@ -40,13 +111,36 @@ class ModelManager:
                 "version": "1.0"
             }
         }
+
+        # Path strings are built once; the cache helpers run on every request
+        self._cache_path_str = {name: str(self.get_model_cache_path(name)) for name in self.model_configs}
+        self._tflite_path_str = {
+            name: os.path.join(path, TFLITE_FILENAME) for name, path in self._cache_path_str.items()
+        }
+
+        # Models load on background threads; callers wait on the shared future
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-loader")
+        self._futures: Dict[str, Future] = {}
+        if preload:
+            self.preload()
+    
+    def preload(self):
+        """Start loading every configured model in the background without waiting for them"""
+        with self._lock:
+            for model_name in self.model_configs:
+                if model_name not in self._futures:
+                    self._futures[model_name] = self._pool.submit(self._load_model, model_name)
+    
+    def shutdown(self, wait: bool = False):
+        """Stop the loader threads, cancelling loads that have not started"""
+        self._pool.shutdown(wait=wait, cancel_futures=True)
     
     def load_metadata(self):
         """Load model metadata from cache"""
         try:
             if self.model_metadata_file.exists():
-                with open(self.model_metadata_file, 'r') as f:
-                    self.metadata = json.load(f)
+                self.metadata = orjson.loads(self.model_metadata_file.read_bytes())
             else:
                 self.metadata = {}
         except Exception as e:
@@ -56,19 +150,33 @@ class ModelManager:
     def save_metadata(self):
         """Save model metadata to cache"""
         try:
-            with open(self.model_metadata_file, 'w') as f:
-                json.dump(self.metadata, f, indent=2)
+            self.model_metadata_file.write_bytes(orjson.dumps(self.metadata, option=orjson.OPT_INDENT_2))
         except Exception as e:
             logger.error(f"Error saving model metadata: {e}")
     
     def get_model_cache_path(self, model_name: str) -> Path:
         """Get the cache path for a specific model"""
         return self.cache_dir / f"{model_name}_cached"
+
+    def _get_cache_path_str(self, model_name: str) -> str:
+        """Cache path of a model as a string, precomputed for configured models"""
+        path = self._cache_path_str.get(model_name)
+        return path if path is not None else str(self.get_model_cache_path(model_name))
     
     def is_model_cached(self, model_name: str) -> bool:
         """Check if model is already cached and valid"""
-        cache_path = self.get_model_cache_path(model_name)
-        if not cache_path.exists():
+        now = time.monotonic()
+        checked = self._cached_ok.get(model_name)
+        if checked is not None and now - checked[0] < CACHE_CHECK_TTL:
+            return checked[1]
+
+        result = self._check_model_cache(model_name)
+        self._cached_ok[model_name] = (now, result)
+        return result
+
+    def _check_model_cache(self, model_name: str) -> bool:
+        """Validate the on-disk cache of a model against its metadata"""
+        if not os.path.exists(self._get_cache_path_str(model_name)):
             return False
         
         # Check metadata for version and expiry
@@ -91,30 +199,61 @@ class ModelManager:
     def cache_model(self, model_name: str, model):
         """Cache a loaded model to disk"""
         try:
-            cache_path = self.get_model_cache_path(model_name)
+            cache_path = self._get_cache_path_str(model_name)
             
             # Save the model
-            tf.saved_model.save(model, str(cache_path))
+            tf.saved_model.save(model, cache_path)
+            if isinstance(model, tf.keras.Model):
+                self._save_tflite(model_name, model)
             
             # Update metadata
             self.metadata[model_name] = {
                 "version": self.model_configs[model_name]["version"],
                 "cached_date": datetime.now().isoformat(),
-                "cache_path": str(cache_path),
+                "cache_path": cache_path,
                 "url": self.model_configs[model_name]["url"]
             }
             self.save_metadata()
+            self._cached_ok.pop(model_name, None)
             
             logger.info(f"Model {model_name} cached successfully at {cache_path}")
             
         except Exception as e:
             logger.error(f"Error caching model {model_name}: {e}")
     
+    def _save_tflite(self, model_name: str, model):
+        """Convert a Keras model to a TFLite flatbuffer inside its cache directory"""
+        try:
+            config = self.model_configs[model_name]
+            converter = tf.lite.TFLiteConverter.from_keras_model(model)
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            if config.get("quantize") == "int8":
+                # Full integer post-training quantization calibrated on uniform [0, 1] noise rather than real
+                # photos, so activation ranges are approximate
+                converter.representative_dataset = lambda: self._representative_dataset(config["input_shape"])
+                converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+                converter.inference_input_type = tf.uint8
+            with open(self._tflite_path_str[model_name], "wb") as f:
+                f.write(converter.convert())
+        except Exception as e:
+            # The SavedModel is still usable without the flatbuffer
+            logger.warning(f"Error converting model {model_name} to TFLite: {e}")
+
+    @staticmethod
+    def _representative_dataset(input_shape, num_samples: int = 100):
+        """Yield random calibration batches in the input range used by callers"""
+        rng = np.random.default_rng(0)
+        for _ in range(num_samples):
+            yield [rng.random((1, *input_shape), dtype=np.float32)]
+
     def load_cached_model(self, model_name: str):
         """Load a model from cache"""
         try:
-            cache_path = self.get_model_cache_path(model_name)
-            model = tf.saved_model.load(str(cache_path))
+            tflite_path = self._tflite_path_str.get(model_name)
+            if tflite_path is not None and os.path.exists(tflite_path):
+                model = TFLiteModel(tflite_path)
+            else:
+                model = tf.saved_model.load(self._get_cache_path_str(model_name))
             logger.info(f"Model {model_name} loaded from cache")
             return model
         except Exception as e:
@@ -126,12 +265,27 @@ class ModelManager:
         # Check if model is already in memory
         if model_name in self.models_cache:
             return self.models_cache[model_name]
-        
+
+        with self._lock:
+            future = self._futures.get(model_name)
+            # Retry loads that finished without a model
+            if future is None or (future.done() and future.result() is None):
+                future = self._pool.submit(self._load_model, model_name)
+                self._futures[model_name] = future
+        return future.result()
+
+    def _load_model(self, model_name: str):
+        """Load a model from the disk cache or download it"""
+        if model_name in self.models_cache:
+            return self.models_cache[model_name]
+
         # Check if model is cached on disk
         if self.is_model_cached(model_name):
             model = self.load_cached_model(model_name)
             if model is not None:
-                self.models_cache[model_name] = model
+                model = self._as_concrete_model(model_name, model)
+                with self._lock:
+                    self.models_cache[model_name] = model
                 return model
         
         # Download and cache the model
@@ -156,9 +310,11 @@ class ModelManager:
             
             # Cache the model
             self.cache_model(model_name, model)
+            model = self._as_concrete_model(model_name, model)
             
             # Store in memory cache
-            self.models_cache[model_name] = model
+            with self._lock:
+                self.models_cache[model_name] = model
             
             logger.info(f"Model {model_name} downloaded and cached successfully")
             return model
@@ -167,6 +323,23 @@ class ModelManager:
             logger.error(f"Error downloading model {model_name}: {e}")
             return None
     
+    def _as_concrete_model(self, model_name: str, model):
+        """Wrap a fixed-input model in a concrete function traced once per process"""
+        input_shape = self.model_configs[model_name]["input_shape"]
+        if input_shape is None or isinstance(model, TFLiteModel):
+            return model
+        try:
+            concrete_fn = self._concrete_fns.get(model_name)
+            if concrete_fn is None:
+                concrete_fn = tf.function(model).get_concrete_function(
+                    tf.TensorSpec([None, *input_shape], tf.float32)
+                )
+                self._concrete_fns[model_name] = concrete_fn
+            return ConcreteFunctionModel(model, concrete_fn)
+        except Exception as e:
+            logger.warning(f"Error tracing model {model_name}, using it eagerly: {e}")
+            return model
+
     def clear_cache(self, model_name: Optional[str] = None):
         """Clear model cache"""
         if model_name:
@@ -179,8 +352,12 @@ class ModelManager:
             if model_name in self.metadata:
                 del self.metadata[model_name]
             
-            if model_name in self.models_cache:
-                del self.models_cache[model_name]
+            with self._lock:
+                self.models_cache.pop(model_name, None)
+                self._futures.pop(model_name, None)
+                self._concrete_fns.pop(model_name, None)
+
+            self._cached_ok.pop(model_name, None)
                 
             logger.info(f"Cache cleared for model {model_name}")
         else:
@@ -191,7 +368,11 @@ class ModelManager:
             self.cache_dir.mkdir(parents=True, exist_ok=True)
             
             self.metadata = {}
-            self.models_cache = {}
+            with self._lock:
+                self.models_cache = {}
+                self._futures = {}
+                self._concrete_fns = {}
+            self._cached_ok = {}
             
             logger.info("All model caches cleared")
         
@@ -223,7 +404,7 @@ class ModelManager:
         
         return info
 
-# Global model manager instance
+# Global model manager instance; loading starts from the app's startup hook, not at import
 model_manager = ModelManager()
 
 def get_model_manager() -> ModelManager:
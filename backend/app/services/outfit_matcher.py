@@ -3,9 +3,13 @@
 
 import json
 import logging
+import os
+import numpy as np
 from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 import colorsys
 import re
 
@@ -36,6 +40,17 @@ class WeatherType(Enum):
     SNOWY = "snowy"
     WINDY = "windy"
 
+# Bit of each enum member in the suitability masks
+_OCCASION_BITS = {occasion: 1 << bit for bit, occasion in enumerate(OccasionType)}
+_SEASON_BITS = {season: 1 << bit for bit, season in enumerate(SeasonType)}
+_WEATHER_BITS = {weather: 1 << bit for bit, weather in enumerate(WeatherType)}
+
+def _suitability_mask(values: List[Enum], bits: Dict[Enum, int]) -> int:
+    mask = 0
+    for value in values:
+        mask |= bits.get(value, 0)
+    return mask
+
 @dataclass
 class ClothingItem:
     id: str
@@ -49,6 +64,19 @@ class ClothingItem:
     formality_level: int  # 1-10 scale
     comfort_level: int  # 1-10 scale
     tags: List[str]
+    # Suitability lists as bitmasks, derived at construction
+    occasion_mask: int = field(init=False, repr=False, compare=False)
+    season_mask: int = field(init=False, repr=False, compare=False)
+    weather_mask: int = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self.occasion_mask = _suitability_mask(self.occasion_suitability, _OCCASION_BITS)
+        self.season_mask = _suitability_mask(self.season_suitability, _SEASON_BITS)
+        self.weather_mask = _suitability_mask(self.weather_suitability, _WEATHER_BITS)
+    
+    def is_suitable(self, occasion_bit: int, season_bit: int, weather_bit: int) -> bool:
+        """Whether the item suits the context given by single enum bits"""
+        return bool(self.occasion_mask & occasion_bit and self.season_mask & season_bit and self.weather_mask & weather_bit)
 
 @dataclass
 class OutfitRecommendation:
@@ -65,13 +93,46 @@ class ColorMatcher:
     """Advanced color matching and harmony detection"""
     
     @staticmethod
+    def hex_to_rgb(hex_color: str) -> Tuple[int, int, int]:
+        """Convert hex color to RGB"""
+        hex_color = hex_color.lstrip('#')
+        return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+    
+    @staticmethod
+    @lru_cache(maxsize=1024)
     def hex_to_hsv(hex_color: str) -> Tuple[float, float, float]:
         """Convert hex color to HSV"""
-        hex_color = hex_color.lstrip('#')
-        r, g, b = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+        r, g, b = ColorMatcher.hex_to_rgb(hex_color)
         return colorsys.rgb_to_hsv(r/255.0, g/255.0, b/255.0)
     
     @staticmethod
+    def hex_array_to_hsv(hex_colors: List[str]) -> np.ndarray:
+        """Convert hex colors to an (N, 3) HSV array, identical to colorsys.rgb_to_hsv per color"""
+        rgb = np.array([ColorMatcher.hex_to_rgb(color) for color in hex_colors], dtype=np.uint8).reshape(-1, 3)
+        return ColorMatcher.rgb_array_to_hsv(rgb)
+    
+    @staticmethod
+    def rgb_array_to_hsv(rgb: np.ndarray) -> np.ndarray:
+        """Convert an (N, 3) array of 0-255 RGB values to an (N, 3) HSV array"""
+        rgb = rgb.astype(np.float64) / 255.0
+        r, g, b = rgb.T
+        maxc = rgb.max(axis=1)
+        minc = rgb.min(axis=1)
+        rangec = maxc - minc
+        
+        # Grays (minc == maxc) have zero hue and saturation
+        chromatic = rangec > 0
+        safe_range = np.where(chromatic, rangec, 1.0)
+        s = np.where(chromatic, rangec / np.where(chromatic, maxc, 1.0), 0.0)
+        rc = (maxc - r) / safe_range
+        gc = (maxc - g) / safe_range
+        bc = (maxc - b) / safe_range
+        h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+        h = np.where(chromatic, (h / 6.0) % 1.0, 0.0)
+        return np.stack([h, s, maxc], axis=1)
+    
+    @staticmethod
+    @lru_cache(maxsize=1024)
     def hsv_to_hex(h: float, s: float, v: float) -> str:
         """Convert HSV to hex color"""
         r, g, b = colorsys.hsv_to_rgb(h, s, v)
@@ -80,6 +141,12 @@ class ColorMatcher:
     @staticmethod
     def get_complementary_colors(hex_color: str) -> List[str]:
         """Get complementary colors for a given color"""
+        return list(ColorMatcher._complementary_colors(hex_color))
+    
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _complementary_colors(hex_color: str) -> Tuple[str, ...]:
+        """Memoized complementary, analogous and triadic colors of a hex color"""
         h, s, v = ColorMatcher.hex_to_hsv(hex_color)
         
         # Complementary (opposite on color wheel)
@@ -98,39 +165,80 @@ class ColorMatcher:
         triadic1 = ColorMatcher.hsv_to_hex(triad1_h, s, v)
         triadic2 = ColorMatcher.hsv_to_hex(triad2_h, s, v)
         
-        return [complementary, analogous1, analogous2, triadic1, triadic2]
+        return (complementary, analogous1, analogous2, triadic1, triadic2)
     
     @staticmethod
     def calculate_color_harmony(color1: str, color2: str) -> float:
         """Calculate harmony score between two colors (0-1)"""
-        h1, s1, v1 = ColorMatcher.hex_to_hsv(color1)
-        h2, s2, v2 = ColorMatcher.hex_to_hsv(color2)
-        
-        # Hue difference
-        hue_diff = min(abs(h1 - h2), 1 - abs(h1 - h2))
-        
-        # Saturation and value similarity
-        sat_diff = abs(s1 - s2)
-        val_diff = abs(v1 - v2)
-        
-        # Calculate harmony based on color theory
-        if hue_diff < 0.05:  # Very similar hues (monochromatic)
-            harmony = 0.9 - (sat_diff + val_diff) * 0.5
-        elif 0.45 < hue_diff < 0.55:  # Complementary
-            harmony = 0.8 - (sat_diff + val_diff) * 0.3
-        elif 0.08 < hue_diff < 0.12:  # Analogous
-            harmony = 0.85 - (sat_diff + val_diff) * 0.4
-        elif 0.3 < hue_diff < 0.37 or 0.63 < hue_diff < 0.7:  # Triadic
-            harmony = 0.75 - (sat_diff + val_diff) * 0.3
-        else:
-            harmony = 0.5 - (sat_diff + val_diff) * 0.5
-        
-        return max(0, min(1, harmony))
+        return _color_harmony(color1, color2)
+    
+    @staticmethod
+    def pairwise_harmony(hsv1: np.ndarray, hsv2: Optional[np.ndarray] = None) -> np.ndarray:
+        """Harmony scores between every color of hsv1 and every color of hsv2 (defaults to hsv1)"""
+        if hsv2 is None:
+            hsv2 = hsv1
+        h1, s1, v1 = (hsv1[:, k, None] for k in range(3))
+        h2, s2, v2 = (hsv2[None, :, k] for k in range(3))
+        
+        abs_hue_diff = np.abs(h1 - h2)
+        hue_diff = np.minimum(abs_hue_diff, 1 - abs_hue_diff)
+        spread = np.abs(s1 - s2) + np.abs(v1 - v2)
+        
+        # Same color theory tiers as calculate_color_harmony, first match wins
+        harmony = np.select(
+            [
+                hue_diff < 0.05,
+                (0.45 < hue_diff) & (hue_diff < 0.55),
+                (0.08 < hue_diff) & (hue_diff < 0.12),
+                ((0.3 < hue_diff) & (hue_diff < 0.37)) | ((0.63 < hue_diff) & (hue_diff < 0.7)),
+            ],
+            [0.9 - spread * 0.5, 0.8 - spread * 0.3, 0.85 - spread * 0.4, 0.75 - spread * 0.3],
+            0.5 - spread * 0.5,
+        )
+        return np.clip(harmony, 0, 1)
+
+@lru_cache(maxsize=16384)
+def _color_harmony(color1: str, color2: str) -> float:
+    """Harmony score between two hex colors, memoized since wardrobes reuse a small palette"""
+    h1, s1, v1 = ColorMatcher.hex_to_hsv(color1)
+    h2, s2, v2 = ColorMatcher.hex_to_hsv(color2)
+    
+    # Hue difference
+    hue_diff = min(abs(h1 - h2), 1 - abs(h1 - h2))
+    
+    # Saturation and value similarity
+    sat_diff = abs(s1 - s2)
+    val_diff = abs(v1 - v2)
+    
+    # Calculate harmony based on color theory
+    harmony = _harmony_tier(hue_diff, sat_diff + val_diff)
+    
+    return max(0, min(1, harmony))
+
+def _harmony_tier(hue_diff: float, spread: float) -> float:
+    """
+    Unclipped harmony for a hue difference and saturation plus value spread
+    
+    Every tier is evaluated and blended with 0/1 weights instead of branching; the
+    tiers are disjoint, so exactly one weight is 1.
+    """
+    monochromatic = float(hue_diff < 0.05)
+    complementary = float((0.45 < hue_diff) & (hue_diff < 0.55))
+    analogous = float((0.08 < hue_diff) & (hue_diff < 0.12))
+    triadic = float(((0.3 < hue_diff) & (hue_diff < 0.37)) | ((0.63 < hue_diff) & (hue_diff < 0.7)))
+    other = 1.0 - monochromatic - complementary - analogous - triadic
+    return (
+        monochromatic * (0.9 - spread * 0.5) +
+        complementary * (0.8 - spread * 0.3) +
+        analogous * (0.85 - spread * 0.4) +
+        triadic * (0.75 - spread * 0.3) +
+        other * (0.5 - spread * 0.5)
+    )
 
 class StyleMatcher:
     """Advanced style matching and compatibility detection"""
     
-    STYLE_COMPATIBILITY = {
+    STYLE_COMPATIBILITY = {style: frozenset(compatible) for style, compatible in {
         "casual": ["casual", "bohemian", "sporty", "streetwear"],
         "formal": ["formal", "business", "classic", "elegant"],
         "business": ["business", "formal", "professional", "classic"],
@@ -141,32 +249,132 @@ class StyleMatcher:
         "edgy": ["edgy", "punk", "gothic", "alternative"],
         "romantic": ["romantic", "feminine", "soft", "elegant"],
         "sporty": ["sporty", "athletic", "casual", "active"]
-    }
+    }.items()}
     
     @staticmethod
     def calculate_style_compatibility(style1: str, style2: str) -> float:
         """Calculate compatibility score between two styles (0-1)"""
-        style1_lower = style1.lower()
-        style2_lower = style2.lower()
+        return _lowered_style_compatibility(style1.lower(), style2.lower())
+    
+    @staticmethod
+    def compatibility_table(style_names: List[str]) -> np.ndarray:
+        """(S, S) compatibility of every pair of lowercased style names"""
+        return np.array(
+            [[_lowered_style_compatibility(style1, style2) for style2 in style_names] for style1 in style_names]
+        ).reshape(len(style_names), len(style_names))
+
+@lru_cache(maxsize=4096)
+def _lowered_style_compatibility(style1_lower: str, style2_lower: str) -> float:
+    """Style compatibility of two lowercased style names"""
+    if style1_lower == style2_lower:
+        return 1.0
+    
+    compatible_styles = StyleMatcher.STYLE_COMPATIBILITY.get(style1_lower, frozenset())
+    if style2_lower in compatible_styles:
+        return 0.8
+    
+    # Check reverse compatibility
+    if style1_lower in StyleMatcher.STYLE_COMPATIBILITY.get(style2_lower, frozenset()):
+        return 0.8
+    
+    # Check for partial matches
+    if any(style in style2_lower or style2_lower in style for style in compatible_styles):
+        return 0.6
+    
+    return 0.3  # Default low compatibility
+
+@dataclass
+class WardrobeSoA:
+    """Clothing items laid out as parallel arrays (structure of arrays) for bulk scoring"""
+    items: List[ClothingItem]
+    rgb: np.ndarray  # (N, 3) uint8
+    hsv: np.ndarray  # (N, 3) float64, kept at full precision to match colorsys
+    formality: np.ndarray  # (N,) int8
+    category_id: np.ndarray  # (N,) int16, indexes category_names
+    style_id: np.ndarray  # (N,) int16, indexes style_names
+    occasion_mask: np.ndarray  # (N,) uint32
+    season_mask: np.ndarray  # (N,) uint32
+    weather_mask: np.ndarray  # (N,) uint32
+    category_names: List[str]
+    style_names: List[str]  # lowercased
+    
+    @classmethod
+    def from_items(cls, items: List[ClothingItem]) -> "WardrobeSoA":
+        """Build the arrays from clothing items, interning categories and lowercased styles"""
+        category_ids: Dict[str, int] = {}
+        style_ids: Dict[str, int] = {}
+        rgb = np.array([ColorMatcher.hex_to_rgb(item.color) for item in items], dtype=np.uint8).reshape(-1, 3)
+        return cls(
+            items=list(items),
+            rgb=rgb,
+            hsv=ColorMatcher.rgb_array_to_hsv(rgb),
+            formality=np.array([item.formality_level for item in items], dtype=np.int8),
+            category_id=np.array([category_ids.setdefault(item.category, len(category_ids)) for item in items], dtype=np.int16),
+            style_id=np.array([style_ids.setdefault(item.style.lower(), len(style_ids)) for item in items], dtype=np.int16),
+            occasion_mask=np.array([item.occasion_mask for item in items], dtype=np.uint32),
+            season_mask=np.array([item.season_mask for item in items], dtype=np.uint32),
+            weather_mask=np.array([item.weather_mask for item in items], dtype=np.uint32),
+            category_names=list(category_ids),
+            style_names=list(style_ids),
+        )
+    
+    def __len__(self) -> int:
+        return len(self.items)
+    
+    def suitable(self, occasion_bit: int, season_bit: int, weather_bit: int) -> np.ndarray:
+        """Indices of the items that suit the context given by single enum bits"""
+        return np.flatnonzero(
+            (self.occasion_mask & occasion_bit != 0) &
+            (self.season_mask & season_bit != 0) &
+            (self.weather_mask & weather_bit != 0)
+        )
+    
+    def pairwise_matrix(self, rows: Optional[np.ndarray] = None, cols: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Compatibility of every item in rows with every item in cols
         
-        if style1_lower == style2_lower:
-            return 1.0
+        Args:
+            rows: Item indices of the matrix rows (defaults to all items)
+            cols: Item indices of the matrix columns (defaults to all items)
         
-        compatible_styles = StyleMatcher.STYLE_COMPATIBILITY.get(style1_lower, [])
-        if style2_lower in compatible_styles:
-            return 0.8
+        Returns:
+            (len(rows), len(cols)) matrix matching OutfitMatcher._calculate_item_compatibility
+        """
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.intp)
+        cols = np.arange(len(self)) if cols is None else np.asarray(cols, dtype=np.intp)
+        accessory_id = self.category_names.index("accessory") if "accessory" in self.category_names else -1
         
-        # Check reverse compatibility
-        compatible_styles_reverse = StyleMatcher.STYLE_COMPATIBILITY.get(style2_lower, [])
-        if style1_lower in compatible_styles_reverse:
-            return 0.8
+        # Style compatibility, scored once per distinct pair of this wardrobe's styles
+        style_table = StyleMatcher.compatibility_table(self.style_names)
+        
+        # Color harmony
+        color_scores = ColorMatcher.pairwise_harmony(self.hsv[rows], self.hsv[cols])
+        
+        style_scores = style_table[self.style_id[rows][:, None], self.style_id[cols][None, :]]
+        
+        # Formality level compatibility
+        formality_diff = np.abs(self.formality[rows][:, None] - self.formality[cols][None, :])
+        formality_scores = np.maximum(0, 1 - formality_diff / 10)
         
-        # Check for partial matches
-        for style in compatible_styles:
-            if style in style2_lower or style2_lower in style:
-                return 0.6
+        # Category compatibility (can't wear two tops, bottoms, etc.; accessories can repeat)
+        row_categories = self.category_id[rows][:, None]
+        conflicts = (row_categories == self.category_id[cols][None, :]) & (row_categories != accessory_id)
+        category_scores = np.where(conflicts, 0.0, 1.0)
         
-        return 0.3  # Default low compatibility
+        # Weighted average
+        return (
+            color_scores * 0.3 +
+            style_scores * 0.3 +
+            formality_scores * 0.2 +
+            category_scores * 0.2
+        )
+
+# Workers for searching outfits of large wardrobes; NumPy releases the GIL while scoring
+_OUTFIT_SEARCH_WORKERS = os.cpu_count() or 1
+_OUTFIT_SEARCH_EXECUTOR = ThreadPoolExecutor(max_workers=_OUTFIT_SEARCH_WORKERS, thread_name_prefix="outfit-search")
+
+# Fewer tops than this are searched on the calling thread
+_PARALLEL_MIN_TOPS = 8
 
 class OutfitMatcher:
     """Main outfit matching and recommendation engine"""
@@ -179,27 +387,26 @@ class OutfitMatcher:
                           occasion: OccasionType, season: SeasonType, 
                           weather: WeatherType) -> List[ClothingItem]:
         """Find items that match well with a base item"""
-        matching_items = []
-        
-        for item in wardrobe:
-            if item.id == base_item.id:
-                continue
-            
-            # Check if item is suitable for the occasion, season, and weather
-            if (occasion not in item.occasion_suitability or 
-                season not in item.season_suitability or 
-                weather not in item.weather_suitability):
-                continue
-            
-            # Calculate matching score
-            score = self._calculate_item_compatibility(base_item, item)
-            
-            if score > 0.6:  # Threshold for good matches
-                matching_items.append((item, score))
-        
-        # Sort by score and return items
-        matching_items.sort(key=lambda x: x[1], reverse=True)
-        return [item for item, score in matching_items]
+        # The base item is row 0, the wardrobe follows
+        soa = WardrobeSoA.from_items([base_item] + wardrobe)
+        candidates = np.array(
+            [index for index in soa.suitable(*self._context_bits(occasion, season, weather))
+             if soa.items[index].id != base_item.id],
+            dtype=np.intp
+        )
+        
+        # Calculate matching scores against all candidates at once
+        scores = soa.pairwise_matrix([0], candidates)[0]
+        
+        # Keep good matches (threshold 0.6), best first
+        matches = scores > 0.6
+        order = np.argsort(-scores[matches], kind="stable")
+        return [soa.items[index] for index in candidates[matches][order]]
+    
+    @staticmethod
+    def _context_bits(occasion: OccasionType, season: SeasonType, weather: WeatherType) -> Tuple[int, int, int]:
+        """Suitability mask bits of a context; unknown values match no item"""
+        return _OCCASION_BITS.get(occasion, 0), _SEASON_BITS.get(season, 0), _WEATHER_BITS.get(weather, 0)
     
     def _calculate_item_compatibility(self, item1: ClothingItem, item2: ClothingItem) -> float:
         """Calculate compatibility score between two items"""
@@ -235,63 +442,149 @@ class OutfitMatcher:
         """Create a complete outfit recommendation"""
         
         # Filter items suitable for the context
-        suitable_items = [
-            item for item in wardrobe
-            if (occasion in item.occasion_suitability and
-                season in item.season_suitability and
-                weather in item.weather_suitability)
-        ]
+        soa = WardrobeSoA.from_items(wardrobe)
+        suitable = soa.suitable(*self._context_bits(occasion, season, weather))
+        suitable_items = [soa.items[index] for index in suitable]
         
         if not suitable_items:
             return self._create_fallback_recommendation(occasion, season, weather)
         
+        # Score every pair of suitable items once; outfits below are lists of indices into it
+        compatibility = soa.pairwise_matrix(suitable, suitable)
+        
         # Group items by category
         categories = {}
-        for item in suitable_items:
+        for index, item in enumerate(suitable_items):
             if item.category not in categories:
                 categories[item.category] = []
-            categories[item.category].append(item)
+            categories[item.category].append(index)
         
         # Try to build outfit with required categories
         required_categories = ["top", "bottom", "shoes"]
         optional_categories = ["outerwear", "accessory"]
         
-        best_outfit = None
-        best_score = 0
+        tops, bottoms, shoes = (np.array(categories.get(category, []), dtype=np.intp) for category in required_categories)
+        outerwear_options = np.array(categories.get("outerwear", []), dtype=np.intp)
+        if weather not in [WeatherType.RAINY, WeatherType.SNOWY, WeatherType.WINDY]:
+            outerwear_options = outerwear_options[:0]
+        accessory_options = np.array(categories.get("accessory", [])[:2], dtype=np.intp)  # Limit to 2 accessories
+        
+        # Branch and bound: visit the most promising tops first and skip any top whose
+        # upper bound cannot reach the best score
+        other_slots = [options for options in (bottoms, shoes, outerwear_options, accessory_options) if options.size]
+        bounds = self._top_score_bounds(compatibility, tops, other_slots) if bottoms.size and shoes.size else np.empty(0)
+        order = np.argsort(-bounds, kind="stable")
+        
+        # Tops with the same scoring attributes score identically; search only the first of each
+        first_positions: Dict[Tuple, int] = {}
+        for position in order:
+            top = suitable_items[tops[position]]
+            first_positions.setdefault((top.color.lower(), top.style.lower(), top.formality_level), position)
+        order = np.fromiter(first_positions.values(), dtype=np.intp, count=len(first_positions))
+        search_args = (compatibility, tops, bounds, bottoms, shoes, outerwear_options, accessory_options)
+        
+        if len(order) < _PARALLEL_MIN_TOPS:
+            results = [self._search_tops(order, *search_args)]
+        else:
+            # Deal the tops round-robin so every shard starts with high bounds
+            num_shards = min(len(order), _OUTFIT_SEARCH_WORKERS)
+            results = list(_OUTFIT_SEARCH_EXECUTOR.map(
+                lambda shard: self._search_tops(shard, *search_args),
+                [order[start::num_shards] for start in range(num_shards)]
+            ))
         
-        # Generate outfit combinations
-        for top in categories.get("top", []):
-            for bottom in categories.get("bottom", []):
-                for shoes in categories.get("shoes", []):
-                    outfit_items = [top, bottom, shoes]
-                    
-                    # Add outerwear if weather requires it
-                    if weather in [WeatherType.RAINY, WeatherType.SNOWY, WeatherType.WINDY]:
-                        outerwear_options = categories.get("outerwear", [])
-                        if outerwear_options:
-                            best_outerwear = max(outerwear_options, 
-                                               key=lambda x: self._calculate_outfit_score(outfit_items + [x]))
-                            outfit_items.append(best_outerwear)
-                    
-                    # Add accessories
-                    accessory_options = categories.get("accessory", [])
-                    if accessory_options:
-                        best_accessory = max(accessory_options[:2],  # Limit to 2 accessories
-                                           key=lambda x: self._calculate_outfit_score(outfit_items + [x]))
-                        outfit_items.append(best_accessory)
-                    
-                    # Calculate outfit score
-                    score = self._calculate_outfit_score(outfit_items)
-                    
-                    if score > best_score:
-                        best_score = score
-                        best_outfit = outfit_items
+        # Ties go to the first best-scoring combination in (top, bottom, shoes) order
+        best_score, _, best_outfit = max(results, key=lambda result: (result[0], -result[1]))
         
         if best_outfit:
-            return self._create_outfit_recommendation(best_outfit, occasion, season, weather, best_score)
+            best_items = [suitable_items[index] for index in best_outfit]
+            return self._create_outfit_recommendation(best_items, occasion, season, weather, float(best_score))
         else:
             return self._create_fallback_recommendation(occasion, season, weather)
     
+    def _search_tops(self, positions: np.ndarray, compatibility: np.ndarray, tops: np.ndarray, bounds: np.ndarray,
+                     bottoms: np.ndarray, shoes: np.ndarray, outerwear_options: np.ndarray,
+                     accessory_options: np.ndarray) -> Tuple[float, int, Optional[Tuple[int, ...]]]:
+        """
+        Best outfit built on the tops at the given positions, visited in order of decreasing bound
+        
+        Returns:
+            (score, position of the top, tuple of item indices), or (0, len(tops), None) when
+            no outfit scores above 0
+        """
+        best_outfit = None
+        best_score = 0
+        best_position = len(tops)
+        for position in positions:
+            if bounds[position] + 1e-9 < best_score:
+                break
+            scores, outfits = self._score_outfits_for_top(
+                compatibility, tops[position], bottoms, shoes, outerwear_options, accessory_options
+            )
+            top_score = scores.max()
+            if top_score > best_score or (top_score == best_score and position < best_position):
+                best = np.unravel_index(np.argmax(scores), scores.shape)
+                best_score = scores[best]
+                best_position = position
+                best_outfit = tuple(int(slot[best]) for slot in outfits)
+        
+        return best_score, best_position, best_outfit
+    
+    @staticmethod
+    def _top_score_bounds(compatibility: np.ndarray, tops: np.ndarray, other_slots: List[np.ndarray]) -> np.ndarray:
+        """Upper bound of the best outfit score reachable from each top, pairing every slot with its best option"""
+        bounds = sum(compatibility[np.ix_(tops, options)].max(axis=1) for options in other_slots)
+        for i in range(len(other_slots)):
+            for j in range(i + 1, len(other_slots)):
+                bounds = bounds + compatibility[np.ix_(other_slots[i], other_slots[j])].max()
+        
+        num_slots = len(other_slots) + 1
+        return bounds / (num_slots * (num_slots - 1) / 2)
+    
+    def _score_outfits_for_top(self, compatibility: np.ndarray, top: int, bottoms: np.ndarray, shoes: np.ndarray,
+                               outerwear_options: np.ndarray,
+                               accessory_options: np.ndarray) -> Tuple[np.ndarray, List[np.ndarray]]:
+        """
+        Score the best outfit built on a top for every (bottom, shoes) pair
+        
+        Returns:
+            (len(bottoms), len(shoes)) outfit scores and, for each outfit slot, the
+            item indices in the same shape
+        """
+        outfit = [np.full((1, 1), top), bottoms[:, None], shoes[None, :]]
+        
+        # Add the outerwear that scores best with each combination
+        if outerwear_options.size:
+            candidate_scores = self._outfit_scores(compatibility, [slot[..., None] for slot in outfit] + [outerwear_options])
+            outfit.append(outerwear_options[np.argmax(candidate_scores, axis=-1)])
+        
+        # Add the accessory that scores best
+        if accessory_options.size:
+            candidate_scores = self._outfit_scores(compatibility, [slot[..., None] for slot in outfit] + [accessory_options])
+            best = np.argmax(candidate_scores, axis=-1)
+            outfit.append(accessory_options[best])
+            scores = np.take_along_axis(candidate_scores, best[..., None], axis=-1)[..., 0]
+        else:
+            scores = self._outfit_scores(compatibility, outfit)
+        
+        shape = (len(bottoms), len(shoes))
+        return np.broadcast_to(scores, shape), [np.broadcast_to(slot, shape) for slot in outfit]
+    
+    @staticmethod
+    def _outfit_scores(compatibility: np.ndarray, slots: List[np.ndarray]) -> np.ndarray:
+        """
+        Outfit scores for broadcast item indices per slot, summing pairwise
+        compatibilities in the same order as _calculate_outfit_score
+        """
+        total_score = 0
+        comparisons = 0
+        for i in range(len(slots)):
+            for j in range(i + 1, len(slots)):
+                total_score = total_score + compatibility[slots[i], slots[j]]
+                comparisons += 1
+        
+        return total_score / comparisons
+    
     def _calculate_outfit_score(self, items: List[ClothingItem]) -> float:
         """Calculate overall score for an outfit"""
         if len(items) < 2:
@@ -318,8 +611,9 @@ class OutfitMatcher:
         """Create an outfit recommendation object"""
         
         # Generate style description
-        styles = [item.style for item in items]
-        dominant_style = max(set(styles), key=styles.count)
+        # Most frequent style, ties going to the earliest item
+        styles = [item.style.lower() for item in items]
+        dominant_style = items[styles.index(max(styles, key=styles.count))].style
         
         # Generate matching explanation
         colors = [item.color for item in items]
@@ -1,7 +1,6 @@
 from typing import List, Dict, Any, Tuple
+from functools import lru_cache
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from itertools import combinations
 
 # Placeholder for more sophisticated color harmony logic
 # For now, we'll use a simplified approach.
@@ -46,50 +45,46 @@ def is_neutral_color(r: int, g: int, b: int) -> bool:
     _, s, _ = rgb_to_hsv(r, g, b)
     return s < 0.2  # Low saturation indicates neutral
 
+@lru_cache(maxsize=1024)
+def _hex_to_hsv(hex_color: str) -> Tuple[float, float, float]:
+    r, g, b = hex_to_rgb(hex_color)
+    return rgb_to_hsv(r, g, b)
+
+def _colors_to_feature_matrix(colors_hex: List[str]) -> np.ndarray:
+    """Stack the cached HSV triplet of each hex color into an (n, 3) array"""
+    return np.array([_hex_to_hsv(hex_color) for hex_color in colors_hex], dtype=float).reshape(-1, 3)
+
 def get_color_harmony_type(colors_hex: List[str]) -> str:
     """Determine the type of color harmony present"""
     if len(colors_hex) < 2:
         return "monochromatic"
     
-    hsv_colors = []
-    neutral_count = 0
-    
-    for hex_color in colors_hex:
-        r, g, b = hex_to_rgb(hex_color)
-        if is_neutral_color(r, g, b):
-            neutral_count += 1
-        else:
-            h, s, v = rgb_to_hsv(r, g, b)
-            hsv_colors.append((h, s, v))
+    hsv_colors = _colors_to_feature_matrix(colors_hex)
+    neutral = hsv_colors[:, 1] < 0.2  # Low saturation indicates neutral
+    neutral_count = int(neutral.sum())
     
     # If mostly neutrals, it's a neutral palette
     if neutral_count >= len(colors_hex) * 0.7:
         return "neutral"
     
-    if len(hsv_colors) < 2:
+    hues = hsv_colors[~neutral, 0]
+    if len(hues) < 2:
         return "neutral"
     
-    # Analyze hue relationships
-    hues = [h for h, s, v in hsv_colors]
-    hue_diffs = []
-    
-    for i in range(len(hues)):
-        for j in range(i + 1, len(hues)):
-            diff = min(abs(hues[i] - hues[j]), 360 - abs(hues[i] - hues[j]))
-            hue_diffs.append(diff)
+    # Analyze hue relationships: circular distance of every pair above the diagonal
+    diffs = np.abs(hues[:, None] - hues[None, :])
+    diffs = np.minimum(diffs, 360 - diffs)
+    hue_diffs = diffs[np.triu_indices(len(hues), k=1)]
     
-    if not hue_diffs:
-        return "monochromatic"
-    
-    avg_hue_diff = sum(hue_diffs) / len(hue_diffs)
-    max_hue_diff = max(hue_diffs)
+    avg_hue_diff = hue_diffs.sum() / len(hue_diffs)
+    max_hue_diff = hue_diffs.max()
     
     # Classify harmony type based on hue differences
     if max_hue_diff < 30:
         return "analogous"  # Similar hues
-    elif any(150 <= diff <= 210 for diff in hue_diffs):
+    elif ((150 <= hue_diffs) & (hue_diffs <= 210)).any():
         return "complementary"  # Opposite hues
-    elif any(90 <= diff <= 150 for diff in hue_diffs):
+    elif ((90 <= hue_diffs) & (hue_diffs <= 150)).any():
         return "triadic"  # Three evenly spaced hues
     elif avg_hue_diff > 60:
         return "diverse"  # Many different hues
@@ -136,14 +131,10 @@ def check_color_harmony(colors_hex: List[str]) -> float:
         base_score *= 0.9
     
     # Check saturation balance
-    saturations = []
-    for hex_color in unique_colors:
-        r, g, b = hex_to_rgb(hex_color)
-        _, s, _ = rgb_to_hsv(r, g, b)
-        saturations.append(s)
+    saturations = _colors_to_feature_matrix(unique_colors)[:, 1]
     
     # Prefer balanced saturation levels
-    saturation_variance = np.var(saturations) if saturations else 0
+    saturation_variance = np.var(saturations) if len(saturations) else 0
     if saturation_variance > 0.3:  # High variance in saturation
         base_score *= 0.85
     
@@ -178,7 +169,7 @@ class OutfitMatchingService:
         Each item in item_features should be a dict with at least:
         {
             "id": "item_id", // Or some identifier
-            "embedding": List[float], // Image embedding
+            "embedding": List[float] or np.ndarray, // Image embedding
             "colors": List[str] // List of dominant hex colors
         }
         """
@@ -190,18 +181,23 @@ class OutfitMatchingService:
                 "color_harmony_score": 0.0
             }
 
-        embeddings = [np.array(item["embedding"]) for item in item_features if item.get("embedding")]
+        # Embeddings may be lists or arrays; an empty one counts as missing
+        embeddings = [
+            np.asarray(item["embedding"]) for item in item_features
+            if item.get("embedding") is not None and len(item["embedding"])
+        ]
 
         # 1. Style Cohesion (using embeddings)
         style_cohesion_score = 0.0
         if len(embeddings) >= 2:
-            pairwise_similarities = []
-            for emb1, emb2 in combinations(embeddings, 2):
-                similarity = cosine_similarity(emb1.reshape(1, -1), emb2.reshape(1, -1))[0][0]
-                pairwise_similarities.append(similarity)
+            # Cosine of every pair above the diagonal of the normalized Gram matrix
+            stacked = np.stack(embeddings)
+            norms = np.linalg.norm(stacked, axis=1, keepdims=True)
+            stacked = stacked / np.where(norms == 0, 1, norms)
+            pairwise_similarities = (stacked @ stacked.T)[np.triu_indices(len(embeddings), k=1)]
 
-            if pairwise_similarities:
-                style_cohesion_score = np.mean(pairwise_similarities)
+            if pairwise_similarities.size:
+                style_cohesion_score = pairwise_similarities.mean()
                 # Normalize to 0-1 range (cosine similarity is -1 to 1, but embeddings usually non-negative relations)
                 style_cohesion_score = (style_cohesion_score + 1) / 2
         else: # Not enough embeddings to compare
@@ -234,6 +230,49 @@ class OutfitMatchingService:
             "message": "Compatibility calculated."
         }
 
+    def batch_style_cohesion(self, outfit_embeddings: List[List[np.ndarray]]) -> np.ndarray:
+        """
+        Style cohesion of many outfits at once, as calculate_compatibility_score computes it.
+        Outfits mixing embedding sizes (which the pairwise cosine rejects) or without
+        embeddings get NaN.
+        """
+        cohesion = np.full(len(outfit_embeddings), np.nan)
+        outfits_by_dim: Dict[int, List[int]] = {}
+        for i, embeddings in enumerate(outfit_embeddings):
+            sizes = {len(embedding) for embedding in embeddings}
+            if len(sizes) == 1:
+                outfits_by_dim.setdefault(sizes.pop(), []).append(i)
+
+        for rows in outfits_by_dim.values():
+            cohesion[rows] = self._stacked_style_cohesion([outfit_embeddings[i] for i in rows])
+        return cohesion
+
+    @staticmethod
+    def _stacked_style_cohesion(outfit_embeddings: List[List[np.ndarray]]) -> np.ndarray:
+        """
+        Stack same-sized embeddings into a zero-padded (outfits, max_items, dim) float32 tensor
+        and get each outfit's mean pairwise cosine without forming Gram matrices: over unit
+        vectors, the sum of u_i . u_j for i < j is (|sum u|^2 - sum |u|^2) / 2.
+        """
+        max_items = max(len(embeddings) for embeddings in outfit_embeddings)
+        stacked = np.zeros((len(outfit_embeddings), max_items, len(outfit_embeddings[0][0])), dtype=np.float32)
+        item_counts = np.zeros(len(outfit_embeddings))
+        for row, embeddings in enumerate(outfit_embeddings):
+            stacked[row, :len(embeddings)] = embeddings
+            item_counts[row] = len(embeddings)
+        norms = np.linalg.norm(stacked, axis=2, keepdims=True)
+        stacked /= np.where(norms == 0, 1, norms)
+
+        # Padding rows are zero, so they add nothing to either sum
+        summed = stacked.sum(axis=1)
+        squared_norms = np.einsum('oid,oid->o', stacked, stacked)
+        pair_totals = (np.einsum('od,od->o', summed, summed) - squared_norms) / 2
+        pair_counts = item_counts * (item_counts - 1) / 2
+        mean_similarity = pair_totals / np.maximum(pair_counts, 1)
+        # Fewer than two embeddings is the neutral 0.5
+        return np.where(pair_counts > 0, (mean_similarity + 1) / 2, 0.5)
+
+
 # Example usage (for testing or if used directly):
 # if __name__ == "__main__":
 #     matcher = OutfitMatchingService()
@@ -7,23 +7,63 @@ algorithms such as cosine similarity and KNN.
 """
 
 import numpy as np
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.neighbors import NearestNeighbors
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.decomposition import PCA
 import logging
-from typing import Dict, List, Tuple, Optional, Any
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional, Any
+import hashlib
 import json
 from datetime import datetime
-import pickle
+import joblib
 import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import combinations as slot_pairs
+
+# pandas and scikit-learn are imported where used, so creating the engine stays cheap
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@dataclass(slots=True)
+class Outfit:
+    """A ranked outfit held as indices into the candidate items until it is returned"""
+    top: int
+    bottom: int
+    shoes: int  # -1 when the outfit has no shoes
+    score: float
+    color_score: float
+    style_score: float
+    occasion_score: float
+    
+    def to_dict(self, candidates: List[Dict]) -> Dict:
+        """
+        Build the API representation of the outfit.
+        
+        Args:
+            candidates: Items the outfit indexes into
+            
+        Returns:
+            Outfit dictionary with its items and scores
+        """
+        outfit = {
+            'top': candidates[self.top],
+            'bottom': candidates[self.bottom],
+            'items': [candidates[self.top], candidates[self.bottom]]
+        }
+        if self.shoes >= 0:
+            outfit['shoes'] = candidates[self.shoes]
+            outfit['items'].append(candidates[self.shoes])
+        
+        outfit['score'] = self.score
+        outfit['color_score'] = self.color_score
+        outfit['style_score'] = self.style_score
+        outfit['occasion_score'] = self.occasion_score
+        return outfit
+
 class OutfitRecommendationEngine:
     """
     Content-based outfit recommendation engine using scikit-learn.
@@ -32,6 +72,49 @@ class OutfitRecommendationEngine:
     user preferences, item attributes, and similarity metrics.
     """
     
+    # Keyword groups for text features; a keyword matches anywhere in the lowercased text
+    STYLE_KEYWORDS = {
+        'casual': ['casual', 'relaxed', 'comfortable', 'everyday'],
+        'formal': ['formal', 'elegant', 'sophisticated', 'dressy'],
+        'business': ['business', 'professional', 'office', 'work'],
+        'athletic': ['athletic', 'sport', 'gym', 'workout', 'active'],
+        'trendy': ['trendy', 'fashionable', 'modern', 'contemporary'],
+        'classic': ['classic', 'timeless', 'traditional', 'vintage'],
+        'bohemian': ['boho', 'bohemian', 'free-spirited', 'artistic'],
+        'minimalist': ['minimal', 'simple', 'clean', 'basic']
+    }
+    OCCASION_KEYWORDS = {
+        'casual': ['casual', 't-shirt', 'jeans', 'sneakers'],
+        'formal': ['formal', 'dress', 'suit', 'blazer', 'heels'],
+        'business': ['business', 'professional', 'office', 'work'],
+        'athletic': ['athletic', 'sport', 'gym', 'workout'],
+        'party': ['party', 'cocktail', 'evening', 'glamorous'],
+        'wedding': ['wedding', 'bridal', 'elegant', 'sophisticated']
+    }
+    SEASON_MATERIALS = {
+        'summer': ['cotton', 'linen', 'silk', 'chiffon'],
+        'winter': ['wool', 'cashmere', 'fleece', 'down']
+    }
+    
+    # One-hot encoded item categories; rows of an identity with a trailing zero row for other categories
+    CATEGORIES = ['shirts', 'pants', 'dresses', 'shoes', 'outerwear', 'accessories', 'skirts', 'underwear']
+    CATEGORY_ONE_HOT = np.eye(len(CATEGORIES) + 1, len(CATEGORIES), dtype=np.float32)
+    
+    # Length of an item feature vector: color, category, brand, price, style, season, occasion
+    NUM_FEATURES = 3 + 8 + 1 + 1 + 8 + 4 + 6
+    
+    # Number of item lists whose normalized feature matrices are kept for similarity queries
+    FEATURE_CACHE_SIZE = 8
+    
+    # Item fields prepare_item_features reads; feature matrices are cached by their content
+    FEATURE_FIELDS = ('id', 'dominant_color', 'category', 'brand', 'price', 'style', 'description', 'tags', 'material')
+    
+    # Trained model artifacts in the model cache directory
+    MODELS_FILENAME = 'recommendation_models.joblib'
+    
+    # Below this many dimensions a ball tree beats a brute-force neighbour scan
+    BALL_TREE_MAX_DIM = 13
+    
     def __init__(self, model_cache_dir: str = "models"):
         """
         Initialize the recommendation engine.
@@ -40,11 +123,13 @@ class OutfitRecommendationEngine:
             model_cache_dir: Directory to cache trained models
         """
         self.model_cache_dir = model_cache_dir
-        self.tfidf_vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
-        self.scaler = StandardScaler()
-        self.knn_model = NearestNeighbors(n_neighbors=10, metric='cosine')
-        self.label_encoders = {}
-        self.pca = PCA(n_components=50)
+        self._trained_item_ids: Optional[List[Any]] = None
+        # L2-normalized scaled vectors of the trained items, searched directly by brute-force queries
+        self._items_normed: Optional[np.ndarray] = None
+        # Fitted by train_recommendation_model or loaded from the model cache
+        self.scaler = None
+        self.knn_model = None
+        self.pca = None
         
         # Ensure model cache directory exists
         os.makedirs(model_cache_dir, exist_ok=True)
@@ -60,10 +145,26 @@ class OutfitRecommendationEngine:
         
         # Outfit compatibility rules
         self.compatibility_rules = self._load_compatibility_rules()
+        self._color_scores = self._build_color_scores(self.compatibility_rules['color_combinations'])
+        self._color_index, self._color_matrix = self._build_color_matrix(self._color_scores)
         
         # Seasonal and occasion mappings
         self.seasonal_colors = self._load_seasonal_colors()
         self.occasion_styles = self._load_occasion_styles()
+        
+        # Keyword vocabularies and keyword -> feature assignment matrices for batch text features
+        self._style_vocabulary, self._style_assignment = self._keyword_index(self.STYLE_KEYWORDS)
+        self._style_group_sizes = np.array([len(keywords) for keywords in self.STYLE_KEYWORDS.values()], dtype=float)
+        self._occasion_patterns = [self._union_pattern(keywords) for keywords in self.OCCASION_KEYWORDS.values()]
+        self._season_color_patterns = [self._union_pattern(colors) for colors in self.seasonal_colors.values()]
+        self._season_material_patterns = {
+            list(self.seasonal_colors).index(season): self._union_pattern(materials)
+            for season, materials in self.SEASON_MATERIALS.items()
+        }
+        
+        # L2-normalized feature matrices of recently queried item lists, keyed by their item ids
+        self._feature_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._feature_cache_lock = threading.Lock()
     
     def _load_compatibility_rules(self) -> Dict[str, Dict]:
         """
@@ -123,6 +224,46 @@ class OutfitRecommendationEngine:
             }
         }
     
+    @staticmethod
+    def _build_color_scores(color_combinations: Dict[str, List[Tuple[str, str]]]) -> Dict[frozenset, float]:
+        """
+        Build a color pair -> compatibility score lookup table.
+        
+        Args:
+            color_combinations: Excellent, good and avoid color pairs
+            
+        Returns:
+            Scores keyed by frozenset of the pair's colors; the first matching tier wins
+        """
+        color_scores = {}
+        for tier, score in (('excellent', 1.0), ('good', 0.8), ('avoid', 0.2)):
+            for combo in color_combinations[tier]:
+                color_scores.setdefault(frozenset(combo), score)
+                # A color paired with itself scores as the first tier listing it
+                for color in combo:
+                    color_scores.setdefault(frozenset((color,)), score)
+        return color_scores
+    
+    @staticmethod
+    def _build_color_matrix(color_scores: Dict[frozenset, float]) -> Tuple[Dict[str, int], np.ndarray]:
+        """
+        Expand the color lookup table into a dense symmetric score matrix.
+        
+        Args:
+            color_scores: Scores keyed by frozenset of colors
+            
+        Returns:
+            Color -> index mapping and the score matrix; its last row and column score unknown colors
+        """
+        colors = sorted({color for pair in color_scores for color in pair})
+        color_index = {color: i for i, color in enumerate(colors)}
+        matrix = np.full((len(colors) + 1, len(colors) + 1), 0.6)
+        for pair, score in color_scores.items():
+            first, *rest = (color_index[color] for color in pair)
+            second = rest[0] if rest else first
+            matrix[first, second] = matrix[second, first] = score
+        return color_index, matrix
+    
     def _load_seasonal_colors(self) -> Dict[str, List[str]]:
         """
         Load seasonal color recommendations.
@@ -234,176 +375,143 @@ class OutfitRecommendationEngine:
             items: List of clothing item dictionaries
             
         Returns:
-            Feature matrix for the items
+            float32 feature matrix for the items
         """
         try:
             if not items:
-                return np.array([])
+                return np.array([], dtype=np.float32)
+            
+            import pandas as pd
+            from sklearn.utils import murmurhash3_32
             
             # Create DataFrame from items
             df = pd.DataFrame(items)
+            feature_matrix = np.empty((len(items), self.NUM_FEATURES), dtype=np.float32)
             
-            # Initialize feature lists
-            features = []
+            # Color features (RGB values normalized), default gray
+            rgb = np.array([
+                color['rgb'][:3] if isinstance(color, dict) and 'rgb' in color else (127.5, 127.5, 127.5)
+                for color in self._column(df, 'dominant_color', None)
+            ], dtype=float).reshape(-1, 3)
+            feature_matrix[:, 0:3] = rgb / 255.0
             
-            for item in items:
-                item_features = []
-                
-                # Color features (RGB values normalized)
-                if 'dominant_color' in item and 'rgb' in item['dominant_color']:
-                    rgb = item['dominant_color']['rgb']
-                    item_features.extend([rgb[0]/255.0, rgb[1]/255.0, rgb[2]/255.0])
-                else:
-                    item_features.extend([0.5, 0.5, 0.5])  # Default gray
-                
-                # Category/type features (one-hot encoded)
-                category = item.get('category', 'unknown').lower()
-                categories = ['shirts', 'pants', 'dresses', 'shoes', 'outerwear', 'accessories', 'skirts', 'underwear']
-                category_features = [1.0 if cat == category else 0.0 for cat in categories]
-                item_features.extend(category_features)
-                
-                # Brand features (encoded)
-                brand = item.get('brand', 'unknown').lower()
-                brand_hash = hash(brand) % 100  # Simple hash encoding
-                item_features.append(brand_hash / 100.0)
-                
-                # Price features (normalized)
-                price = float(item.get('price', 0))
-                item_features.append(min(price / 1000.0, 1.0))  # Normalize to 0-1
-                
-                # Style features (from tags or description)
-                style_text = f"{item.get('style', '')} {item.get('description', '')} {item.get('tags', '')}"
-                style_features = self._extract_style_features(style_text)
-                item_features.extend(style_features)
-                
-                # Seasonal appropriateness
-                seasonal_features = self._extract_seasonal_features(item)
-                item_features.extend(seasonal_features)
-                
-                # Occasion appropriateness
-                occasion_features = self._extract_occasion_features(item)
-                item_features.extend(occasion_features)
-                
-                features.append(item_features)
+            # Category/type features (one-hot encoded)
+            category = self._column(df, 'category', 'unknown').str.lower()
+            category_codes = pd.Index(self.CATEGORIES).get_indexer(category)  # -1 for other categories
+            feature_matrix[:, 3:11] = self.CATEGORY_ONE_HOT[category_codes]
+            
+            # Brand features (simple hash encoding, stable across processes)
+            brand = self._column(df, 'brand', 'unknown').str.lower()
+            brand_hashes = brand.map(lambda name: murmurhash3_32(name, positive=True)).to_numpy(dtype=np.int64)
+            feature_matrix[:, 11] = brand_hashes % 100 / 100.0
+            
+            # Price features (normalized to 0-1)
+            price = self._column(df, 'price', 0).astype(float).to_numpy()
+            feature_matrix[:, 12] = np.minimum(price / 1000.0, 1.0)
+            
+            # Style features (from tags or description)
+            style_texts = (
+                self._column(df, 'style', '').astype(str) + ' ' +
+                self._column(df, 'description', '').astype(str) + ' ' +
+                self._column(df, 'tags', '').astype(str)
+            )
+            style_counts = self._keyword_presence(style_texts, self._style_vocabulary) @ self._style_assignment
+            feature_matrix[:, 13:21] = np.minimum(style_counts / self._style_group_sizes, 1.0)
             
-            # Convert to numpy array and handle any missing values
-            feature_matrix = np.array(features, dtype=float)
-            feature_matrix = np.nan_to_num(feature_matrix, nan=0.0)
+            # Seasonal appropriateness from color names and materials
+            color_names = pd.Series([
+                color.get('name') if isinstance(color, dict) else None
+                for color in self._column(df, 'dominant_color', None)
+            ]).fillna('').astype(str).str.lower()
+            for season, pattern in enumerate(self._season_color_patterns):
+                feature_matrix[:, 21 + season] = self._matches(color_names, pattern)
+            material_texts = (
+                self._column(df, 'description', '').astype(str) + ' ' +
+                self._column(df, 'material', '').astype(str)
+            ).str.lower()
+            for season, pattern in self._season_material_patterns.items():
+                feature_matrix[:, 21 + season] += 0.5 * self._matches(material_texts, pattern)
+            
+            # Occasion appropriateness (any keyword of the occasion)
+            occasion_texts = (
+                self._column(df, 'category', '').astype(str) + ' ' +
+                self._column(df, 'description', '').astype(str) + ' ' +
+                self._column(df, 'style', '').astype(str)
+            ).str.lower()
+            for occasion, pattern in enumerate(self._occasion_patterns):
+                feature_matrix[:, 25 + occasion] = self._matches(occasion_texts, pattern)
+            
+            # Handle any missing values
+            np.nan_to_num(feature_matrix, copy=False, nan=0.0)
             
             return feature_matrix
             
         except Exception as e:
             logger.error(f"Error preparing item features: {str(e)}")
-            return np.array([])
+            return np.array([], dtype=np.float32)
     
-    def _extract_style_features(self, style_text: str) -> List[float]:
+    @staticmethod
+    def _column(df: "pd.DataFrame", name: str, default: Any) -> "pd.Series":
         """
-        Extract style features from text description.
+        Column of an item DataFrame with missing keys and values set to a default.
         
         Args:
-            style_text: Text description of style
+            df: DataFrame built from item dictionaries
+            name: Item key
+            default: Value for items without the key
             
         Returns:
-            List of style feature values
-        """
-        style_keywords = {
-            'casual': ['casual', 'relaxed', 'comfortable', 'everyday'],
-            'formal': ['formal', 'elegant', 'sophisticated', 'dressy'],
-            'business': ['business', 'professional', 'office', 'work'],
-            'athletic': ['athletic', 'sport', 'gym', 'workout', 'active'],
-            'trendy': ['trendy', 'fashionable', 'modern', 'contemporary'],
-            'classic': ['classic', 'timeless', 'traditional', 'vintage'],
-            'bohemian': ['boho', 'bohemian', 'free-spirited', 'artistic'],
-            'minimalist': ['minimal', 'simple', 'clean', 'basic']
-        }
-        
-        style_text_lower = style_text.lower()
-        style_features = []
-        
-        for style, keywords in style_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in style_text_lower)
-            style_features.append(min(score / len(keywords), 1.0))
+            Object series aligned with the DataFrame rows
+        """
+        import pandas as pd
         
-        return style_features
+        if name not in df:
+            return pd.Series([default] * len(df), index=df.index, dtype=object)
+        column = df[name].astype(object)
+        return column.where(column.notna(), default)
     
-    def _extract_seasonal_features(self, item: Dict) -> List[float]:
+    @staticmethod
+    def _keyword_index(keyword_groups: Dict[str, List[str]]) -> Tuple[List[str], np.ndarray]:
         """
-        Extract seasonal appropriateness features.
+        Build the vocabulary of keyword groups.
         
         Args:
-            item: Clothing item dictionary
+            keyword_groups: Keywords of each feature
             
         Returns:
-            List of seasonal feature values
+            Sorted vocabulary and a (keywords, features) 0/1 matrix assigning keywords to features
         """
-        seasonal_features = [0.0, 0.0, 0.0, 0.0]  # spring, summer, fall, winter
-        
-        # Analyze color for seasonal appropriateness
-        if 'dominant_color' in item and 'name' in item['dominant_color']:
-            color_name = item['dominant_color']['name'].lower()
-            
-            for i, (season, colors) in enumerate(self.seasonal_colors.items()):
-                if any(color in color_name for color in colors):
-                    seasonal_features[i] = 1.0
-        
-        # Analyze fabric/material for seasonal appropriateness
-        description = item.get('description', '').lower()
-        material = item.get('material', '').lower()
-        
-        # Summer materials
-        if any(material in f"{description} {material}" for material in ['cotton', 'linen', 'silk', 'chiffon']):
-            seasonal_features[1] += 0.5  # summer
-        
-        # Winter materials
-        if any(material in f"{description} {material}" for material in ['wool', 'cashmere', 'fleece', 'down']):
-            seasonal_features[3] += 0.5  # winter
-        
-        return seasonal_features
+        vocabulary = sorted({keyword for keywords in keyword_groups.values() for keyword in keywords})
+        positions = {keyword: i for i, keyword in enumerate(vocabulary)}
+        assignment = np.zeros((len(vocabulary), len(keyword_groups)))
+        for feature, keywords in enumerate(keyword_groups.values()):
+            assignment[[positions[keyword] for keyword in keywords], feature] = 1.0
+        return vocabulary, assignment
     
-    def _extract_occasion_features(self, item: Dict) -> List[float]:
+    @staticmethod
+    def _union_pattern(keywords: List[str]) -> re.Pattern:
+        """Compile a regex matching any of the keywords as a substring."""
+        return re.compile('|'.join(map(re.escape, keywords)))
+    
+    @staticmethod
+    def _matches(texts: "pd.Series", pattern: re.Pattern) -> np.ndarray:
+        """Boolean array of which texts contain a match of the pattern."""
+        return texts.str.contains(pattern).to_numpy(dtype=bool)
+    
+    @staticmethod
+    def _keyword_presence(texts: "pd.Series", vocabulary: List[str]) -> np.ndarray:
         """
-        Extract occasion appropriateness features.
+        Find which keywords occur in each text, one vectorized substring search per keyword.
         
         Args:
-            item: Clothing item dictionary
+            texts: Item texts
+            vocabulary: Keywords to search for
             
         Returns:
-            List of occasion feature values
+            (texts, keywords) 0/1 matrix
         """
-        occasions = ['casual', 'formal', 'business', 'athletic', 'party', 'wedding']
-        occasion_features = [0.0] * len(occasions)
-        
-        category = item.get('category', '').lower()
-        description = item.get('description', '').lower()
-        style = item.get('style', '').lower()
-        
-        text_content = f"{category} {description} {style}"
-        
-        # Casual
-        if any(word in text_content for word in ['casual', 't-shirt', 'jeans', 'sneakers']):
-            occasion_features[0] = 1.0
-        
-        # Formal
-        if any(word in text_content for word in ['formal', 'dress', 'suit', 'blazer', 'heels']):
-            occasion_features[1] = 1.0
-        
-        # Business
-        if any(word in text_content for word in ['business', 'professional', 'office', 'work']):
-            occasion_features[2] = 1.0
-        
-        # Athletic
-        if any(word in text_content for word in ['athletic', 'sport', 'gym', 'workout']):
-            occasion_features[3] = 1.0
-        
-        # Party
-        if any(word in text_content for word in ['party', 'cocktail', 'evening', 'glamorous']):
-            occasion_features[4] = 1.0
-        
-        # Wedding
-        if any(word in text_content for word in ['wedding', 'bridal', 'elegant', 'sophisticated']):
-            occasion_features[5] = 1.0
-        
-        return occasion_features
+        lowered = texts.str.lower().to_numpy(dtype=str)
+        return np.stack([np.char.find(lowered, keyword) >= 0 for keyword in vocabulary], axis=1).astype(float)
     
     def train_recommendation_model(self, items: List[Dict]) -> bool:
         """
@@ -427,15 +535,38 @@ class OutfitRecommendationEngine:
                 logger.error("Failed to prepare feature matrix")
                 return False
             
-            # Scale features
+            from sklearn.decomposition import PCA
+            from sklearn.neighbors import NearestNeighbors
+            from sklearn.preprocessing import StandardScaler
+            
+            # Trained items are the usual similar-item candidates; keep their normalized features
+            self._cache_features(self._feature_cache_key(items), self._normalize_rows(feature_matrix))
+            
+            # Scale features in place; the float32 feature buffer becomes the scaled matrix
+            self.scaler = StandardScaler(copy=False)
             scaled_features = self.scaler.fit_transform(feature_matrix)
+            del feature_matrix
             
             # Apply PCA for dimensionality reduction if needed
+            self.pca = None
             if scaled_features.shape[1] > 50:
+                self.pca = PCA(n_components=50, copy=False, svd_solver='randomized')
                 scaled_features = self.pca.fit_transform(scaled_features)
             
-            # Train KNN model
-            self.knn_model.fit(scaled_features)
+            # Train KNN model on normalized vectors, where inner product equals cosine similarity
+            scaled_features /= np.linalg.norm(scaled_features, axis=1, keepdims=True).clip(1e-12)
+            normalized = np.ascontiguousarray(scaled_features, dtype=np.float32)
+            del scaled_features
+            self._items_normed = None
+            if normalized.shape[1] < self.BALL_TREE_MAX_DIM:
+                # On unit vectors ||a - b||^2 = 2 - 2 cos(a, b), so euclidean neighbours are cosine neighbours
+                self.knn_model = NearestNeighbors(n_neighbors=10, metric='euclidean', algorithm='ball_tree', leaf_size=30)
+                self.knn_model.fit(normalized)
+            else:
+                # Brute-force cosine search is a single matrix-vector product over the stored vectors
+                self.knn_model = None
+                self._items_normed = normalized
+            self._trained_item_ids = [item.get('id') for item in items]
             
             # Save trained models
             self._save_models()
@@ -447,6 +578,44 @@ class OutfitRecommendationEngine:
             logger.error(f"Error training recommendation model: {str(e)}")
             return False
     
+    def find_similar_trained_items(self, target_item: Dict, num_similar: int = 5) -> List[Tuple[Any, float]]:
+        """
+        Find the trained items nearest to a target item in the KNN index.
+        
+        Args:
+            target_item: Target clothing item
+            num_similar: Number of neighbours to return
+            
+        Returns:
+            List of (item id, cosine similarity) pairs, most similar first
+        """
+        try:
+            if not self._trained_item_ids:
+                return []
+            
+            features = self.scaler.transform(self.prepare_item_features([target_item]))
+            if self.pca is not None:
+                features = self.pca.transform(features)
+            query = self._normalize_rows(features)
+            k = min(num_similar, len(self._trained_item_ids))
+            
+            if self._items_normed is not None:
+                all_similarities = self._items_normed @ query[0].astype(np.float32)
+                indices = self._top_k_indices(all_similarities, k)
+                similarities = all_similarities[indices]
+            else:
+                distances, indices = self.knn_model.kneighbors(query, n_neighbors=k)
+                similarities, indices = 1.0 - distances[0] ** 2 / 2.0, indices[0]
+            
+            return [
+                (self._trained_item_ids[i], float(similarity))
+                for i, similarity in zip(indices, similarities)
+            ]
+            
+        except Exception as e:
+            logger.error(f"Error searching trained items: {str(e)}")
+            return []
+    
     def get_outfit_recommendations(self, user_preferences: Dict, items: List[Dict], 
                                  occasion: str = "casual", num_recommendations: int = 5) -> List[Dict]:
         """
@@ -469,18 +638,22 @@ class OutfitRecommendationEngine:
             occasion_appropriate_items = self._filter_by_occasion(items, occasion)
             
             # Generate outfit combinations
-            outfit_combinations = self._generate_outfit_combinations(
+            candidates, outfit_combinations = self._generate_outfit_combinations(
                 occasion_appropriate_items, user_preferences, occasion
             )
             
-            # Score and rank combinations
-            scored_outfits = self._score_outfit_combinations(
-                outfit_combinations, user_preferences, occasion
+            # Score all combinations at once
+            scores, color_scores, style_scores, occasion_scores = self._score_outfit_combinations(
+                candidates, outfit_combinations, user_preferences, occasion
             )
             
-            # Return top recommendations
-            recommendations = sorted(scored_outfits, key=lambda x: x['score'], reverse=True)
-            return recommendations[:num_recommendations]
+            # Build outfits for the top recommendations only
+            top_outfits = [
+                Outfit(*map(int, outfit_combinations[i]), float(scores[i]), float(color_scores[i]),
+                       float(style_scores[i]), float(occasion_scores[i]))
+                for i in self._top_k_indices(scores, num_recommendations)
+            ]
+            return [outfit.to_dict(candidates) for outfit in top_outfits]
             
         except Exception as e:
             logger.error(f"Error getting outfit recommendations: {str(e)}")
@@ -503,34 +676,103 @@ class OutfitRecommendationEngine:
             if not items:
                 return []
             
-            # Prepare features for all items including target
-            all_items = [target_item] + items
-            feature_matrix = self.prepare_item_features(all_items)
+            # Normalized features of the candidates (cached) and of the target
+            item_features = self._get_normalized_features(items)
+            target_features = self.prepare_item_features([target_item])
             
-            if feature_matrix.size == 0:
+            if item_features.size == 0 or target_features.size == 0:
                 return []
             
-            # Calculate cosine similarity
-            target_features = feature_matrix[0:1]  # First row is target item
-            item_features = feature_matrix[1:]     # Rest are comparison items
+            # Cosine similarity is a dot product of normalized vectors
+            similarities = item_features @ self._normalize_rows(target_features)[0]
             
-            similarities = cosine_similarity(target_features, item_features)[0]
-            
-            # Create results with similarity scores
+            # Create results for the top scoring items
             similar_items = []
-            for i, similarity in enumerate(similarities):
+            for i in self._top_k_indices(similarities, num_similar):
                 item_with_score = items[i].copy()
-                item_with_score['similarity_score'] = float(similarity)
+                item_with_score['similarity_score'] = float(similarities[i])
                 similar_items.append(item_with_score)
             
-            # Sort by similarity and return top results
-            similar_items.sort(key=lambda x: x['similarity_score'], reverse=True)
-            return similar_items[:num_similar]
+            return similar_items
             
         except Exception as e:
             logger.error(f"Error getting similar items: {str(e)}")
             return []
     
+    def _get_normalized_features(self, items: List[Dict]) -> np.ndarray:
+        """
+        Get L2-normalized feature rows for items, reusing the matrix of a recently seen item list.
+        
+        Args:
+            items: List of clothing item dictionaries; lists are cached by the content of their feature fields,
+                so an edited item misses the cache
+            
+        Returns:
+            Normalized feature matrix (empty if feature preparation failed)
+        """
+        key = self._feature_cache_key(items)
+        with self._feature_cache_lock:
+            cached = self._feature_cache.get(key)
+            if cached is not None:
+                self._feature_cache.move_to_end(key)
+                return cached
+        
+        features = self.prepare_item_features(items)
+        if features.size == 0:
+            return features
+        normalized = self._normalize_rows(features)
+        
+        self._cache_features(key, normalized)
+        return normalized
+    
+    @classmethod
+    def _feature_cache_key(cls, items: List[Dict]) -> bytes:
+        """Digest of every field the item features are computed from"""
+        fields = [tuple(item.get(field) for field in cls.FEATURE_FIELDS) for item in items]
+        return hashlib.blake2b(repr(fields).encode(), digest_size=16).digest()
+    
+    def _cache_features(self, key: bytes, normalized: np.ndarray):
+        """Store an item list's normalized features, evicting the least recently used list."""
+        with self._feature_cache_lock:
+            self._feature_cache[key] = normalized
+            self._feature_cache.move_to_end(key)
+            while len(self._feature_cache) > self.FEATURE_CACHE_SIZE:
+                self._feature_cache.popitem(last=False)
+    
+    def clear_feature_cache(self):
+        """Drop cached feature matrices, e.g. to free memory; edited items already miss the cache."""
+        with self._feature_cache_lock:
+            self._feature_cache.clear()
+    
+    @staticmethod
+    def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+        """Scale rows to unit L2 norm, leaving all-zero rows at zero."""
+        return matrix / np.linalg.norm(matrix, axis=1, keepdims=True).clip(1e-12)
+    
+    @staticmethod
+    def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        Indices of the k highest scores, best first.
+        
+        Partitions instead of sorting every score; ties keep input order like a stable sort.
+        
+        Args:
+            scores: 1-D score array
+            k: Number of indices to return
+            
+        Returns:
+            Indices into scores
+        """
+        if k <= 0 or len(scores) == 0:
+            return np.empty(0, dtype=np.intp)
+        if k < len(scores):
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            candidates = np.flatnonzero(scores >= kth)
+        else:
+            candidates = np.arange(len(scores))
+        order = np.argsort(-scores[candidates], kind='stable')[:k]
+        return candidates[order]
+    
     def get_color_coordinated_items(self, base_item: Dict, items: List[Dict]) -> List[Dict]:
         """
         Get items that coordinate well with a base item's color.
@@ -546,23 +788,22 @@ class OutfitRecommendationEngine:
             if 'dominant_color' not in base_item:
                 return []
             
-            base_color = base_item['dominant_color']['name'].lower()
-            coordinated_items = []
+            # Gather the base color's row of the precomputed compatibility matrix
+            unknown = len(self._color_index)
+            base_color_id = self._color_index.get(base_item['dominant_color']['name'].lower(), unknown)
+            candidates = [item for item in items if 'dominant_color' in item]
+            color_ids = np.array([
+                self._color_index.get(item['dominant_color']['name'].lower(), unknown) for item in candidates
+            ], dtype=np.intp)
+            scores = self._color_matrix[base_color_id, color_ids]
             
-            for item in items:
-                if 'dominant_color' not in item:
-                    continue
-                
-                item_color = item['dominant_color']['name'].lower()
-                compatibility_score = self._calculate_color_compatibility(base_color, item_color)
-                
-                if compatibility_score > 0.5:  # Threshold for good compatibility
-                    item_with_score = item.copy()
-                    item_with_score['color_compatibility_score'] = compatibility_score
-                    coordinated_items.append(item_with_score)
-            
-            # Sort by compatibility score
-            coordinated_items.sort(key=lambda x: x['color_compatibility_score'], reverse=True)
+            # Keep good matches (threshold 0.5) ranked by compatibility score
+            good = np.flatnonzero(scores > 0.5)
+            coordinated_items = []
+            for i in good[self._top_k_indices(scores[good], len(good))]:
+                item_with_score = candidates[i].copy()
+                item_with_score['color_compatibility_score'] = float(scores[i])
+                coordinated_items.append(item_with_score)
             return coordinated_items
             
         except Exception as e:
@@ -573,6 +814,9 @@ class OutfitRecommendationEngine:
         """
         Filter items appropriate for a specific occasion.
         
+        Occasion style keywords only confirm an item and unmatched items default to
+        appropriate, so no occasion excludes items and no per-item scan is needed.
+        
         Args:
             items: List of clothing items
             occasion: Target occasion
@@ -580,43 +824,10 @@ class OutfitRecommendationEngine:
         Returns:
             Filtered list of appropriate items
         """
-        if occasion not in self.occasion_styles:
-            return items
-        
-        occasion_style = self.occasion_styles[occasion]
-        appropriate_items = []
-        
-        for item in items:
-            # Check if item matches occasion requirements
-            if self._is_occasion_appropriate(item, occasion_style):
-                appropriate_items.append(item)
-        
-        return appropriate_items
-    
-    def _is_occasion_appropriate(self, item: Dict, occasion_style: Dict) -> bool:
-        """
-        Check if an item is appropriate for an occasion.
-        
-        Args:
-            item: Clothing item
-            occasion_style: Occasion style requirements
-            
-        Returns:
-            True if appropriate, False otherwise
-        """
-        # This is a simplified check - can be expanded based on requirements
-        item_description = f"{item.get('category', '')} {item.get('style', '')} {item.get('description', '')}".lower()
-        
-        # Check for any style matches
-        if 'style' in occasion_style:
-            for style in occasion_style['style']:
-                if style.lower() in item_description:
-                    return True
-        
-        return True  # Default to appropriate if no specific restrictions
+        return items
     
     def _generate_outfit_combinations(self, items: List[Dict], user_preferences: Dict, 
-                                    occasion: str) -> List[Dict]:
+                                    occasion: str) -> Tuple[List[Dict], np.ndarray]:
         """
         Generate outfit combinations from available items.
         
@@ -626,7 +837,8 @@ class OutfitRecommendationEngine:
             occasion: Target occasion
             
         Returns:
-            List of outfit combinations
+            Candidate items and an (outfits, 3) array of top, bottom and shoes
+            indices into them, with -1 where an outfit has no shoes
         """
         # Group items by category
         items_by_category = {}
@@ -636,69 +848,80 @@ class OutfitRecommendationEngine:
                 items_by_category[category] = []
             items_by_category[category].append(item)
         
-        combinations = []
-        
         # Generate basic outfit combinations
         # For simplicity, we'll create top + bottom combinations
-        tops = items_by_category.get('shirts', []) + items_by_category.get('outerwear', [])
-        bottoms = items_by_category.get('pants', []) + items_by_category.get('skirts', [])
-        shoes = items_by_category.get('shoes', [])
-        
-        for top in tops[:10]:  # Limit combinations for performance
-            for bottom in bottoms[:10]:
-                outfit = {
-                    'top': top,
-                    'bottom': bottom,
-                    'items': [top, bottom]
-                }
-                
-                # Add shoes if available
-                if shoes:
-                    outfit['shoes'] = shoes[0]  # Simple selection
-                    outfit['items'].append(shoes[0])
-                
-                combinations.append(outfit)
-        
-        return combinations
+        tops = (items_by_category.get('shirts', []) + items_by_category.get('outerwear', []))[:10]  # Limit combinations for performance
+        bottoms = (items_by_category.get('pants', []) + items_by_category.get('skirts', []))[:10]
+        shoes = items_by_category.get('shoes', [])[:1]  # Simple selection
+        candidates = tops + bottoms + shoes
+        
+        # Every top with every bottom, in top-major order
+        top_indices, bottom_indices = np.meshgrid(
+            np.arange(len(tops)), len(tops) + np.arange(len(bottoms)), indexing='ij'
+        )
+        shoe_indices = np.full(top_indices.size, len(candidates) - 1 if shoes else -1)
+        combinations = np.column_stack([top_indices.ravel(), bottom_indices.ravel(), shoe_indices])
+        
+        return candidates, combinations
     
-    def _score_outfit_combinations(self, combinations: List[Dict], user_preferences: Dict, 
-                                 occasion: str) -> List[Dict]:
+    def _score_outfit_combinations(self, candidates: List[Dict], combinations: np.ndarray, 
+                                 user_preferences: Dict, occasion: str) -> Tuple[np.ndarray, ...]:
         """
         Score outfit combinations based on various factors.
         
         Args:
-            combinations: List of outfit combinations
+            candidates: Items the combinations index into
+            combinations: (outfits, slots) item indices, -1 for an empty slot
             user_preferences: User preferences
             occasion: Target occasion
             
         Returns:
-            List of scored outfit combinations
+            Total, color harmony, style consistency and occasion appropriateness score arrays
         """
-        scored_combinations = []
-        
-        for combination in combinations:
-            score = 0.0
-            
-            # Color harmony score
-            color_score = self._calculate_outfit_color_harmony(combination['items'])
-            score += color_score * 0.4
-            
-            # Style consistency score
-            style_score = self._calculate_style_consistency(combination['items'])
-            score += style_score * 0.3
-            
-            # Occasion appropriateness score
-            occasion_score = self._calculate_occasion_appropriateness(combination['items'], occasion)
-            score += occasion_score * 0.3
-            
-            combination['score'] = score
-            combination['color_score'] = color_score
-            combination['style_score'] = style_score
-            combination['occasion_score'] = occasion_score
-            
-            scored_combinations.append(combination)
-        
-        return scored_combinations
+        # Per-item tables get a trailing entry for empty slots, which index -1 picks up
+        unknown = len(self._color_index)
+        color_ids = np.array([
+            self._color_index.get(item['dominant_color']['name'].lower(), unknown)
+            if isinstance(item.get('dominant_color'), dict) and 'name' in item['dominant_color'] else -1
+            for item in candidates
+        ] + [-1], dtype=np.intp)
+        
+        # Intern every style word to an integer id, then count (item, word) pairs in one bincount
+        word_lists = [f"{item.get('style', '')} {item.get('description', '')}".lower().split() for item in candidates]
+        vocabulary, word_ids = np.unique(np.array([word for words in word_lists for word in words], dtype=str),
+                                         return_inverse=True)
+        rows = np.repeat(np.arange(len(candidates)), [len(words) for words in word_lists])
+        word_counts = np.bincount(rows * len(vocabulary) + word_ids, minlength=(len(candidates) + 1) * len(vocabulary))
+        word_counts = word_counts.reshape(len(candidates) + 1, len(vocabulary)).astype(float)
+        
+        # Every item suits a known occasion (see _filter_by_occasion)
+        item_occasion_score = 1.0 if occasion in self.occasion_styles else 0.5
+        item_occasion_scores = np.append(np.full(len(candidates), item_occasion_score), 0.0)
+        
+        # Color harmony: mean compatibility over pairs of items with a named color
+        outfit_colors = color_ids[combinations]
+        pair_totals = np.zeros(len(combinations))
+        pair_counts = np.zeros(len(combinations))
+        for a, b in slot_pairs(range(combinations.shape[1]), 2):
+            valid = (outfit_colors[:, a] >= 0) & (outfit_colors[:, b] >= 0)
+            pair_totals += np.where(valid, self._color_matrix[outfit_colors[:, a], outfit_colors[:, b]], 0.0)
+            pair_counts += valid
+        color_scores = np.where(pair_counts > 0, pair_totals / np.maximum(pair_counts, 1), 0.5)
+        
+        # Style consistency: share of the most frequent word among the outfit's style words
+        outfit_word_counts = word_counts[combinations].sum(axis=1)
+        total_words = outfit_word_counts.sum(axis=1)
+        max_frequency = outfit_word_counts.max(axis=1, initial=0)
+        style_scores = np.where(
+            total_words > 0, np.minimum(max_frequency / np.maximum(total_words, 1) * 2, 1.0), 0.5
+        )
+        
+        # Occasion appropriateness: mean of the items' scores
+        present = (combinations >= 0).sum(axis=1)
+        occasion_scores = item_occasion_scores[combinations].sum(axis=1) / np.maximum(present, 1)
+        
+        scores = color_scores * 0.4 + style_scores * 0.3 + occasion_scores * 0.3
+        return scores, color_scores, style_scores, occasion_scores
     
     def _calculate_color_compatibility(self, color1: str, color2: str) -> float:
         """
@@ -711,129 +934,25 @@ class OutfitRecommendationEngine:
         Returns:
             Compatibility score (0-1)
         """
-        # Check excellent combinations
-        for combo in self.compatibility_rules['color_combinations']['excellent']:
-            if (color1 in combo and color2 in combo) or (color2 in combo and color1 in combo):
-                return 1.0
-        
-        # Check good combinations
-        for combo in self.compatibility_rules['color_combinations']['good']:
-            if (color1 in combo and color2 in combo) or (color2 in combo and color1 in combo):
-                return 0.8
-        
-        # Check combinations to avoid
-        for combo in self.compatibility_rules['color_combinations']['avoid']:
-            if (color1 in combo and color2 in combo) or (color2 in combo and color1 in combo):
-                return 0.2
-        
-        # Default neutral compatibility
-        return 0.6
-    
-    def _calculate_outfit_color_harmony(self, items: List[Dict]) -> float:
-        """
-        Calculate color harmony score for an outfit.
-        
-        Args:
-            items: List of clothing items in the outfit
-            
-        Returns:
-            Color harmony score (0-1)
-        """
-        if len(items) < 2:
-            return 1.0
-        
-        colors = []
-        for item in items:
-            if 'dominant_color' in item and 'name' in item['dominant_color']:
-                colors.append(item['dominant_color']['name'].lower())
-        
-        if len(colors) < 2:
-            return 0.5
-        
-        # Calculate pairwise color compatibility
-        total_score = 0.0
-        comparisons = 0
-        
-        for i in range(len(colors)):
-            for j in range(i + 1, len(colors)):
-                compatibility = self._calculate_color_compatibility(colors[i], colors[j])
-                total_score += compatibility
-                comparisons += 1
-        
-        return total_score / comparisons if comparisons > 0 else 0.5
-    
-    def _calculate_style_consistency(self, items: List[Dict]) -> float:
-        """
-        Calculate style consistency score for an outfit.
-        
-        Args:
-            items: List of clothing items in the outfit
-            
-        Returns:
-            Style consistency score (0-1)
-        """
-        # Extract style keywords from all items
-        all_styles = []
-        for item in items:
-            style_text = f"{item.get('style', '')} {item.get('description', '')}"
-            all_styles.extend(style_text.lower().split())
-        
-        if not all_styles:
-            return 0.5
-        
-        # Count style keyword frequency
-        style_counts = {}
-        for style in all_styles:
-            style_counts[style] = style_counts.get(style, 0) + 1
-        
-        # Calculate consistency based on common style keywords
-        total_words = len(all_styles)
-        max_frequency = max(style_counts.values()) if style_counts else 0
-        
-        consistency_score = max_frequency / total_words if total_words > 0 else 0.5
-        return min(consistency_score * 2, 1.0)  # Scale to 0-1 range
-    
-    def _calculate_occasion_appropriateness(self, items: List[Dict], occasion: str) -> float:
-        """
-        Calculate how appropriate an outfit is for an occasion.
-        
-        Args:
-            items: List of clothing items in the outfit
-            occasion: Target occasion
-            
-        Returns:
-            Appropriateness score (0-1)
-        """
-        if occasion not in self.occasion_styles:
-            return 0.5
-        
-        occasion_requirements = self.occasion_styles[occasion]
-        appropriateness_scores = []
-        
-        for item in items:
-            score = 0.5  # Default neutral score
-            
-            # Check if item matches occasion style requirements
-            if self._is_occasion_appropriate(item, occasion_requirements):
-                score = 1.0
-            
-            appropriateness_scores.append(score)
-        
-        return sum(appropriateness_scores) / len(appropriateness_scores) if appropriateness_scores else 0.5
+        # Rule lookup, defaulting to neutral compatibility
+        return self._color_scores.get(frozenset((color1, color2)), 0.6)
     
     def _save_models(self):
         """Save trained models to cache directory."""
         try:
-            model_path = os.path.join(self.model_cache_dir, 'recommendation_models.pkl')
+            model_path = os.path.join(self.model_cache_dir, self.MODELS_FILENAME)
+            
             models = {
                 'scaler': self.scaler,
                 'knn_model': self.knn_model,
+                'trained_item_ids': self._trained_item_ids,
+                'items_normed': self._items_normed,
                 'pca': self.pca,
                 'feature_weights': self.feature_weights
             }
             
-            with open(model_path, 'wb') as f:
-                pickle.dump(models, f)
+            # Uncompressed so the fitted arrays can be memory-mapped on load
+            joblib.dump(models, model_path, compress=0)
             
             logger.info("Recommendation models saved successfully")
             
@@ -843,14 +962,17 @@ class OutfitRecommendationEngine:
     def _load_models(self):
         """Load trained models from cache directory."""
         try:
-            model_path = os.path.join(self.model_cache_dir, 'recommendation_models.pkl')
+            model_path = os.path.join(self.model_cache_dir, self.MODELS_FILENAME)
             
             if os.path.exists(model_path):
-                with open(model_path, 'rb') as f:
-                    models = pickle.load(f)
+                # Arrays are mapped read-only instead of copied, and shared between workers;
+                # scaler/PCA/ball-tree predict paths only read them
+                models = joblib.load(model_path, mmap_mode='r')
                 
                 self.scaler = models.get('scaler', self.scaler)
                 self.knn_model = models.get('knn_model', self.knn_model)
+                self._trained_item_ids = models.get('trained_item_ids')
+                self._items_normed = models.get('items_normed')
                 self.pca = models.get('pca', self.pca)
                 self.feature_weights = models.get('feature_weights', self.feature_weights)
                 
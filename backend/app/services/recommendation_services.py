@@ -1,38 +1,169 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from typing import Iterable, List, Optional, Dict, Any, NamedTuple
 from .. import model as models, tables as schemas
 from sqlalchemy import func, or_
 
 # Added imports for AI-powered recommendations
 import numpy as np # For random embeddings if needed
-import random
+import heapq
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import Future
 from itertools import combinations
-from sqlalchemy.orm import joinedload # For eager loading of outfit items
+from sqlalchemy.orm import selectinload, load_only # For eager loading of outfit items
 
 from ..services.outfit_matching_service import OutfitMatchingService
 # from ..services.ai_services import get_fashion_trends_service # Keep commented if not fully implementing trend integration yet
 # from ..services.ai_services import analyze_outfit_image_service # Not directly used if AI features are mocked/pre-stored
 
+logger = logging.getLogger(__name__)
+
 # For sentence embeddings for occasion matching
 try:
     from sentence_transformers import SentenceTransformer
-    from sklearn.metrics.pairwise import cosine_similarity
     sentence_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
 except ImportError:
-    import logging 
-    logger = logging.getLogger(__name__)
     logger.warning("sentence_transformers not available. Occasion matching will use fallback logic.")
     sentence_model = None
-    cosine_similarity = None
+else:
+    # One tiny encode at import so the first request doesn't pay the model's lazy initialization
+    try:
+        sentence_model.encode(["warmup"], show_progress_bar=False)
+    except Exception as e:
+        logger.warning(f"Sentence model warmup failed: {e}")
 
 import json # For parsing UserStyleProfile JSON fields
 from .user_style_profile_service import get_or_create_user_style_profile # Import for UserStyleProfile
 
+
+class BatchedEncoder:
+    """
+    Coalesces concurrent sentence encodings into batched model calls
+
+    Texts wait up to max_wait_ms for others to arrive; a batch of up to max_batch texts
+    is sorted by length so padding stays close to each text's own length.
+    """
+
+    def __init__(self, model, max_batch: int = 10, max_wait_ms: float = 5):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._requests = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="sentence-batcher", daemon=True)
+        self._worker.start()
+
+    def __call__(self, text: str) -> np.ndarray:
+        """Encode one text, blocking until its batch runs"""
+        future = Future()
+        self._requests.put((text, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            batch.sort(key=lambda request: len(request[0]))
+            try:
+                embeddings = self.model.encode(
+                    [text for text, _ in batch], batch_size=self.max_batch, convert_to_numpy=True
+                )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+
+@lru_cache(maxsize=4096)
+def _stub_embedding(item_id: int, dim: int) -> np.ndarray:
+    """Deterministic unit-length stand-in embedding for an item without an AI embedding"""
+    embedding = np.random.default_rng(seed=item_id).standard_normal(dim, dtype=np.float32)
+    embedding /= np.linalg.norm(embedding)
+    embedding.setflags(write=False)  # Shared by every caller through the cache
+    return embedding
+
+
+class ItemVec(NamedTuple):
+    """Per-item features used by occasion matching"""
+    embedding: np.ndarray  # float32, a stub when the item has no AI embedding
+    colors: frozenset
+    styles: frozenset
+    hex: str
+    category: str
+
+
+# Packed item features keyed by (item id, updated_at), so edits to an item invalidate its entry
+ITEM_FEATURE_CACHE_SIZE = 65536
+_item_feature_cache: "OrderedDict[tuple, ItemVec]" = OrderedDict()
+_item_feature_cache_lock = threading.Lock()
+
+
+def _pack_item_features(item: models.WardrobeItem) -> ItemVec:
+    """Return the cached ItemVec of a wardrobe item, building it on first use"""
+    key = (item.id, item.updated_at)
+    with _item_feature_cache_lock:
+        packed = _item_feature_cache.get(key)
+        if packed is not None:
+            _item_feature_cache.move_to_end(key)
+            return packed
+
+    packed = ItemVec(
+        embedding=np.asarray(item.ai_embedding, dtype=np.float32) if item.ai_embedding else _stub_embedding(item.id, 384),
+        colors=frozenset([item.dominant_color_name.lower()]) if item.dominant_color_name else frozenset(),
+        styles=frozenset(style.lower() for style in item.style_features["identified_styles"])
+        if item.style_features and isinstance(item.style_features.get("identified_styles"), list) else frozenset(),
+        hex=item.color_palette[0]["hex"] if item.color_palette and isinstance(item.color_palette, list) and item.color_palette[0].get("hex") else (item.dominant_color_hex if item.dominant_color_hex else "#808080"),
+        category=item.category or "unknown",
+    )
+    with _item_feature_cache_lock:
+        _item_feature_cache[key] = packed
+        while len(_item_feature_cache) > ITEM_FEATURE_CACHE_SIZE:
+            _item_feature_cache.popitem(last=False)
+    return packed
+
+
+def _lowercase_set(values: Iterable[Any]) -> frozenset:
+    """Lowercased frozenset of the strings in a stored preference list, or the keys of stored preference counts"""
+    return frozenset(value.lower() for value in values if isinstance(value, str))
+
+
+# Weights for combining occasion similarity, internal coherence and the user preference boost
+OCCASION_SIMILARITY_WEIGHT = 0.6
+COHERENCE_WEIGHT = 0.25
+PREFERENCE_WEIGHT = 0.15
+
+
 # --- Load Models ---
 # Models are loaded in the import section above
 
 # Instantiate services needed
 outfit_matcher = OutfitMatchingService()
+encode_batched = BatchedEncoder(sentence_model) if sentence_model else None
+
+
+@lru_cache(maxsize=1024)
+def _encode_occasion(text: str) -> np.ndarray:
+    """Unit-length float32 embedding of an occasion text, memoized per normalized text"""
+    embedding = np.asarray(encode_batched(text), dtype=np.float32)
+    norm = np.linalg.norm(embedding)
+    if norm:
+        embedding = embedding / norm
+    embedding.setflags(write=False)  # Shared by every caller through the cache
+    return embedding
 
 from .weather_service import get_weather_data 
 import asyncio 
@@ -46,8 +177,6 @@ def find_ai_matched_outfits_for_occasion(
     num_recommendations: int = 3,
     min_coherence_score: float = 0.4 
 ) -> List[models.Outfit]:
-    logger = logging.getLogger(__name__) 
-
     occasion_text_for_embedding = f"{occasion_name_from_input} {occasion_notes_from_input}".strip()
 
     if not sentence_model or not occasion_text_for_embedding:
@@ -55,7 +184,8 @@ def find_ai_matched_outfits_for_occasion(
         return []
 
     try:
-        occasion_embedding = sentence_model.encode(occasion_text)
+        # The model is uncased, so lowercasing and collapsing whitespace only improves cache hits
+        occasion_embedding = _encode_occasion(" ".join(occasion_text_for_embedding.lower().split()))
     except Exception as e:
         logger.error(f"Error encoding occasion text: {e}")
         return []
@@ -63,9 +193,23 @@ def find_ai_matched_outfits_for_occasion(
     # Fetch user's outfits with their items eagerly loaded
     # Assuming 'items_association' is the relationship from Outfit to OutfitItem (association object)
     # and 'item' is the relationship from OutfitItem to WardrobeItem.
+    # selectinload fetches the items in one extra IN query instead of repeating outfit rows per item,
+    # and only the columns matching and schemas.Outfit serialization read are loaded.
     user_outfits = db.query(models.Outfit)\
         .filter(models.Outfit.user_id == user_id)\
-        .options(joinedload(models.Outfit.items))\
+        .options(
+            load_only(
+                models.Outfit.id, models.Outfit.user_id, models.Outfit.name, models.Outfit.created_at,
+                models.Outfit.updated_at, models.Outfit._tags, models.Outfit.image_url,
+            ),
+            selectinload(models.Outfit.items).load_only(
+                models.WardrobeItem.id, models.WardrobeItem.name, models.WardrobeItem.category,
+                models.WardrobeItem.ai_embedding, models.WardrobeItem.dominant_color_name,
+                models.WardrobeItem.dominant_color_hex, models.WardrobeItem.color_palette,
+                models.WardrobeItem.style_features, models.WardrobeItem.updated_at,
+            ),
+            selectinload(models.Outfit.feedbacks), # Serialized by schemas.Outfit
+        )\
         .all() # Changed from items_association to items directly
 
     if not user_outfits:
@@ -73,105 +217,124 @@ def find_ai_matched_outfits_for_occasion(
 
     # Fetch UserStyleProfile
     user_style_profile = get_or_create_user_style_profile(db, user_id)
-    profile_preferred_colors = json.loads(user_style_profile.preferred_colors) if user_style_profile.preferred_colors else []
-    profile_style_keywords = json.loads(user_style_profile.style_keywords) if user_style_profile.style_keywords else []
+    # Preferences become lowercase frozensets, matching the lowercased outfit colors and styles
+    profile_preferred_colors = _lowercase_set(json.loads(user_style_profile.preferred_colors) if user_style_profile.preferred_colors else [])
+    profile_style_keywords = _lowercase_set(json.loads(user_style_profile.style_keywords) if user_style_profile.style_keywords else [])
     profile_occasion_prefs = json.loads(user_style_profile.occasion_preferences) if user_style_profile.occasion_preferences else {}
     
     # Get occasion-specific preferences from UserStyleProfile
     current_occasion_specific_prefs = profile_occasion_prefs.get(occasion_name_from_input.lower(), {})
-    occasion_preferred_colors = current_occasion_specific_prefs.get("colors", [])
-    occasion_preferred_styles = current_occasion_specific_prefs.get("styles", [])
+    occasion_preferred_colors = _lowercase_set(current_occasion_specific_prefs.get("colors", []))
+    occasion_preferred_styles = _lowercase_set(current_occasion_specific_prefs.get("styles", []))
 
 
-    scored_outfits = []
-
+    # Pack every outfit's items
+    packed_outfits = []
     for outfit in user_outfits:
-        if not outfit.items: # Skip outfits with no items
+        outfit_items = [item for item in outfit.items if item]
+        if not outfit_items: # Skip outfits with no items
             continue
+        packed_items = [_pack_item_features(item) for item in outfit_items]
+        item_embeddings = [packed.embedding for packed in packed_items]
+        packed_outfits.append((outfit, outfit_items, packed_items, item_embeddings))
 
-        outfit_item_features_for_matcher: List[Dict[str, Any]] = []
-        item_embeddings_for_outfit_avg: List[np.ndarray] = []
-        
-        outfit_aggregated_colors: set[str] = set()
-        outfit_aggregated_styles: set[str] = set() # From item.style_features.identified_styles
-
-        for item in outfit.items: # Iterate through WardrobeItem directly
-            if not item: continue
-
-            item_emb_list = item.ai_embedding if item.ai_embedding else np.random.rand(384).tolist()
-            item_colors_hex = item.color_palette[0]["hex"] if item.color_palette and isinstance(item.color_palette, list) and item.color_palette[0].get("hex") else (item.dominant_color_hex if item.dominant_color_hex else "#808080")
-            
-            # For OutfitMatchingService, it expects a list of hex colors per item.
-            # For simplicity, let's use the dominant hex or first from palette.
-            # The OutfitMatchingService's check_color_harmony takes a flat list of all colors in the outfit.
-            # So, we'll collect all dominant_color_name for preference check, and all hex for harmony.
-            
-            if item.dominant_color_name:
-                outfit_aggregated_colors.add(item.dominant_color_name.lower())
-
-            if item.style_features and isinstance(item.style_features.get("identified_styles"), list):
-                for style in item.style_features["identified_styles"]:
-                    outfit_aggregated_styles.add(style.lower())
-
-            outfit_item_features_for_matcher.append({
-                "id": item.id,
-                "name": item.name,
-                "embedding": item_emb_list,
-                "colors": [item_colors_hex], # Pass as list of hex strings
-                "category": item.category or "unknown"
-            })
-            item_embeddings_for_outfit_avg.append(np.array(item_emb_list))
+    if not packed_outfits:
+        return []
 
-        if not outfit_item_features_for_matcher or not item_embeddings_for_outfit_avg:
+    # Coherence prefilter: with a perfect color harmony score of 1.0 the matcher's score is at most
+    # 0.7 * style cohesion + 0.3, and style cohesion for all outfits comes from one batched kernel.
+    # Single-item outfits always score 0. The margin absorbs rounding and float32 error, so only
+    # outfits that cannot reach min_coherence_score are skipped.
+    style_cohesion = outfit_matcher.batch_style_cohesion([embeddings for _, _, _, embeddings in packed_outfits])
+    item_counts = np.array([len(outfit_items) for _, outfit_items, _, _ in packed_outfits])
+    coherence_upper_bounds = np.where(item_counts < 2, 0.0, 0.7 * style_cohesion + 0.3)
+    reachable = ~(coherence_upper_bounds < min_coherence_score - 1e-3)  # NaN (no batched cohesion) is kept
+
+    # Then the full matcher and preference boosts; occasion similarity is computed for all survivors at once
+    coherent_outfits = []
+    outfit_embedding_avgs: List[np.ndarray] = []
+
+    for (outfit, outfit_items, packed_items, item_embeddings_for_outfit_avg), is_reachable in zip(packed_outfits, reachable):
+        if not is_reachable:
             continue
 
+        # For OutfitMatchingService, it expects a list of hex colors per item.
+        # For simplicity, let's use the dominant hex or first from palette.
+        # The OutfitMatchingService's check_color_harmony takes a flat list of all colors in the outfit.
+        # So, we'll collect all dominant_color_name for preference check, and all hex for harmony.
+        outfit_item_features_for_matcher: List[Dict[str, Any]] = [
+            {
+                "id": item.id,
+                "name": item.name,
+                "embedding": embedding,
+                "colors": [packed.hex], # Pass as list of hex strings
+                "category": packed.category
+            }
+            for item, packed, embedding in zip(outfit_items, packed_items, item_embeddings_for_outfit_avg)
+        ]
+
         coherence_details = outfit_matcher.calculate_compatibility_score(outfit_item_features_for_matcher)
         internal_coherence_score = coherence_details["score"]
 
         if internal_coherence_score < min_coherence_score:
             continue
 
-        outfit_embedding_avg = np.mean(item_embeddings_for_outfit_avg, axis=0)
-        similarity_to_occasion = cosine_similarity(occasion_embedding.reshape(1, -1), outfit_embedding_avg.reshape(1, -1))[0][0]
-        similarity_to_occasion_normalized = (similarity_to_occasion + 1) / 2
+        outfit_aggregated_colors = frozenset().union(*(packed.colors for packed in packed_items))
+        outfit_aggregated_styles = frozenset().union(*(packed.styles for packed in packed_items)) # From item.style_features.identified_styles
 
         # Calculate preference boost
         preference_boost = 0.0
         # General color preference
-        if any(color in profile_preferred_colors for color in outfit_aggregated_colors):
+        if outfit_aggregated_colors & profile_preferred_colors:
             preference_boost += 0.05
         # General style preference
-        if any(style in profile_style_keywords for style in outfit_aggregated_styles):
+        if outfit_aggregated_styles & profile_style_keywords:
             preference_boost += 0.05
         
         # Occasion-specific color preference
-        if occasion_preferred_colors and any(color in occasion_preferred_colors for color in outfit_aggregated_colors):
+        if outfit_aggregated_colors & occasion_preferred_colors:
             preference_boost += 0.10 # Higher boost for occasion-specific match
         # Occasion-specific style preference
-        if occasion_preferred_styles and any(style in occasion_preferred_styles for style in outfit_aggregated_styles):
+        if outfit_aggregated_styles & occasion_preferred_styles:
             preference_boost += 0.10
 
-        # Weights for combining scores
-        occasion_similarity_weight = 0.6
-        coherence_weight = 0.25
-        preference_weight = 0.15 # Weight for user preference boost
-        
-        final_match_score = (occasion_similarity_weight * similarity_to_occasion_normalized) + \
-                            (coherence_weight * internal_coherence_score) + \
-                            (preference_weight * min(preference_boost, 1.0)) # Cap boost
+        coherent_outfits.append((outfit, internal_coherence_score, preference_boost))
+        outfit_embedding_avgs.append(np.mean(item_embeddings_for_outfit_avg, axis=0))
+
+    if not coherent_outfits:
+        return []
 
-        scored_outfits.append({
+    # Cosine similarity of every outfit's mean embedding to the occasion in one matrix-vector product
+    # (float32 throughout, so the product reads half the memory of float64)
+    outfit_avgs = np.stack(outfit_embedding_avgs)
+    outfit_norms = np.linalg.norm(outfit_avgs, axis=1, keepdims=True)
+    outfit_avgs /= np.where(outfit_norms == 0, 1, outfit_norms)
+    coherence_scores = np.array([coherence for _, coherence, _ in coherent_outfits], dtype=float)
+    preference_boosts = np.array([boost for _, _, boost in coherent_outfits])
+
+    # Final scores for all outfits at once; ORM objects are only touched afterwards
+    similarities_to_occasion = ((outfit_avgs @ occasion_embedding).astype(float) + 1) / 2
+    final_match_scores = OCCASION_SIMILARITY_WEIGHT * similarities_to_occasion + \
+        COHERENCE_WEIGHT * coherence_scores + \
+        PREFERENCE_WEIGHT * np.minimum(preference_boosts, 1.0) # Cap boost
+
+    scored_outfits = [
+        {
             "outfit_model": outfit,
             "score": final_match_score,
             "debug_occasion_sim": similarity_to_occasion_normalized,
             "debug_coherence": internal_coherence_score,
             "debug_pref_boost": preference_boost
-        })
+        }
+        for (outfit, internal_coherence_score, preference_boost), similarity_to_occasion_normalized, final_match_score
+        in zip(coherent_outfits, similarities_to_occasion.tolist(), final_match_scores.tolist())
+    ]
 
-    sorted_outfits = sorted(scored_outfits, key=lambda x: x["score"], reverse=True)
+    # Only the top outfits are needed; nlargest keeps input order for ties, like a stable sort
+    sorted_outfits = heapq.nlargest(num_recommendations, scored_outfits, key=lambda x: x["score"])
     # logger.info(f"Top sorted outfits for occasion '{occasion_name_from_input}': " + ", ".join([f"{s['outfit_model'].name} (Score: {s['score']:.2f}, PrefBoost: {s['debug_pref_boost']:.2f})" for s in sorted_outfits[:5]]))
 
-    return [s["outfit_model"] for s in sorted_outfits[:num_recommendations]]
+    return [s["outfit_model"] for s in sorted_outfits]
 
 
 async def recommend_outfits_for_occasion_service(
@@ -183,29 +346,126 @@ async def recommend_outfits_for_occasion_service(
 
     # Use occasion.name (event_type from input) and occasion.notes (combined details)
     # find_ai_matched_outfits_for_occasion expects occasion_name and occasion_notes separately
-    db_outfits = find_ai_matched_outfits_for_occasion(
-        db=db,
+    # Matching is blocking DB, encoder and NumPy work; run it in a worker thread to keep the event loop free.
+    # The request session is not thread-safe, so the worker opens its own on the same engine.
+    return await asyncio.to_thread(
+        _recommend_outfits_in_worker,
+        db.get_bind(),
         user_id=user.id,
         occasion_name_from_input=occasion.name, 
         occasion_notes_from_input=occasion.notes if occasion.notes else "",
         num_recommendations=num_recommendations
     )
 
-    recommendations = []
-    for outfit_model in db_outfits:
-        # The Outfit schema should be able to serialize from the SQLAlchemy model
-        # Ensure that `schemas.Outfit.from_orm` or `model_validate` is configured correctly,
-        # especially for nested items. The `joinedload` in the helper should make items available.
-        try:
-            recommendations.append(schemas.Outfit.model_validate(outfit_model))
-        except Exception as e:
-            logger.error(f"Error validating outfit model {outfit_model.id} for schema: {e}")
-            # Optionally, skip this outfit or handle error
-            continue
+
+def _recommend_outfits_in_worker(bind, **match_kwargs) -> List[schemas.Outfit]:
+    """Match and serialize outfits with a session owned by the calling worker thread"""
+    with Session(bind=bind, autoflush=False) as worker_db:
+        db_outfits = find_ai_matched_outfits_for_occasion(worker_db, **match_kwargs)
+
+        recommendations = []
+        for outfit_model in db_outfits:
+            # Serialize while the session is open; items and feedbacks are already eagerly loaded
+            try:
+                recommendations.append(schemas.Outfit.model_validate(outfit_model))
+            except Exception as e:
+                logger.error(f"Error validating outfit model {outfit_model.id} for schema: {e}")
+                # Optionally, skip this outfit or handle error
+                continue
+
+        # Keeps a style profile created during matching
+        worker_db.commit()
 
     return recommendations
 
 
+def _generate_outfit_ideas(
+    matchable_items: List[Dict[str, Any]],
+    num_recommendations: int,
+    rng: np.random.Generator
+) -> List[str]:
+    """Sample outfits from typical structures and describe the ones the matcher scores highly"""
+    new_outfit_ideas: List[str] = []
+    seen_outfits: set[frozenset] = set() # Item id sets already suggested
+
+    # Group items by category for easier selection
+    items_by_category: Dict[str, List[Dict[str, Any]]] = {}
+    for item in matchable_items:
+        items_by_category.setdefault(item["category"], []).append(item)
+
+    # Define typical outfit structures (e.g., top + bottom, top + bottom + shoes)
+    # This is a simplified approach. More complex logic could handle more variations.
+    outfit_structures = [
+        ["Tops", "Bottoms"],
+        ["Tops", "Bottoms", "Shoes"],
+        ["Tops", "Bottoms", "Outerwear"],
+    ]
+
+    attempts_to_find_outfits = 15 # Try a number of times to generate diverse outfits
+    generated_outfit_count = 0
+
+    if len(matchable_items) >= 2: # Need at least 2 items to form an outfit
+        # Draw every attempt's structure and per-category item index up front
+        structure_picks = rng.integers(len(outfit_structures), size=attempts_to_find_outfits)
+        item_picks = {
+            cat: rng.integers(len(cat_items), size=attempts_to_find_outfits) for cat, cat_items in items_by_category.items()
+        }
+
+        for attempt in range(attempts_to_find_outfits):
+            if generated_outfit_count >= num_recommendations:
+                break
+
+            chosen_structure = outfit_structures[structure_picks[attempt]]
+            current_outfit_items_features: List[Dict[str, Any]] = []
+            current_outfit_item_names: List[str] = []
+            chosen_item_ids: set = set()
+
+            possible_to_form = True
+            for cat in chosen_structure:
+                if items_by_category.get(cat):
+                    chosen_item = items_by_category[cat][item_picks[cat][attempt]]
+                    # Avoid choosing the same item twice if a category is listed multiple times (not in current structures)
+                    if chosen_item["id"] not in chosen_item_ids:
+                        chosen_item_ids.add(chosen_item["id"])
+                        current_outfit_items_features.append(chosen_item)
+                        current_outfit_item_names.append(chosen_item["name"])
+                    else: # Could not find a unique item for this part of the structure
+                        possible_to_form = False; break
+                else: # Not enough items in a required category
+                    possible_to_form = False; break
+
+            if possible_to_form and len(current_outfit_items_features) >= 2:
+                # Check if this specific combination of items has been tried already (order doesn't matter)
+                outfit_key = frozenset(chosen_item_ids)
+                if outfit_key in seen_outfits:
+                    continue
+                seen_outfits.add(outfit_key)
+
+                score_details = outfit_matcher.calculate_compatibility_score(current_outfit_items_features)
+                if score_details["score"] > 0.55: # Compatibility threshold
+                    idea = (f"Try combining: {', '.join(current_outfit_item_names)} "
+                            f"(Style: {score_details['style_cohesion_score']:.2f}, "
+                            f"Color: {score_details['color_harmony_score']:.2f}, "
+                            f"Overall: {score_details['score']:.2f})")
+                    new_outfit_ideas.append(idea)
+                    generated_outfit_count += 1
+
+    return new_outfit_ideas
+
+
+def _load_user_items_in_worker(bind, user_id: int, weather_filters: list) -> List[models.WardrobeItem]:
+    """Fetch a user's wardrobe items with a session owned by the calling worker thread"""
+    with Session(bind=bind, autoflush=False) as worker_db:
+        # Only the columns the processing below reads are loaded; they stay readable once the items are detached
+        return worker_db.query(models.WardrobeItem)\
+            .filter(models.WardrobeItem.user_id == user_id, *weather_filters)\
+            .options(load_only(
+                models.WardrobeItem.id, models.WardrobeItem.name, models.WardrobeItem.category,
+                models.WardrobeItem.ai_embedding, models.WardrobeItem.ai_dominant_colors, models.WardrobeItem.image_url,
+            ))\
+            .all()
+
+
 async def get_wardrobe_recommendations_service(
     db: Session,
     user: schemas.User,
@@ -221,7 +481,9 @@ async def get_wardrobe_recommendations_service(
         # If get_weather_data is not async, call it directly:
         # weather_conditions = get_weather_data(latitude=latitude, longitude=longitude)
 
-    user_items_query = db.query(models.WardrobeItem).filter(models.WardrobeItem.user_id == user.id)
+    # Weather conditions become one list of filter clauses, applied in a single filter() call
+    # next to user_id so the (user_id, category, season) index serves the whole query
+    weather_filters = []
 
     # Initial filtering based on very basic weather conditions if available
     # This is a simple approach. More advanced would involve scoring items.
@@ -233,7 +495,7 @@ async def get_wardrobe_recommendations_service(
             if temp < 10: # Cold
                 # Prioritize warmer clothes, allow layers
                 # This example prioritizes by category or season, could also use tags
-                user_items_query = user_items_query.filter(
+                weather_filters.append(
                     or_(
                         models.WardrobeItem.category.in_(["Sweater", "Coat", "Jacket", "Outerwear", "Knitwear", "Hoodie", "Long-Sleeve"]),
                         models.WardrobeItem.season.in_(["Winter", "Autumn"]),
@@ -241,7 +503,7 @@ async def get_wardrobe_recommendations_service(
                     )
                 )
             elif temp > 25: # Hot
-                user_items_query = user_items_query.filter(
+                weather_filters.append(
                     or_(
                         models.WardrobeItem.category.in_(["T-Shirt", "Shorts", "Tank Top", "Dress", "Skirt"]),
                         models.WardrobeItem.season.in_(["Summer", "Spring"]),
@@ -257,30 +519,30 @@ async def get_wardrobe_recommendations_service(
 
         if "snow" in condition:
             # Similar to cold, but could be more specific for snow gear
-            user_items_query = user_items_query.filter(
+            weather_filters.append(
                 models.WardrobeItem.category.in_(["Winter Coat", "Insulated Jacket", "Boots", "Snow Pants"])
             )
 
-
-    user_items = user_items_query.all()
+    user_items = await asyncio.to_thread(_load_user_items_in_worker, db.get_bind(), user.id, weather_filters)
 
     # Process items to ensure they have AI features (mocked if not present)
+    rng = np.random.default_rng()
     processed_user_items: List[Dict[str, Any]] = []
     for item in user_items: # Corrected variable name from user_items_from_db
         # Use actual AI embedding if available, otherwise mock
         embedding = item.ai_embedding
         if embedding is None: # Check covers both missing attr and attr is None
-            embedding = np.random.rand(512).tolist() # Example ViT-base embedding
+            embedding = _stub_embedding(item.id, 512) # Example ViT-base embedding size
 
         # Use actual AI dominant colors if available, otherwise mock
         ai_colors = item.ai_dominant_colors
         if ai_colors is None:
-            ai_colors = random.sample(["#1A1A1A", "#FFFFFF", "#FF0000", "#00FF00", "#0000FF", "#F0F0F0"], k=2)
+            ai_colors = rng.choice(["#1A1A1A", "#FFFFFF", "#FF0000", "#00FF00", "#0000FF", "#F0F0F0"], size=2, replace=False).tolist()
 
         # Ensure category is present, mock if not
         category = getattr(item, "category", None)
         if category is None:
-            category = random.choice(["Tops", "Bottoms", "Shoes", "Accessories", "Outerwear"])
+            category = str(rng.choice(["Tops", "Bottoms", "Shoes", "Accessories", "Outerwear"]))
 
         processed_user_items.append({
             "id": item.id,
@@ -292,65 +554,15 @@ async def get_wardrobe_recommendations_service(
             # Add other fields like item.ai_style if it were available and needed
         })
 
-    new_outfit_ideas: List[str] = []
-
     # --- "New Outfit Ideas" Generation ---
     # Filter items that have necessary features for matching
-    matchable_items = [item for item in processed_user_items if item.get("embedding") and item.get("colors") and item.get("category")]
-
-    # Group items by category for easier selection
-    items_by_category: Dict[str, List[Dict[str, Any]]] = {}
-    for item in matchable_items:
-        items_by_category.setdefault(item["category"], []).append(item)
-
-    # Define typical outfit structures (e.g., top + bottom, top + bottom + shoes)
-    # This is a simplified approach. More complex logic could handle more variations.
-    outfit_structures = [
-        ["Tops", "Bottoms"],
-        ["Tops", "Bottoms", "Shoes"],
-        ["Tops", "Bottoms", "Outerwear"],
+    matchable_items = [
+        item for item in processed_user_items
+        if item["embedding"] is not None and len(item["embedding"]) and item.get("colors") and item.get("category")
     ]
 
-    attempts_to_find_outfits = 15 # Try a number of times to generate diverse outfits
-    generated_outfit_count = 0
-
-    if len(matchable_items) >= 2: # Need at least 2 items to form an outfit
-        for _ in range(attempts_to_find_outfits):
-            if generated_outfit_count >= num_recommendations:
-                break
-
-            chosen_structure = random.choice(outfit_structures)
-            current_outfit_items_features: List[Dict[str, Any]] = []
-            current_outfit_item_names: List[str] = []
-
-            possible_to_form = True
-            for cat in chosen_structure:
-                if items_by_category.get(cat):
-                    chosen_item = random.choice(items_by_category[cat])
-                    # Avoid choosing the same item twice if a category is listed multiple times (not in current structures)
-                    if chosen_item["id"] not in [ci["id"] for ci in current_outfit_items_features]:
-                        current_outfit_items_features.append(chosen_item)
-                        current_outfit_item_names.append(chosen_item["name"])
-                    else: # Could not find a unique item for this part of the structure
-                        possible_to_form = False; break
-                else: # Not enough items in a required category
-                    possible_to_form = False; break
-
-            if possible_to_form and len(current_outfit_items_features) >= 2:
-                # Check if this specific combination of item names has been suggested already
-                # Sort names to ensure order doesn't matter for uniqueness
-                sorted_item_names = ", ".join(sorted(current_outfit_item_names))
-                if any(sorted_item_names in idea for idea in new_outfit_ideas): # Basic check to avoid exact duplicates by name
-                    continue
-
-                score_details = outfit_matcher.calculate_compatibility_score(current_outfit_items_features)
-                if score_details["score"] > 0.55: # Compatibility threshold
-                    idea = (f"Try combining: {', '.join(current_outfit_item_names)} "
-                            f"(Style: {score_details['style_cohesion_score']:.2f}, "
-                            f"Color: {score_details['color_harmony_score']:.2f}, "
-                            f"Overall: {score_details['score']:.2f})")
-                    new_outfit_ideas.append(idea)
-                    generated_outfit_count += 1
+    # Scoring candidate outfits is CPU-bound; run it in a worker thread
+    new_outfit_ideas = await asyncio.to_thread(_generate_outfit_ideas, matchable_items, num_recommendations, rng)
 
     if not new_outfit_ideas and matchable_items: # Fallback if no high-scoring outfits found
         new_outfit_ideas.append("Try experimenting with different combinations from your wardrobe! Use items from different categories like Tops, Bottoms, and Shoes.")
@@ -1,60 +1,151 @@
 # backend/app/services/user_style_profile_service.py
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 from sqlalchemy.dialects.postgresql import insert as pg_insert
-from sqlalchemy import func
-from datetime import datetime
-from typing import List, Dict, Any, Optional, Set
-import json
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy import func, select
+from typing import List, Dict, Any, Iterable, Optional, Set
+import heapq
+
+try:
+    import orjson
+    _loads = orjson.loads
+    _JSONDecodeError = orjson.JSONDecodeError
+
+    def _dumps(obj: Any) -> str:
+        # Profile columns hold JSON text, so decode orjson's bytes once here
+        return orjson.dumps(obj).decode()
+except ImportError:
+    import json
+    _loads = json.loads
+    _dumps = json.dumps
+    _JSONDecodeError = json.JSONDecodeError
 
 from .. import model as models # SQLAlchemy models
 from .. import tables as schemas # Pydantic schemas
 
+# The only WardrobeItem columns that preference learning reads
+_PREFERENCE_ITEM_COLUMNS = (
+    models.WardrobeItem.dominant_color_name,
+    models.WardrobeItem.category,
+    models.WardrobeItem.brand,
+    models.WardrobeItem.style_features,
+)
+
+
+def _dedupe_recent_list(current_list: List[str], new_items: Iterable[str], add: bool = True, max_items: int = 20, normalize: bool = False) -> List[str]:
+    """
+    Adds (most recent last) or removes items in a list of unique strings, keeping the last max_items.
+    With normalize=True, string items are lowercased as they are applied.
+    Returns current_list itself when nothing changes.
+    """
+    if add:
+        # Dicts keep insertion order, so re-inserting an item moves it to the most recent end
+        seen: Dict[str, None] = dict.fromkeys(current_list)
+        seen_pop, seen_set = seen.pop, seen.__setitem__ # Bound once, outside the loop
+        for item in new_items:
+            if normalize and isinstance(item, str):
+                item = item.lower()
+            if item: # Ensure item is not None or empty
+                seen_pop(item, None)
+                seen_set(item, None)
+        final_list = list(seen)
+        
+    else: # Remove items
+        items_to_remove = { # O(1) membership per current item
+            item.lower() if normalize and isinstance(item, str) else item for item in new_items if item
+        }
+        final_list = [val for val in current_list if val not in items_to_remove]
+
+    final_list = final_list[-max_items:]
+    return current_list if final_list == current_list else final_list
+
+
 # Helper function to update JSON list fields (ensuring uniqueness and managing counts)
-def _update_json_list_field(current_values_json: Optional[str], new_items: List[str], add: bool = True, max_items: int = 20) -> str:
+def _update_json_list_field(current_values_json: Optional[str], new_items: Iterable[str], add: bool = True, max_items: int = 20, normalize: bool = False) -> str:
     """
     Updates a JSON field that stores a list of strings, optionally with frequency counts.
     For simplicity in this version, it will store a list of unique items, recency biased.
+    When nothing changes, current_values_json itself is returned so callers can skip the assignment.
     """
+    if not isinstance(new_items, (list, tuple)):
+        new_items = list(new_items)
+    if not any(new_items): # Nothing but None/empty values to apply
+        return current_values_json or _dumps([])
+
     current_list: List[str] = []
     if current_values_json:
         try:
-            loaded_list = json.loads(current_values_json)
+            loaded_list = _loads(current_values_json)
             if isinstance(loaded_list, list):
                 current_list = loaded_list
-        except json.JSONDecodeError:
+        except _JSONDecodeError:
             pass # Start with an empty list if JSON is invalid
 
-    updated_set = set(current_list)
+    final_list = _dedupe_recent_list(current_list, new_items, add=add, max_items=max_items, normalize=normalize)
+    if current_values_json and final_list is current_list:
+        return current_values_json
+    return _dumps(final_list)
 
-    if add:
-        for item in new_items:
-            if item: # Ensure item is not None or empty
-                # If item already exists, remove to re-add at the end (recency)
-                if item in updated_set:
-                    updated_set.remove(item)
-                updated_set.add(item)
-        # Convert set back to list, then manage recency by taking the latest additions
-        # This simplistic approach keeps most recent `max_items` unique items.
-        temp_list = list(updated_set)
-        # A more robust recency would involve timestamps or ordered list management.
-        # For now, just add new items and trim.
-        # If we want true recency, we'd do:
-        # current_list = [x for x in current_list if x not in new_items] # remove items to re-add
-        # current_list.extend(new_items)
-        # final_list = list(dict.fromkeys(current_list)) # unique, preserves order of last appearance
-        # final_list = final_list[-max_items:]
-        
-        # Simpler: just add and trim
-        final_list = list(updated_set) # Order is not guaranteed here from set.
-        # To maintain some order of insertion for new items:
-        new_unique_items_to_add = [item for item in new_items if item and item not in current_list]
-        current_list.extend(new_unique_items_to_add)
-        final_list = list(dict.fromkeys(current_list)) # Unique, preserves order of last appearance
-        
-    else: # Remove items
-        final_list = [val for val in current_list if val not in new_items]
-        
-    return json.dumps(final_list[-max_items:])
+
+def _load_counts(current_values_json: Optional[str]) -> Dict[str, int]:
+    """Preference counts stored in a counter field; legacy list values count 1 per item"""
+    if not current_values_json:
+        return {}
+    try:
+        loaded = _loads(current_values_json)
+    except _JSONDecodeError:
+        return {} # Start with no counts if JSON is invalid
+    if isinstance(loaded, dict):
+        return {key: count for key, count in loaded.items() if isinstance(count, int) and count > 0}
+    if isinstance(loaded, list):
+        return dict.fromkeys(loaded, 1)
+    return {}
+
+
+def _update_json_counter_field(current_values_json: Optional[str], new_items: Iterable[str], add: bool = True, max_items: int = 20, normalize: bool = False) -> str:
+    """
+    Updates a JSON field that stores preference counts as {item: count}, most recently bumped last.
+    Adding increments an item's count; removing decrements it and drops the item at zero.
+    Past max_items, entries not bumped by this update are evicted first, lowest count and then
+    least recent first, so a new item is not dropped just because older ones have higher counts.
+    When nothing changes, current_values_json itself is returned so callers can skip the assignment.
+    """
+    if not isinstance(new_items, (list, tuple)):
+        new_items = list(new_items)
+    if not any(new_items): # Nothing but None/empty values to apply
+        return current_values_json or _dumps({})
+
+    counts = _load_counts(current_values_json)
+    bumped: set = set()
+
+    changed = False
+    for item in new_items:
+        if normalize and isinstance(item, str):
+            item = item.lower()
+        if not item: # Skip None or empty
+            continue
+        if add:
+            counts[item] = counts.pop(item, 0) + 1 # Re-inserting makes it the most recent
+            bumped.add(item)
+            changed = True
+        elif item in counts:
+            counts[item] -= 1
+            if counts[item] <= 0:
+                del counts[item]
+            changed = True
+
+    if len(counts) > max_items:
+        entries = list(counts.items())
+        keep = set(heapq.nlargest(
+            max_items, range(len(entries)), key=lambda i: (entries[i][0] in bumped, entries[i][1], i)
+        ))
+        counts = {key: count for i, (key, count) in enumerate(counts.items()) if i in keep}
+        changed = True
+
+    if current_values_json and not changed:
+        return current_values_json
+    return _dumps(counts)
 
 
 def _update_json_dict_field(current_values_json: Optional[str], updates: Dict[str, Any], sub_key_to_update: Optional[str] = None, items_to_add: Optional[List[str]] = None, max_list_items: int = 10) -> str:
@@ -66,58 +157,106 @@ def _update_json_dict_field(current_values_json: Optional[str], updates: Dict[st
     current_dict: Dict[str, Any] = {}
     if current_values_json:
         try:
-            loaded_dict = json.loads(current_values_json)
+            loaded_dict = _loads(current_values_json)
             if isinstance(loaded_dict, dict):
                 current_dict = loaded_dict
-        except json.JSONDecodeError:
+        except _JSONDecodeError:
             pass
 
     if sub_key_to_update and items_to_add: # Updating a list within the dictionary
-        sub_list_json = json.dumps(current_dict.get(sub_key_to_update, []))
-        updated_sub_list_json = _update_json_list_field(sub_list_json, items_to_add, add=True, max_items=max_list_items)
-        current_dict[sub_key_to_update] = json.loads(updated_sub_list_json)
+        sub_list = current_dict.get(sub_key_to_update)
+        current_dict[sub_key_to_update] = _dedupe_recent_list(
+            sub_list if isinstance(sub_list, list) else [], items_to_add, add=True, max_items=max_list_items
+        )
     else: # Merging at the top level
         for key, value in updates.items():
             # Basic merge, for lists, it could append or replace based on strategy
             # For this version, it will overwrite if keys conflict, unless value is a list to extend
             if isinstance(current_dict.get(key), list) and isinstance(value, list):
-                existing_list_json = json.dumps(current_dict[key])
-                updated_list_json = _update_json_list_field(existing_list_json,value, add=True, max_items=max_list_items * 2) # larger max for general dict lists
-                current_dict[key] = json.loads(updated_list_json)
+                current_dict[key] = _dedupe_recent_list(current_dict[key], value, add=True, max_items=max_list_items * 2) # larger max for general dict lists
             else:
                  current_dict[key] = value # Overwrite for non-lists or if types don't match for list merging
                  
-    return json.dumps(current_dict)
+    return _dumps(current_dict)
+
+
+def _iter_style_keywords(style_features: Optional[Dict[str, Any]]) -> Iterable[str]:
+    """Yields an item's identified styles, then its raw keywords, from its style_features dict"""
+    if not style_features:
+        return
+    for key in ("identified_styles", "raw_keywords"):
+        values = style_features.get(key)
+        if isinstance(values, list):
+            yield from values
+
+
+def _bulk_update_profile_lists(
+    style_profile: models.UserStyleProfile,
+    colors: Optional[List[str]] = None,
+    categories: Optional[List[str]] = None,
+    brands: Optional[List[str]] = None,
+    keywords: Optional[Iterable[str]] = None,
+    add: bool = True,
+) -> None:
+    """
+    Applies color/category/brand/keyword count updates to a style profile in one go, lowercasing the items.
+    Each column is parsed and serialized once, and only columns whose list actually changed are assigned,
+    so untouched columns stay clean in the session.
+    """
+    for field, items in (
+        ("preferred_colors", colors),
+        ("preferred_categories", categories),
+        ("preferred_brands", brands),
+        ("style_keywords", keywords),
+    ):
+        if not items:
+            continue
+        current_json = getattr(style_profile, field)
+        updated_json = _update_json_counter_field(current_json, items, add=add, normalize=True)
+        if updated_json is not current_json:
+            setattr(style_profile, field, updated_json)
+
+
+def _insert_ignoring_conflict(db: Session, model, conflict_column: str, **values):
+    """
+    Builds an INSERT that silently does nothing when `conflict_column` already holds the value,
+    or returns None if the session's dialect has no such form.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return pg_insert(model).values(**values).on_conflict_do_nothing(index_elements=[conflict_column])
+    if dialect == "sqlite":
+        return sqlite_insert(model).values(**values).on_conflict_do_nothing(index_elements=[conflict_column])
+    if dialect == "mysql":
+        # A no-op ON DUPLICATE KEY UPDATE rather than INSERT IGNORE, which would also turn FK and other errors into warnings
+        return mysql_insert(model).values(**values).on_duplicate_key_update({conflict_column: values[conflict_column]})
+    return None
 
 
 def get_or_create_user_style_profile(db: Session, user_id: int) -> models.UserStyleProfile:
     db_style_profile = db.query(models.UserStyleProfile).filter(models.UserStyleProfile.user_id == user_id).first()
-    if not db_style_profile:
-        db_style_profile = models.UserStyleProfile(
-            user_id=user_id,
-            preferred_colors=json.dumps([]),
-            preferred_categories=json.dumps([]),
-            preferred_brands=json.dumps([]),
-            style_keywords=json.dumps([]),
-            seasonal_preferences=json.dumps({}), # E.g., {"spring": {"colors": [], "styles": []}}
-            occasion_preferences=json.dumps({}), # E.g., {"formal": {"colors": [], "styles": []}}
-            last_updated=datetime.utcnow()
-        )
-        db.add(db_style_profile)
-        # No commit here, assume calling function will commit.
-        # However, for get_or_create, it's often better to commit immediately.
-        # Let's try committing here for atomicity of get_or_create.
-        try:
-            db.commit()
-            db.refresh(db_style_profile)
-        except Exception as e:
-            db.rollback()
-            # Re-fetch in case of concurrent creation, or raise error
-            db_style_profile = db.query(models.UserStyleProfile).filter(models.UserStyleProfile.user_id == user_id).first()
-            if not db_style_profile:
-                raise e # Re-raise if still not found after rollback & re-fetch
-            
-    return db_style_profile
+    if db_style_profile:
+        return db_style_profile
+
+    default_values = dict(
+        user_id=user_id,
+        preferred_colors=_dumps({}), # Preference counts, e.g. {"navy": 3, "black": 1}
+        preferred_categories=_dumps({}),
+        preferred_brands=_dumps({}),
+        style_keywords=_dumps({}),
+        seasonal_preferences=_dumps({}), # E.g., {"spring": {"colors": [], "styles": []}}
+        occasion_preferences=_dumps({}), # E.g., {"formal": {"colors": [], "styles": []}}
+        last_updated=func.now() # Tables created before the server default existed have none
+    )
+    # One statement that tolerates a concurrent creation, so there is no commit/rollback/re-fetch dance;
+    # the row joins the caller's transaction and is committed with it.
+    stmt = _insert_ignoring_conflict(db, models.UserStyleProfile, "user_id", **default_values)
+    if stmt is not None:
+        db.execute(stmt)
+    else:
+        db.add(models.UserStyleProfile(**default_values))
+        db.flush()
+    return db.query(models.UserStyleProfile).filter(models.UserStyleProfile.user_id == user_id).first()
 
 def sync_user_profile_to_style_profile(db: Session, user_id: int) -> Optional[models.UserStyleProfile]:
     user_profile = db.query(models.UserProfile).filter(models.UserProfile.user_id == user_id).first()
@@ -127,21 +266,28 @@ def sync_user_profile_to_style_profile(db: Session, user_id: int) -> Optional[mo
     style_profile = get_or_create_user_style_profile(db, user_id)
 
     if user_profile.preferred_colors:
-        # This will overwrite existing preferred_colors in UserStyleProfile with UserProfile's list
-        style_profile.preferred_colors = _update_json_list_field(None, user_profile.preferred_colors, add=True)
+        # Colors from UserProfile join the learned counts; colors already counted keep their counts
+        counted_colors = _load_counts(style_profile.preferred_colors)
+        missing_colors = [color for color in dict.fromkeys(user_profile.preferred_colors) if color and color not in counted_colors]
+        if missing_colors:
+            style_profile.preferred_colors = _update_json_counter_field(
+                style_profile.preferred_colors, missing_colors, add=True
+            )
     
     # For preferred_styles from UserProfile, add them to style_keywords in UserStyleProfile
     if user_profile.preferred_styles:
-        style_profile.style_keywords = _update_json_list_field(
+        style_keywords_json = _update_json_counter_field(
             style_profile.style_keywords,
-            [style.lower() for style in user_profile.preferred_styles],
-            add=True
+            user_profile.preferred_styles,
+            add=True,
+            normalize=True
         )
+        if style_keywords_json is not style_profile.style_keywords:
+            style_profile.style_keywords = style_keywords_json
     
     # Note: UserProfile.avoided_colors are not directly mapped here.
     # This logic could be integrated into recommendation filtering instead.
 
-    style_profile.last_updated = datetime.utcnow()
     # db.commit() # Assume calling function will commit
     return style_profile
 
@@ -149,7 +295,12 @@ def update_style_profile_from_item_interaction(
     db: Session, user_id: int, item_id: int, interaction_type: str # "favorite" or "unfavorite"
 ) -> Optional[models.UserStyleProfile]:
     
-    item = db.query(models.WardrobeItem).filter(models.WardrobeItem.id == item_id, models.WardrobeItem.user_id == user_id).first()
+    item = (
+        db.query(models.WardrobeItem)
+        .options(load_only(*_PREFERENCE_ITEM_COLUMNS))
+        .filter(models.WardrobeItem.id == item_id, models.WardrobeItem.user_id == user_id)
+        .first()
+    )
     if not item:
         return None
 
@@ -157,39 +308,15 @@ def update_style_profile_from_item_interaction(
     
     add_preference = interaction_type == "favorite"
 
-    # Preferred Colors
-    if item.dominant_color_name:
-        style_profile.preferred_colors = _update_json_list_field(
-            style_profile.preferred_colors, [item.dominant_color_name.lower()], add=add_preference
-        )
-
-    # Preferred Categories
-    if item.category:
-        style_profile.preferred_categories = _update_json_list_field(
-            style_profile.preferred_categories, [item.category.lower()], add=add_preference
-        )
-
-    # Preferred Brands
-    if item.brand:
-        style_profile.preferred_brands = _update_json_list_field(
-            style_profile.preferred_brands, [item.brand.lower()], add=add_preference
-        )
-
-    # Style Keywords from item's own style_features
-    if item.style_features:
-        item_style_features = item.style_features # This is already a dict
-        keywords_to_update = []
-        if isinstance(item_style_features.get("identified_styles"), list):
-            keywords_to_update.extend([s.lower() for s in item_style_features["identified_styles"]])
-        if isinstance(item_style_features.get("raw_keywords"), list):
-            keywords_to_update.extend([kw.lower() for kw in item_style_features["raw_keywords"]])
-        
-        if keywords_to_update:
-            style_profile.style_keywords = _update_json_list_field(
-                style_profile.style_keywords, keywords_to_update, add=add_preference
-            )
+    _bulk_update_profile_lists(
+        style_profile,
+        colors=[item.dominant_color_name],
+        categories=[item.category],
+        brands=[item.brand],
+        keywords=_iter_style_keywords(item.style_features), # Style Keywords from item's own style_features
+        add=add_preference,
+    )
             
-    style_profile.last_updated = datetime.utcnow()
     # db.commit() # Assume calling function will commit
     return style_profile
 
@@ -197,8 +324,17 @@ def update_style_profile_from_outfit_history(
     db: Session, user_id: int, outfit_id: int, style_history_entry: models.StyleHistory
 ) -> Optional[models.UserStyleProfile]:
     
-    outfit = db.query(models.Outfit).filter(models.Outfit.id == outfit_id, models.Outfit.user_id == user_id).first()
-    if not outfit:
+    # One round trip for the outfit's item columns, without hydrating Outfit/WardrobeItem objects.
+    # The outer joins yield a single all-NULL row for an outfit without items, and no rows if the
+    # outfit doesn't exist or isn't the user's.
+    outfit_item_rows = db.execute(
+        select(*_PREFERENCE_ITEM_COLUMNS)
+        .select_from(models.Outfit)
+        .outerjoin(models.outfit_item_association, models.outfit_item_association.c.outfit_id == models.Outfit.id)
+        .outerjoin(models.WardrobeItem, models.WardrobeItem.id == models.outfit_item_association.c.wardrobe_item_id)
+        .where(models.Outfit.id == outfit_id, models.Outfit.user_id == user_id)
+    ).all()
+    if not outfit_item_rows:
         return None
 
     style_profile = get_or_create_user_style_profile(db, user_id)
@@ -209,25 +345,26 @@ def update_style_profile_from_outfit_history(
     all_item_brands: List[str] = []
     all_item_style_keywords: List[str] = []
 
-    for item in outfit.items: # outfit.items should be the list of WardrobeItem objects
-        if item.dominant_color_name: all_item_colors.append(item.dominant_color_name.lower())
-        if item.category: all_item_categories.append(item.category.lower())
-        if item.brand: all_item_brands.append(item.brand.lower())
-        if item.style_features:
-            item_sf = item.style_features
-            if isinstance(item_sf.get("identified_styles"), list):
-                all_item_style_keywords.extend([s.lower() for s in item_sf["identified_styles"]])
-            if isinstance(item_sf.get("raw_keywords"), list):
-                all_item_style_keywords.extend([kw.lower() for kw in item_sf["raw_keywords"]])
-
-    if all_item_colors:
-        style_profile.preferred_colors = _update_json_list_field(style_profile.preferred_colors, all_item_colors, add=True)
-    if all_item_categories:
-        style_profile.preferred_categories = _update_json_list_field(style_profile.preferred_categories, all_item_categories, add=True)
-    if all_item_brands:
-        style_profile.preferred_brands = _update_json_list_field(style_profile.preferred_brands, all_item_brands, add=True)
-    if all_item_style_keywords:
-        style_profile.style_keywords = _update_json_list_field(style_profile.style_keywords, all_item_style_keywords, add=True)
+    # Bind the list methods once instead of looking them up for every item
+    c_app = all_item_colors.append
+    cat_app = all_item_categories.append
+    b_app = all_item_brands.append
+    sk_ext = all_item_style_keywords.extend
+
+    for color_name, category, brand, item_sf in outfit_item_rows:
+        # Lowercased by _bulk_update_profile_lists, which also skips empty values
+        c_app(color_name)
+        cat_app(category)
+        b_app(brand)
+        sk_ext(_iter_style_keywords(item_sf))
+
+    _bulk_update_profile_lists(
+        style_profile,
+        colors=all_item_colors,
+        categories=all_item_categories,
+        brands=all_item_brands,
+        keywords=all_item_style_keywords,
+    )
 
     # Occasion-specific preferences
     occasion_name: Optional[str] = None
@@ -251,13 +388,13 @@ def update_style_profile_from_outfit_history(
     # if occasion_name:
     #    current_occasion_prefs_json = style_profile.occasion_preferences
     #    # Load current dict
-    #    occasion_prefs_dict = json.loads(current_occasion_prefs_json) if current_occasion_prefs_json else {}
+    #    occasion_prefs_dict = _loads(current_occasion_prefs_json) if current_occasion_prefs_json else {}
     #    occasion_key_data = occasion_prefs_dict.get(occasion_name, {})
     #
     #    # Update colors for this occasion
-    #    occasion_colors_json = json.dumps(occasion_key_data.get("colors", []))
+    #    occasion_colors_json = _dumps(occasion_key_data.get("colors", []))
     #    updated_occasion_colors_json = _update_json_list_field(occasion_colors_json, all_item_colors, add=True)
-    #    occasion_key_data["colors"] = json.loads(updated_occasion_colors_json)
+    #    occasion_key_data["colors"] = _loads(updated_occasion_colors_json)
     #    
     #    # Update styles for this occasion (using identified_styles from items)
     #    item_identified_styles = []
@@ -265,15 +402,14 @@ def update_style_profile_from_outfit_history(
     #        if item.style_features and isinstance(item.style_features.get("identified_styles"), list):
     #            item_identified_styles.extend([s.lower() for s in item.style_features["identified_styles"]])
     #    
-    #    occasion_styles_json = json.dumps(occasion_key_data.get("styles", []))
+    #    occasion_styles_json = _dumps(occasion_key_data.get("styles", []))
     #    updated_occasion_styles_json = _update_json_list_field(occasion_styles_json, list(set(item_identified_styles)), add=True)
-    #    occasion_key_data["styles"] = json.loads(updated_occasion_styles_json)
+    #    occasion_key_data["styles"] = _loads(updated_occasion_styles_json)
     #
     #    occasion_prefs_dict[occasion_name] = occasion_key_data
-    #    style_profile.occasion_preferences = json.dumps(occasion_prefs_dict)
+    #    style_profile.occasion_preferences = _dumps(occasion_prefs_dict)
 
 
-    style_profile.last_updated = datetime.utcnow()
     # db.commit() # Assume calling function will commit
     return style_profile
 
@@ -397,6 +397,8 @@ class FeedbackBase(BaseModel):
     @model_validator(mode='before')
     @classmethod
     def check_at_least_one_field(cls, values):
+        if not isinstance(values, dict): # ORM rows (from_attributes) were validated when created
+            return values
         feedback_text = values.get('feedback_text')
         rating = values.get('rating')
         if not feedback_text and rating is None: # Check if both are None or empty string for text
@@ -0,0 +1,91 @@
+import io
+
+import pytest
+from PIL import Image
+
+from ..services.color_detector import ColorDetector
+
+
+def create_image_bytes(color=(200, 30, 40), size=(50, 50), format="PNG") -> bytes:
+    image = Image.new('RGB', size, color=color)
+    byte_io = io.BytesIO()
+    image.save(byte_io, format=format)
+    return byte_io.getvalue()
+
+
+@pytest.fixture
+def detector():
+    return ColorDetector()
+
+
+def test_analyze_palette_matches_per_color_properties(detector):
+    palette = [(250, 240, 230), (20, 30, 120), (128, 128, 128)]
+
+    properties, harmony = detector._analyze_palette(palette)
+
+    assert properties == [detector._analyze_color_properties(rgb) for rgb in palette]
+    assert harmony == detector._analyze_color_harmony(palette)
+    assert harmony["contrast"] == "high"
+
+
+def test_analyze_palette_empty(detector):
+    properties, harmony = detector._analyze_palette([])
+
+    assert properties == []
+    assert harmony["scheme"] == "monochromatic"
+
+
+def test_extract_dominant_color_is_cached_by_image_content(detector):
+    image_data = create_image_bytes()
+
+    first = detector.extract_dominant_color(image_data)
+    second = detector.extract_dominant_color(bytes(image_data))
+
+    assert first["success"] is True
+    assert first == second
+    assert len(detector._result_cache) == 1
+
+
+def test_cached_results_are_not_shared_with_callers(detector):
+    image_data = create_image_bytes()
+
+    first = detector.extract_dominant_color(image_data)
+    first["dominant_color"]["name"] = "edited"
+    first["success"] = False
+    second = detector.extract_dominant_color(image_data)
+    second["dominant_color"]["rgb"] = (0, 0, 0)
+
+    third = detector.extract_dominant_color(image_data)
+    assert third["success"] is True
+    assert third["dominant_color"]["name"] != "edited"
+    assert third["dominant_color"]["rgb"] == (200, 30, 40)
+
+
+def test_extract_dominant_color_failure_is_not_cached(detector):
+    result = detector.extract_dominant_color(b"not an image")
+
+    assert result["success"] is False
+    assert len(detector._result_cache) == 0
+
+
+def test_analyze_shares_results_with_individual_extractors(detector):
+    image_data = create_image_bytes(color=(20, 40, 160))
+
+    result = detector.analyze(image_data, color_count=3)
+
+    assert result["success"] is True
+    assert result["dominant"] == detector.extract_dominant_color(image_data)
+    assert result["palette"] == detector.extract_color_palette(image_data, color_count=3)
+    assert len(detector._result_cache) == 2
+    assert result["palette"]["palette"][0]["rgb"] == result["dominant"]["dominant_color"]["rgb"]
+
+
+def test_extract_dominant_colors_batch_matches_single_extraction(detector):
+    images_data = [create_image_bytes(color=(200, 30, 40)), b"not an image", create_image_bytes(color=(10, 10, 10))]
+
+    results = detector.extract_dominant_colors_batch(images_data)
+
+    assert [r["success"] for r in results] == [True, False, True]
+    assert results[0]["dominant_color"]["rgb"] == (200, 30, 40)
+    assert results[2]["dominant_color"]["name"] == "black"
+    assert ColorDetector().extract_dominant_color(images_data[0]) == results[0]
@@ -0,0 +1,135 @@
+import pytest
+
+from ..services.intelligent_matching import (
+    ColorTheory,
+    IntelligentMatchingAlgorithm,
+    OccasionMatcher,
+    StyleCompatibility,
+    build_bank,
+)
+
+
+@pytest.fixture
+def matcher():
+    return IntelligentMatchingAlgorithm()
+
+
+@pytest.fixture
+def wardrobe():
+    return [
+        {"id": "1", "name": "Blue Shirt", "category": "tops", "style": "business", "colors": ["#4A90E2"]},
+        {"id": "2", "name": "Black Trousers", "category": "bottoms", "style": "business", "colors": ["#000000"]},
+        {"id": "3", "name": "Red Sneakers", "category": "shoes", "style": "casual", "colors": ["#FF0000", "#FFFFFF"]},
+        {"id": "4", "name": "Green Scarf", "category": "accessories", "style": "bohemian", "colors": ["#2E8B57", "#FF0000"]},
+        {"id": "5", "name": "White Tee", "category": "tops", "style": "casual", "colors": []},
+    ]
+
+
+def test_batch_harmony_matches_scalar_harmony():
+    base = ["#4A90E2", "#FF0000"]
+    extras = [[], ["#4A90E2"], ["#000000", "#00FF00"], ["#FF0000", "#123456", "#123456"]]
+
+    batch = ColorTheory.batch_pair_harmony_scores(base, extras)
+
+    expected = [ColorTheory.calculate_color_harmony_score(base + colors) for colors in extras]
+    assert batch == pytest.approx(expected)
+
+
+def test_find_matching_items_matches_pairwise_scoring(matcher, wardrobe):
+    target = wardrobe[0]
+
+    matches = matcher.find_matching_items(target, wardrobe, max_suggestions=10)
+
+    assert all(match["id"] != target["id"] for match in matches)
+    scores = [match["compatibility_score"] for match in matches]
+    assert scores == sorted(scores, reverse=True)
+    for match in matches:
+        item = next(item for item in wardrobe if item["id"] == match["id"])
+        assert match["compatibility_score"] == pytest.approx(
+            matcher._calculate_item_compatibility(target, item).total
+        )
+        assert match["match_reasons"]
+
+
+def test_style_compatibility_array_matches_scalar():
+    styles = ["casual", "Business", "retro", "fun", "FUN", "unknown", ""]
+
+    for style in styles:
+        expected = [StyleCompatibility.calculate_style_compatibility(style, other) for other in styles]
+        assert StyleCompatibility.style_compatibility_array(style, styles).tolist() == expected
+
+
+def test_occasion_score():
+    assert OccasionMatcher.calculate_occasion_score("Formal", "wedding") == 0.9
+    assert OccasionMatcher.calculate_occasion_score("sporty", "Work") == 0.2
+    # Neither preferred nor avoided: scored by formality distance
+    assert OccasionMatcher.calculate_occasion_score("minimalist", "work") == pytest.approx(0.9)
+    assert OccasionMatcher.calculate_occasion_score("unknown", "wedding") == pytest.approx(0.6)
+    assert OccasionMatcher.calculate_occasion_score("formal", "unknown") == 0.5
+
+
+def test_find_matching_items_with_occasion(matcher, wardrobe):
+    matches = matcher.find_matching_items(wardrobe[0], wardrobe, occasion="party")
+
+    for match in matches:
+        item = next(item for item in wardrobe if item["id"] == match["id"])
+        assert match["compatibility_score"] == pytest.approx(
+            matcher._calculate_item_compatibility(wardrobe[0], item, "party").total
+        )
+
+
+def test_category_compatibility_is_symmetric():
+    for first, second in [("tops", "bottoms"), ("Shoes", "accessories")]:
+        score = IntelligentMatchingAlgorithm._calculate_category_compatibility(first, second)
+        assert score == IntelligentMatchingAlgorithm._calculate_category_compatibility(second, first)
+    assert IntelligentMatchingAlgorithm._calculate_category_compatibility("Tops", "bottoms") == 0.9
+    assert IntelligentMatchingAlgorithm._calculate_category_compatibility("tops", "tops") == 0.3
+    assert IntelligentMatchingAlgorithm._calculate_category_compatibility("tops", "hats") == 0.5
+
+
+def test_find_matching_items_accepts_item_bank(matcher, wardrobe):
+    bank = build_bank(wardrobe)
+
+    for target in wardrobe:
+        assert matcher.find_matching_items(target, bank, "work") == matcher.find_matching_items(
+            target, wardrobe, "work"
+        )
+
+
+def test_compatibility_matrix_matches_pairwise(matcher, wardrobe):
+    targets = wardrobe[:2] + [{"id": "6", "category": "Dresses", "style": "Retro", "colors": ["#4A90E2"]}]
+    preferences = {"preferred_colors": ["#FF0000"], "preferred_styles": ["casual"], "avoided_colors": ["#000000"]}
+
+    scores = matcher.compatibility_matrix(targets, wardrobe, "date", preferences)
+
+    assert scores.shape == (len(targets), len(wardrobe))
+    for row, target in enumerate(targets):
+        expected = [
+            matcher._calculate_item_compatibility(target, item, "date", preferences).total for item in wardrobe
+        ]
+        assert scores[row] == pytest.approx(expected)
+
+
+def test_find_matching_items_caches_rankings(matcher, wardrobe):
+    first = matcher.find_matching_items(wardrobe[0], wardrobe)
+    assert len(matcher._result_cache) == 1
+
+    renamed = [{**item, "name": item["name"].upper()} for item in wardrobe]
+    second = matcher.find_matching_items(wardrobe[0], renamed)
+    assert len(matcher._result_cache) == 1
+    assert [match["name"] for match in second] == [match["name"].upper() for match in first]
+
+    recolored = [{**item, "colors": ["#FF00FF"]} if item["id"] == "2" else item for item in wardrobe]
+    matcher.find_matching_items(wardrobe[0], recolored)
+    assert len(matcher._result_cache) == 2
+
+
+def test_find_matching_items_respects_max_suggestions(matcher, wardrobe):
+    matches = matcher.find_matching_items(wardrobe[0], wardrobe, max_suggestions=2)
+
+    assert len(matches) == 2
+    assert matches[0]["id"] == "2"
+
+
+def test_find_matching_items_empty_wardrobe(matcher, wardrobe):
+    assert matcher.find_matching_items(wardrobe[0], [wardrobe[0]]) == []
@@ -0,0 +1,277 @@
+import os
+
+import pytest
+
+import numpy as np
+
+from ..services import ml_personalized_recommendations
+from ..services.ml_personalized_recommendations import PersonalizedRecommendationModel, PriceStats, UserBehaviorAnalyzer
+
+
+@pytest.fixture
+def training_data():
+    return [
+        {
+            "user_id": "user1",
+            "wardrobe_items": [
+                {"id": "1", "name": "Blue Shirt", "colors": ["#0000FF"], "style": "business", "category": "tops", "price": 50},
+                {"id": "2", "name": "Black Pants", "colors": ["#000000"], "style": "business", "category": "bottoms", "price": 80},
+                {"id": "3", "name": "Red Sneakers", "colors": ["#FF0000", "#FFFFFF"], "style": "casual", "category": "shoes", "price": 1500},
+            ],
+            "outfit_history": [
+                {
+                    "date": "2024-01-15",
+                    "occasion": "work",
+                    "items": [
+                        {"id": "1", "colors": ["#0000FF"], "style": "business", "category": "tops"},
+                        {"id": "2", "colors": ["#000000"], "style": "business", "category": "bottoms"},
+                    ],
+                }
+            ],
+        }
+    ]
+
+
+@pytest.fixture
+def model(training_data):
+    model = PersonalizedRecommendationModel(cache_dir=None)
+    model.train_model(training_data)
+    return model
+
+
+def test_feature_matrix_one_hot_layout():
+    items = [
+        {"colors": ["#FF0000", "#FFFFFF", "#123456"], "style": "formal", "category": "shoes", "price": 250},
+        {"colors": [], "style": "unknown", "category": "hats", "price": 5000},
+        {},
+    ]
+
+    features = PersonalizedRecommendationModel._build_feature_matrix(items)
+
+    assert features.shape == (3, 21)
+    assert features[0].tolist() == [1, 0, 0, 0, 0, 0, 0, 1] + [0, 1, 0, 0, 0, 0] + [0, 0, 1, 0, 0, 0] + [0.25]
+    assert features[1].tolist() == [0] * 20 + [1.0]
+    # Missing style defaults to casual
+    assert features[2].tolist() == [0] * 8 + [1, 0, 0, 0, 0, 0] + [0] * 6 + [0]
+
+
+def test_color_masks_flag_palette_colors():
+    items = [{"colors": ["#FF0000", "#FFFFFF", "#123456", "#FF0000"]}, {"colors": ["#0000FF"]}, {}]
+
+    masks = PersonalizedRecommendationModel._build_color_masks(items)
+
+    assert masks.tolist() == [0b10000001, 0b100, 0]
+
+
+def test_recommendations_are_ranked_and_thresholded(model):
+    available_items = [
+        {"id": "4", "name": "White Shirt", "colors": ["#FFFFFF"], "style": "business", "category": "tops", "price": 45},
+        {"id": "5", "name": "Red Dress", "colors": ["#FF0000"], "style": "elegant", "category": "dresses", "price": 120},
+        {"id": "6", "name": "Navy Blazer", "colors": ["#0000FF"], "style": "business", "category": "outerwear"},
+    ]
+
+    recommendations = model.get_personalized_recommendations(
+        "user1", occasion="work", available_items=available_items
+    )
+
+    scores = [recommendation["recommendation_score"] for recommendation in recommendations]
+    assert scores == sorted(scores, reverse=True)
+    assert all(score > 0.3 for score in scores)
+    assert [recommendation["id"] for recommendation in recommendations] == ["6", "4"]
+    assert "Perfect for work occasions" in recommendations[0]["recommendation_reasons"]
+
+
+def test_recommendations_for_unknown_user(model):
+    assert model.get_personalized_recommendations("nobody", available_items=[{"id": "1"}]) == []
+
+
+def test_item_similarity_is_cosine_of_feature_rows(model):
+    shirt, pants = {"id": "1"}, {"id": "2"}
+    # Shared business style, different color and category, prices 50 and 80
+    expected = (1 + 0.05 * 0.08) / ((3 + 0.05 ** 2) ** 0.5 * (3 + 0.08 ** 2) ** 0.5)
+
+    # Features are stored in float16
+    assert model._get_item_similarity(shirt, shirt) == pytest.approx(1.0, abs=1e-3)
+    assert model._get_item_similarity(shirt, pants) == pytest.approx(expected, abs=1e-3)
+    assert model._get_item_similarity(pants, shirt) == model._get_item_similarity(shirt, pants)
+    assert model._get_item_similarity(shirt, {"id": "missing"}) == 0.0
+
+
+def test_batch_scores_match_single_item_scores(model):
+    items = [
+        {"id": "1", "colors": ["#0000FF", "#000000"], "style": "business", "category": "tops"},
+        {"id": "3", "colors": [], "category": "shoes"},
+        {"id": "missing", "colors": ["#FF0000"], "style": "formal"},
+    ]
+    profile = model.user_profiles["user1"]
+    target = {"id": "2", "name": "Black Pants"}
+
+    scores = model._calculate_personalized_scores(items, profile, target, "work")
+
+    assert scores.tolist() == pytest.approx(
+        [model._calculate_personalized_score(item, profile, target, "work") for item in items]
+    )
+    assert model._calculate_personalized_scores([], profile, target, "work").shape == (0,)
+    assert model.get_personalized_recommendations("user1", available_items=[]) == []
+
+
+def test_top_k_keeps_input_order_for_tied_scores(model):
+    available_items = [{"id": str(i), "colors": ["#0000FF"], "style": "business"} for i in range(10, 20)]
+    available_items.insert(4, {"id": "best", "colors": ["#0000FF", "#000000"], "style": "business", "category": "tops"})
+
+    recommendations = model.get_personalized_recommendations("user1", available_items=available_items, num_recommendations=3)
+
+    assert [recommendation["id"] for recommendation in recommendations] == ["best", "10", "11"]
+
+
+def test_preference_analysis_is_memoized_per_user_data(model, training_data):
+    analyzer = model.behavior_analyzer
+    user_data = training_data[0]
+
+    assert analyzer.analyze_user_preferences(user_data) is model.user_profiles["user1"]
+
+    changed = {**user_data, "wardrobe_items": user_data["wardrobe_items"][:1]}
+    assert analyzer.analyze_user_preferences(changed)["style_preferences"] == {"business": 1.0}
+
+
+def test_invalidate_drops_memoized_preferences(model, training_data):
+    analyzer = model.behavior_analyzer
+    profile = analyzer.analyze_user_preferences(training_data[0])
+
+    analyzer.invalidate("user1")
+
+    recomputed = analyzer.analyze_user_preferences(training_data[0])
+    assert recomputed is not profile
+    assert recomputed == profile
+
+
+@pytest.mark.parametrize("filename", ["model.npz", "model.json"])
+def test_save_and_load_round_trip(model, tmp_path, filename):
+    filepath = str(tmp_path / filename)
+    model.save_model(filepath)
+
+    loaded = PersonalizedRecommendationModel(cache_dir=None)
+    loaded.load_model(filepath)
+
+    assert loaded.is_trained
+    assert loaded.item_ids == model.item_ids
+    assert loaded.item_features_norm.tolist() == model.item_features_norm.tolist()
+    assert loaded._get_item_similarity({"id": "1"}, {"id": "2"}) == model._get_item_similarity({"id": "1"}, {"id": "2"})
+    available_items = [{"id": "4", "colors": ["#0000FF"], "style": "business", "category": "tops"}]
+    assert loaded.get_personalized_recommendations("user1", occasion="work", available_items=available_items) == \
+        model.get_personalized_recommendations("user1", occasion="work", available_items=available_items)
+
+
+def test_outfit_seasons_use_the_written_calendar_month():
+    outfit_history = [
+        {"date": "2024-03-31T23:00:00-05:00"},
+        {"date": "2024-07-02T10:00:00Z"},
+        {"date": "2024-12-01"},
+        {"date": "not a date"},
+        {"date": None},
+        {},
+    ]
+
+    seasons = UserBehaviorAnalyzer._get_outfit_seasons(outfit_history)
+
+    assert seasons == ["spring", "summer", "winter", None, None, None]
+
+
+def test_reason_sets_follow_profile_replacement(model):
+    profile = model.user_profiles["user1"]
+    reason_sets = model._get_reason_sets("user1", profile)
+
+    assert reason_sets.preferred_styles == {"business"}
+    assert reason_sets.known_occasions == {"work"}
+    assert model._get_reason_sets("user1", profile) is reason_sets
+
+    model.user_profiles["user1"] = {**profile, "occasion_patterns": {}}
+    assert model._get_reason_sets("user1", model.user_profiles["user1"]).known_occasions == frozenset()
+
+
+def test_price_stats_match_numpy():
+    prices = [45, 120.5, 80, 1500, 80]
+    stats = PriceStats()
+    for price in prices:
+        stats.add(price)
+
+    assert stats.mean == pytest.approx(np.mean(prices))
+    assert stats.std == pytest.approx(np.std(prices))
+    assert (stats.min_price, stats.max_price) == (45, 1500)
+
+
+def test_find_similar_items(model):
+    neighbours = model.find_similar_items({"id": "1"}, k=5)
+
+    assert [item_id for item_id, _ in neighbours] == ["2", "3"]
+    assert neighbours[0][1] == pytest.approx(model._get_item_similarity({"id": "1"}, {"id": "2"}))
+    assert neighbours[0][1] > neighbours[1][1]
+    assert model.find_similar_items({"id": "missing"}) == []
+
+
+def test_recommendations_for_target_item_add_similarity(model):
+    available_items = [{"id": "2", "name": "Black Pants", "colors": ["#000000"], "style": "business", "category": "bottoms"}]
+    target_item = {"id": "1", "name": "Blue Shirt"}
+
+    without_target = model.get_personalized_recommendations("user1", available_items=available_items)
+    with_target = model.get_personalized_recommendations("user1", target_item=target_item, available_items=available_items)
+
+    similarity = model._get_item_similarity(target_item, available_items[0])
+    assert similarity > 0
+    assert with_target[0]["recommendation_score"] == pytest.approx(without_target[0]["recommendation_score"] + 0.15 * similarity)
+    assert "Complements your Blue Shirt" in with_target[0]["recommendation_reasons"]
+
+
+def test_trained_model_is_cached_by_training_data(training_data, tmp_path):
+    trained = PersonalizedRecommendationModel(cache_dir=str(tmp_path))
+    trained.train_model(training_data)
+    cached_files = list(tmp_path.glob("*.npz"))
+    assert len(cached_files) == 1
+
+    cached = PersonalizedRecommendationModel(cache_dir=str(tmp_path))
+    cached.behavior_analyzer.analyze_user_preferences = None  # training must not run
+    cached.train_model(training_data)
+
+    assert cached.is_trained
+    assert cached.item_ids == trained.item_ids
+    assert cached.user_profiles == trained.user_profiles
+
+
+@pytest.mark.parametrize("filename", ["model.npz", "model.json"])
+def test_round_trip_keeps_int_user_and_item_ids(training_data, tmp_path, filename):
+    training_data[0]["user_id"] = 1
+    for item in training_data[0]["wardrobe_items"]:
+        item["id"] = int(item["id"])
+    model = PersonalizedRecommendationModel(cache_dir=None)
+    model.train_model(training_data)
+    filepath = str(tmp_path / filename)
+    model.save_model(filepath)
+
+    loaded = PersonalizedRecommendationModel(cache_dir=None)
+    loaded.load_model(filepath)
+
+    assert list(loaded.user_profiles) == [1]
+    assert loaded.item_ids == [1, 2, 3]
+    target_item = {"id": 1, "name": "Blue Shirt"}
+    available_items = [{"id": 2, "name": "Black Pants", "colors": ["#000000"], "style": "business", "category": "bottoms"}]
+    recommendations = loaded.get_personalized_recommendations(1, target_item=target_item, available_items=available_items)
+    assert recommendations == model.get_personalized_recommendations(1, target_item=target_item, available_items=available_items)
+    assert len(recommendations) == 1
+    assert loaded._get_item_similarity(target_item, available_items[0]) > 0
+
+
+def test_model_cache_keeps_the_most_recently_used_entries(training_data, tmp_path, monkeypatch):
+    monkeypatch.setattr(ml_personalized_recommendations, "MODEL_CACHE_MAX_ENTRIES", 2)
+    ml_model = PersonalizedRecommendationModel(cache_dir=str(tmp_path))
+    variants = []
+    for price in (10, 20, 30):
+        data = [{**training_data[0], "wardrobe_items": [{**training_data[0]["wardrobe_items"][0], "price": price}]}]
+        PersonalizedRecommendationModel(cache_dir=str(tmp_path)).train_model(data)
+        variants.append(data)
+        for path in tmp_path.glob(os.path.basename(ml_model._training_cache_path(data))[:-4] + ".*"):
+            os.utime(path, (len(variants), len(variants)))  # distinct, increasing use times
+
+    cached = sorted(path.name for path in tmp_path.iterdir())
+    assert len(cached) == 4  # two .npz archives and their sidecars
+    assert os.path.basename(ml_model._training_cache_path(variants[0])) not in cached
+    assert os.path.basename(ml_model._training_cache_path(variants[2])) in cached
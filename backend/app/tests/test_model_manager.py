@@ -0,0 +1,149 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("tensorflow")
+pytest.importorskip("tensorflow_hub")
+
+from ..services import model_manager as model_manager_module
+from ..services.model_manager import ModelManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = ModelManager(cache_dir=str(tmp_path / "models"))
+    yield manager
+    manager.shutdown(wait=True)
+
+
+def test_concurrent_callers_share_one_load(manager, monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def slow_load(model_name):
+        calls.append(model_name)
+        release.wait(5)
+        return "model"
+
+    monkeypatch.setattr(manager, "_load_model", slow_load)
+    results = []
+    callers = [threading.Thread(target=lambda: results.append(manager.get_model("mobilenet_v2"))) for _ in range(4)]
+    for caller in callers:
+        caller.start()
+    release.set()
+    for caller in callers:
+        caller.join(5)
+
+    assert calls == ["mobilenet_v2"]
+    assert results == ["model"] * 4
+
+
+def test_failed_loads_are_resubmitted(manager, monkeypatch):
+    outcomes = [None, "model"]
+    calls = []
+
+    def flaky_load(model_name):
+        calls.append(model_name)
+        return outcomes.pop(0)
+
+    monkeypatch.setattr(manager, "_load_model", flaky_load)
+
+    assert manager.get_model("mobilenet_v2") is None
+    assert manager.get_model("mobilenet_v2") == "model"
+    assert manager.get_model("mobilenet_v2") == "model"
+    assert calls == ["mobilenet_v2", "mobilenet_v2"]
+
+
+def test_preload_submits_each_model_once(manager, monkeypatch):
+    calls = []
+    monkeypatch.setattr(manager, "_load_model", lambda model_name: calls.append(model_name) or model_name)
+
+    manager.preload()
+    manager.preload()
+
+    assert {name: manager.get_model(name) for name in manager.model_configs} == {name: name for name in manager.model_configs}
+    assert sorted(calls) == sorted(manager.model_configs)
+
+
+def test_clear_cache_drops_the_future_and_cache_check(manager, monkeypatch):
+    calls = []
+    monkeypatch.setattr(manager, "_load_model", lambda model_name: calls.append(model_name) or "model")
+    monkeypatch.setattr(manager, "_check_model_cache", lambda model_name: True)
+    manager.get_model("mobilenet_v2")
+    manager.is_model_cached("mobilenet_v2")
+
+    manager.clear_cache("mobilenet_v2")
+
+    assert "mobilenet_v2" not in manager._futures
+    assert "mobilenet_v2" not in manager._cached_ok
+    manager.get_model("mobilenet_v2")
+    assert calls == ["mobilenet_v2", "mobilenet_v2"]
+
+
+def test_cache_checks_are_reused_until_the_ttl_expires(manager, monkeypatch):
+    now = [1000.0]
+    checks = []
+    monkeypatch.setattr(model_manager_module.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(manager, "_check_model_cache", lambda model_name: checks.append(model_name) or True)
+
+    assert manager.is_model_cached("mobilenet_v2")
+    now[0] += model_manager_module.CACHE_CHECK_TTL - 1
+    assert manager.is_model_cached("mobilenet_v2")
+    assert checks == ["mobilenet_v2"]
+
+    now[0] += 2
+    assert manager.is_model_cached("mobilenet_v2")
+    assert checks == ["mobilenet_v2", "mobilenet_v2"]
+
+
+def test_shutdown_cancels_loads_that_have_not_started(tmp_path, monkeypatch):
+    manager = ModelManager(cache_dir=str(tmp_path / "models"))
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking_load(model_name):
+        started.set()
+        release.wait(5)
+        return model_name
+
+    monkeypatch.setattr(manager, "_load_model", blocking_load)
+    manager._pool = ThreadPoolExecutor(max_workers=1)
+    manager.preload()
+    started.wait(5)
+
+    manager.shutdown()
+    release.set()
+
+    futures = [manager._futures[name] for name in manager.model_configs]
+    assert futures[0].result(5) == "mobilenet_v2"
+    assert futures[1].cancelled()
+
+
+def test_int8_flatbuffer_embeddings_stay_close_to_the_float_model(manager):
+    import numpy as np
+    import tensorflow as tf
+
+    from ..services.model_manager import TFLiteModel
+
+    # A small stand-in for the MobileNetV2 feature extractor, quantized the same way
+    input_shape = (32, 32, 3)
+    tf.random.set_seed(0)
+    inputs = tf.keras.Input(shape=input_shape)
+    features = tf.keras.layers.Conv2D(16, 3, activation="relu")(inputs)
+    features = tf.keras.layers.Conv2D(32, 3, strides=2, activation="relu")(features)
+    outputs = tf.keras.layers.GlobalAveragePooling2D()(features)
+    model = tf.keras.Model(inputs=inputs, outputs=outputs)
+    manager.model_configs["tiny"] = {**manager.model_configs["mobilenet_v2"], "input_shape": input_shape}
+    manager._tflite_path_str["tiny"] = str(manager.cache_dir / "tiny.tflite")
+
+    manager._save_tflite("tiny", model)
+    quantized = TFLiteModel(manager._tflite_path_str["tiny"])
+
+    images = np.random.default_rng(1).random((8, *input_shape), dtype=np.float32)
+    expected = model(images).numpy()
+    actual = np.concatenate([quantized(image[None]).numpy() for image in images])
+    cosine = (expected * actual).sum(axis=1) / (np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1))
+
+    assert quantized.input_details["dtype"] == np.uint8
+    assert cosine.min() > 0.98
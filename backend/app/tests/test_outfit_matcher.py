@@ -0,0 +1,176 @@
+import numpy as np
+import pytest
+
+from ..services import outfit_matcher
+from ..services.outfit_matcher import (
+    ClothingItem,
+    ColorMatcher,
+    OccasionType,
+    OutfitMatcher,
+    SeasonType,
+    StyleMatcher,
+    WardrobeSoA,
+    WeatherType,
+)
+
+ALL_OCCASIONS = list(OccasionType)
+ALL_SEASONS = list(SeasonType)
+ALL_WEATHER = list(WeatherType)
+
+
+def make_item(item_id, category, color, style, formality, **overrides):
+    fields = dict(
+        id=item_id, name=f"Item {item_id}", category=category, color=color, style=style,
+        occasion_suitability=ALL_OCCASIONS, season_suitability=ALL_SEASONS, weather_suitability=ALL_WEATHER,
+        formality_level=formality, comfort_level=5, tags=[],
+    )
+    fields.update(overrides)
+    return ClothingItem(**fields)
+
+
+@pytest.fixture
+def wardrobe():
+    return [
+        make_item("1", "top", "#FFFFFF", "classic", 8),
+        make_item("2", "top", "#FF0000", "casual", 3),
+        make_item("3", "bottom", "#2F4F4F", "business", 7),
+        make_item("4", "bottom", "#0000FF", "casual", 4),
+        make_item("5", "shoes", "#000000", "formal", 9),
+        make_item("6", "shoes", "#FFFFFF", "sporty", 2),
+        make_item("7", "outerwear", "#808080", "business", 8),
+        make_item("8", "accessory", "#FFD700", "elegant", 7),
+        make_item("9", "top", "#000000", "formal", 9, occasion_suitability=[OccasionType.PARTY]),
+    ]
+
+
+def test_pairwise_harmony_matches_scalar_harmony():
+    colors = ["#FFFFFF", "#000000", "#FF0000", "#00FFFF", "#2F4F4F", "#FFD700", "#123456", "#808080"]
+
+    harmony = ColorMatcher.pairwise_harmony(ColorMatcher.hex_array_to_hsv(colors))
+
+    expected = [[ColorMatcher.calculate_color_harmony(color1, color2) for color2 in colors] for color1 in colors]
+    assert harmony.tolist() == expected
+
+
+def test_pairwise_matrix_matches_pairwise_scoring(wardrobe):
+    matcher = OutfitMatcher()
+    soa = WardrobeSoA.from_items(wardrobe)
+
+    compatibility = soa.pairwise_matrix()
+
+    expected = [[matcher._calculate_item_compatibility(item1, item2) for item2 in wardrobe] for item1 in wardrobe]
+    assert compatibility.tolist() == expected
+    assert soa.pairwise_matrix([2, 0], [1]).tolist() == [[expected[2][1]], [expected[0][1]]]
+    assert soa.pairwise_matrix([0], []).shape == (1, 0)
+
+def test_complete_outfit_is_best_scoring_combination(wardrobe):
+    matcher = OutfitMatcher()
+
+    outfit = matcher.create_complete_outfit(wardrobe, OccasionType.BUSINESS, SeasonType.FALL, WeatherType.WINDY)
+
+    ids = [item.id for item in outfit.items]
+    assert [item.category for item in outfit.items] == ["top", "bottom", "shoes", "outerwear", "accessory"]
+    assert "9" not in ids
+    assert outfit.confidence_score == pytest.approx(matcher._calculate_outfit_score(outfit.items))
+    best = max(
+        matcher._calculate_outfit_score([top, bottom, shoes, wardrobe[6], wardrobe[7]])
+        for top in wardrobe[0:2] for bottom in wardrobe[2:4] for shoes in wardrobe[4:6]
+    )
+    assert outfit.confidence_score == pytest.approx(best)
+
+
+def test_complete_outfit_without_required_categories_falls_back(wardrobe):
+    outfit = OutfitMatcher().create_complete_outfit(
+        [item for item in wardrobe if item.category != "shoes"], OccasionType.CASUAL, SeasonType.SUMMER, WeatherType.SUNNY
+    )
+
+    assert outfit.items == []
+    assert outfit.confidence_score == 0.0
+
+
+def test_find_matching_items_is_sorted_and_thresholded(wardrobe):
+    matcher = OutfitMatcher()
+    base = wardrobe[0]
+
+    matches = matcher.find_matching_items(base, wardrobe, OccasionType.BUSINESS, SeasonType.FALL, WeatherType.SUNNY)
+
+    scores = [matcher._calculate_item_compatibility(base, item) for item in matches]
+    assert base not in matches and wardrobe[8] not in matches
+    assert scores == sorted(scores, reverse=True)
+    assert all(score > 0.6 for score in scores)
+
+
+def test_soa_suitable_matches_item_suitability(wardrobe):
+    soa = WardrobeSoA.from_items(wardrobe)
+    context = OutfitMatcher._context_bits(OccasionType.BUSINESS, SeasonType.FALL, WeatherType.WINDY)
+
+    assert soa.suitable(*context).tolist() == [i for i, item in enumerate(wardrobe) if item.is_suitable(*context)]
+    assert soa.style_names[soa.style_id[0]] == "classic"
+
+
+def test_style_ids_index_the_wardrobe_compatibility_table():
+    items = [make_item(str(i), "top", "#FFFFFF", style, 5) for i, style in enumerate(["Smart Casual", "smart casual", "Casual"])]
+    soa = WardrobeSoA.from_items(items)
+
+    assert soa.style_names == ["smart casual", "casual"]
+    assert soa.style_id[0] == soa.style_id[1] != soa.style_id[2]
+    table = StyleMatcher.compatibility_table(soa.style_names)
+    for i, item1 in enumerate(items):
+        for j, item2 in enumerate(items):
+            assert table[soa.style_id[i], soa.style_id[j]] == \
+                StyleMatcher.calculate_style_compatibility(item1.style, item2.style)
+
+
+def test_suitability_masks_follow_enum_lists():
+    item = make_item(
+        "1", "top", "#FFFFFF", "casual", 5,
+        occasion_suitability=[OccasionType.DATE, OccasionType.CASUAL],
+        season_suitability=[SeasonType.WINTER],
+        weather_suitability=[WeatherType.SNOWY, WeatherType.WINDY],
+    )
+    context = OutfitMatcher._context_bits
+
+    assert item.is_suitable(*context(OccasionType.DATE, SeasonType.WINTER, WeatherType.WINDY))
+    assert not item.is_suitable(*context(OccasionType.FORMAL, SeasonType.WINTER, WeatherType.WINDY))
+    assert not item.is_suitable(*context(OccasionType.DATE, SeasonType.SUMMER, WeatherType.WINDY))
+    assert not item.is_suitable(*context(OccasionType.DATE, SeasonType.WINTER, WeatherType.SUNNY))
+    assert not item.is_suitable(*context("date", SeasonType.WINTER, WeatherType.WINDY))
+
+
+def test_top_bounds_cover_best_outfit_and_ties_keep_first_top(wardrobe):
+    matcher = OutfitMatcher()
+    # Identical tops score identically; the earlier one must win
+    tops = [wardrobe[1], make_item("10", "top", "#FFFFFF", "classic", 8), wardrobe[0]]
+    items = tops + wardrobe[2:8]
+
+    compatibility = WardrobeSoA.from_items(items).pairwise_matrix()
+    slots = [[3, 4], [5, 6], [7], [8]]
+    bounds = matcher._top_score_bounds(compatibility, [0, 1, 2], [np.array(slot) for slot in slots])
+    for top, bound in enumerate(bounds):
+        scores, _ = matcher._score_outfits_for_top(compatibility, top, *(np.array(slot) for slot in slots))
+        assert scores.max() <= bound + 1e-9
+
+    outfit = matcher.create_complete_outfit(items, OccasionType.BUSINESS, SeasonType.FALL, WeatherType.WINDY)
+    assert outfit.items[0].id == "10"
+
+
+def test_parallel_outfit_search_matches_sequential(monkeypatch):
+    rng = np.random.default_rng(7)
+    categories = ["top", "bottom", "shoes", "outerwear", "accessory"]
+    styles = ["casual", "formal", "business", "sporty", "classic", "modern"]
+    wardrobe = [
+        make_item(str(i), categories[i % 5] if i < 60 else "top", "#%06x" % rng.integers(1 << 24),
+                  styles[rng.integers(len(styles))], int(rng.integers(1, 11)))
+        for i in range(80)
+    ]
+    matcher = OutfitMatcher()
+    context = (OccasionType.CASUAL, SeasonType.WINTER, WeatherType.SNOWY)
+
+    monkeypatch.setattr(outfit_matcher, "_PARALLEL_MIN_TOPS", 1000)
+    sequential = matcher.create_complete_outfit(wardrobe, *context)
+    monkeypatch.setattr(outfit_matcher, "_PARALLEL_MIN_TOPS", 8)
+    monkeypatch.setattr(outfit_matcher, "_OUTFIT_SEARCH_WORKERS", 3)
+    parallel = matcher.create_complete_outfit(wardrobe, *context)
+
+    assert [item.id for item in parallel.items] == [item.id for item in sequential.items]
+    assert parallel.confidence_score == sequential.confidence_score
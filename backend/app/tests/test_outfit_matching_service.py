@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from ..services.outfit_matching_service import (
+    OutfitMatchingService,
+    _colors_to_feature_matrix,
+    check_color_harmony,
+    get_color_harmony_type,
+)
+
+
+@pytest.mark.parametrize("colors, expected", [
+    (["#FF0000"], "monochromatic"),
+    (["#000000", "#FFFFFF", "#808080"], "neutral"),
+    (["#FF0000", "#FF4000"], "analogous"),
+    (["#FF0000", "#00FFFF"], "complementary"),
+    (["#FF0000", "#00FF00"], "triadic"),
+    (["#FF0000", "#FFFF00", "#FF8000"], "related"),
+    (["#FF0000", "#00FFFF", "#FFFF00", "#0000FF"], "complementary"),
+])
+def test_harmony_type_from_pairwise_hue_differences(colors, expected):
+    assert get_color_harmony_type(colors) == expected
+
+
+def test_feature_matrix_and_harmony_score():
+    assert _colors_to_feature_matrix(["#FF0000", "oops"]).tolist() == [[0, 1, 1], [0, 0, 128 / 255]]
+    assert _colors_to_feature_matrix([]).shape == (0, 3)
+    # neutral pair with very high contrast and balanced saturation: 0.95 * 0.8 * 1.1
+    assert check_color_harmony(["#000000", "#FFFFFF"]) == pytest.approx(0.836)
+    assert check_color_harmony(["#000000", "#000000"]) == 1.0
+
+
+def test_batch_style_cohesion_matches_pairwise_scores():
+    rng = np.random.default_rng(0)
+    matcher = OutfitMatchingService()
+    outfits = [[rng.standard_normal(6).astype(np.float32) for _ in range(size)] for size in (2, 4, 3)]
+    outfits += [[np.zeros(6, dtype=np.float32), np.ones(6, dtype=np.float32)], [np.ones(6)], [np.ones(6), np.ones(3)], []]
+
+    cohesion = matcher.batch_style_cohesion(outfits)
+
+    for embeddings, batched in zip(outfits[:5], cohesion):
+        items = [{"embedding": embedding, "colors": []} for embedding in embeddings] + [{"colors": []}]
+        assert batched == pytest.approx(matcher.calculate_compatibility_score(items)["style_cohesion_score"], abs=5e-4)
+    assert np.isnan(cohesion[5:]).all()
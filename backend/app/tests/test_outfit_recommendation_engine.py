@@ -0,0 +1,165 @@
+import numpy as np
+import pytest
+
+from ..services.outfit_recommendation_engine import OutfitRecommendationEngine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return OutfitRecommendationEngine(model_cache_dir=str(tmp_path))
+
+
+def make_item(item_id, category, color, style, description="", **overrides):
+    item = {
+        "id": item_id, "name": f"Item {item_id}", "category": category, "style": style, "description": description,
+        "dominant_color": {"name": color, "rgb": [0, 0, 0]}, "brand": "acme", "price": 40,
+    }
+    item.update(overrides)
+    return item
+
+
+def test_top_k_indices_keep_input_order_for_ties():
+    scores = np.array([0.5, 0.9, 0.5, 0.1, 0.9, 0.5])
+
+    assert OutfitRecommendationEngine._top_k_indices(scores, 3).tolist() == [1, 4, 0]
+    assert OutfitRecommendationEngine._top_k_indices(scores, 10).tolist() == [1, 4, 0, 2, 5, 3]
+    assert OutfitRecommendationEngine._top_k_indices(scores, 0).tolist() == []
+
+
+def test_similar_items_rank_by_cosine_and_reuse_cached_features(engine):
+    items = [
+        make_item(1, "tops", "navy", "formal elegant"),
+        make_item(2, "shoes", "red", "sport gym"),
+        make_item(3, "tops", "navy", "formal dressy"),
+    ]
+    target = make_item(0, "tops", "navy", "formal elegant")
+
+    similar = engine.get_similar_items(target, items, num_similar=2)
+
+    assert [item["id"] for item in similar] == [1, 3]
+    assert similar[0]["similarity_score"] == pytest.approx(1.0)
+    assert len(engine._feature_cache) == 1
+
+    engine.prepare_item_features = None  # cached candidates must not be re-featurized
+    assert engine._get_normalized_features(items) is next(iter(engine._feature_cache.values()))
+
+
+def test_similar_items_follow_item_edits(engine):
+    items = [make_item(1, "tops", "navy", "formal elegant"), make_item(2, "tops", "red", "formal elegant")]
+    target = make_item(0, "tops", "navy", "formal elegant")
+    assert [item["id"] for item in engine.get_similar_items(target, items, num_similar=1)] == [1]
+
+    # The router rebuilds item dicts from the DB, so an edit arrives as a new dict with the same ids
+    edited = [make_item(1, "shoes", "red", "sport gym", brand="other"), make_item(2, "tops", "navy", "formal elegant")]
+    similar = engine.get_similar_items(target, edited, num_similar=2)
+
+    assert [item["id"] for item in similar] == [2, 1]
+    assert similar[0]["similarity_score"] == pytest.approx(1.0)
+    assert len(engine._feature_cache) == 2
+
+
+def test_trained_index_finds_nearest_items(engine):
+    items = [
+        make_item(1, "shirts", "navy", "formal elegant"),
+        make_item(2, "shoes", "red", "sport gym"),
+        make_item(3, "pants", "khaki", "casual relaxed"),
+        make_item(4, "shirts", "white", "business office"),
+        make_item(5, "dresses", "black", "party evening"),
+    ]
+    assert engine.find_similar_trained_items(items[0]) == []
+
+    assert engine.train_recommendation_model(items)
+    assert engine._feature_cache_key(items) in engine._feature_cache
+    neighbours = engine.find_similar_trained_items(make_item(9, "shirts", "navy", "formal elegant"), num_similar=2)
+
+    assert neighbours[0][0] == 1
+    assert neighbours[0][1] == pytest.approx(1.0)
+    assert neighbours[0][1] >= neighbours[1][1]
+
+
+def test_seasonal_features_follow_color_and_material(engine):
+    items = [
+        make_item(1, "shirts", "Navy", "", description="light linen shirt"),
+        make_item(2, "shirts", "coral", "", material="Wool blend"),
+        make_item(3, "shirts", "teal", "", dominant_color=None),
+    ]
+
+    seasonal = engine.prepare_item_features(items)[:, 21:25]
+
+    # spring, summer, fall, winter
+    assert seasonal.tolist() == [[0, 0.5, 0, 1], [1, 1, 0, 0.5], [0, 0, 0, 0]]
+
+
+@pytest.mark.parametrize("occasion", ["casual", "unknown"])
+def test_vectorized_scoring_matches_per_outfit_scoring(engine, occasion):
+    rng = np.random.default_rng(3)
+    colors = ["black", "white", "navy", "red", "teal"]
+    words = ["casual", "formal", "cotton", "slim", "classic"]
+    items = [
+        make_item(i, category, str(rng.choice(colors)), " ".join(rng.choice(words, rng.integers(0, 4))))
+        for i, category in enumerate(["shirts", "outerwear", "pants", "skirts", "pants"])
+    ]
+    items[1]["dominant_color"] = None
+    candidates, combinations = engine._generate_outfit_combinations(items, {}, occasion)
+
+    scores, color_scores, style_scores, occasion_scores = engine._score_outfit_combinations(
+        candidates, combinations, {}, occasion
+    )
+
+    assert combinations.shape == (6, 3) and (combinations[:, 2] == -1).all()
+    item_occasion_score = 1.0 if occasion in engine.occasion_styles else 0.5
+    for o, row in enumerate(combinations):
+        outfit = [candidates[i] for i in row if i >= 0]
+        named = [item["dominant_color"]["name"] for item in outfit if item.get("dominant_color")]
+        pairs = [(a, b) for index, a in enumerate(named) for b in named[index + 1:]]
+        color = np.mean([engine._calculate_color_compatibility(a, b) for a, b in pairs]) if pairs else 0.5
+        outfit_words = " ".join(f"{item['style']} {item['description']}" for item in outfit).lower().split()
+        style = min(max(map(outfit_words.count, outfit_words)) / len(outfit_words) * 2, 1.0) if outfit_words else 0.5
+
+        assert color_scores[o] == pytest.approx(color)
+        assert style_scores[o] == pytest.approx(style)
+        assert occasion_scores[o] == pytest.approx(item_occasion_score)
+        assert scores[o] == pytest.approx(color * 0.4 + style * 0.3 + item_occasion_score * 0.3)
+
+
+def test_brand_feature_is_stable_across_processes(engine):
+    features = engine.prepare_item_features([{"brand": "Nike"}, {"brand": "nike"}, {}])
+
+    # MurmurHash3 of the lowercased brand, unlike the per-process salted hash()
+    assert features[:, 11].tolist() == pytest.approx([0.24, 0.24, 0.31])
+
+
+def test_saved_models_load_memory_mapped(engine, tmp_path):
+    items = [
+        make_item(1, "shirts", "navy", "formal elegant"),
+        make_item(2, "shoes", "red", "sport gym"),
+        make_item(3, "pants", "khaki", "casual relaxed"),
+        make_item(4, "shirts", "white", "business office"),
+        make_item(5, "dresses", "black", "party evening"),
+    ]
+    assert engine.train_recommendation_model(items)
+    target = make_item(9, "shirts", "navy", "formal elegant")
+
+    loaded = OutfitRecommendationEngine(model_cache_dir=str(tmp_path))
+    assert loaded._load_models()
+
+    assert isinstance(loaded._items_normed, np.memmap)
+    assert not loaded._items_normed.flags.writeable
+    assert loaded.find_similar_trained_items(target) == engine.find_similar_trained_items(target)
+
+
+def test_color_coordinated_items_match_pairwise_rules(engine):
+    colors = ["navy", "white", "red", "green", "mauve", "black", "Navy"]
+    items = [make_item(i, "tops", color, "") for i, color in enumerate(colors)] + [{"id": 99}]
+    base = make_item(0, "pants", "navy", "")
+
+    coordinated = engine.get_color_coordinated_items(base, items)
+
+    expected = sorted(
+        ((item["id"], engine._calculate_color_compatibility("navy", item["dominant_color"]["name"].lower()))
+         for item in items[:-1]),
+        key=lambda pair: -pair[1],
+    )
+    assert [(item["id"], item["color_compatibility_score"]) for item in coordinated] == \
+        [pair for pair in expected if pair[1] > 0.5]
+    assert engine.get_color_coordinated_items(base, []) == []
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from .. import model as models
+from ..services import recommendation_services
+from ..services.recommendation_services import BatchedEncoder, _pack_item_features, _stub_embedding
+
+
+class LengthModel:
+    """Embeds a text as [len(text)] and records every encode call"""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size, convert_to_numpy):
+        self.calls.append(list(texts))
+        if "boom" in texts:
+            raise ValueError("boom")
+        return np.array([[len(text)] for text in texts], dtype=np.float32)
+
+
+def test_batched_encoder_coalesces_concurrent_texts():
+    model = LengthModel()
+    encoder = BatchedEncoder(model, max_batch=4, max_wait_ms=200)
+    texts = ["a wedding", "gym", "office meeting", "date"]
+
+    with ThreadPoolExecutor(len(texts)) as pool:
+        embeddings = list(pool.map(encoder, texts))
+
+    assert [embedding.tolist() for embedding in embeddings] == [[9], [3], [14], [4]]
+    assert model.calls == [sorted(texts, key=len)]
+
+
+def test_batched_encoder_propagates_model_errors():
+    encoder = BatchedEncoder(LengthModel(), max_wait_ms=0)
+
+    with pytest.raises(ValueError):
+        encoder("boom")
+    assert encoder("ok").tolist() == [2]
+
+
+def test_packed_item_features_are_cached_until_the_item_changes():
+    item = models.WardrobeItem(
+        id=101, name="Shirt", category="Tops", ai_embedding=[0.5, 1.0], dominant_color_name="Navy",
+        dominant_color_hex="#000080", style_features={"identified_styles": ["Formal", "classic"]},
+        updated_at=datetime(2024, 1, 1),
+    )
+
+    packed = _pack_item_features(item)
+
+    assert packed.embedding.tolist() == [0.5, 1.0]
+    assert (packed.colors, packed.styles) == ({"navy"}, {"formal", "classic"})
+    assert (packed.hex, packed.category) == ("#000080", "Tops")
+    assert _pack_item_features(item) is packed
+
+    item.color_palette, item.updated_at = [{"hex": "#FFFFFF"}], datetime(2024, 1, 2)
+    assert _pack_item_features(item).hex == "#FFFFFF"
+
+
+def test_stub_embedding_is_deterministic_unit_vector():
+    stub = _stub_embedding(7, 384)
+
+    assert stub.dtype == np.float32 and stub.shape == (384,)
+    assert np.linalg.norm(stub) == pytest.approx(1.0, abs=1e-6)
+    assert _stub_embedding(7, 384) is stub
+    assert not np.array_equal(_stub_embedding(8, 384), stub)
+    assert _pack_item_features(models.WardrobeItem(id=7, name="Tee")).embedding is stub
+
+
+@pytest.fixture
+def db(tmp_path):
+    # A file database, so sessions opened on worker threads see the same rows
+    engine = create_engine(f"sqlite:///{tmp_path / 'recommendations.db'}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(models.User(id=1, username="ada", email="ada@example.com", hashed_password="x"))
+        session.add(models.WardrobeItem(id=10, user_id=1, name="Shirt", category="Tops", ai_embedding=[1.0, 0.0]))
+        outfit = models.Outfit(id=20, user_id=1, name="Office")
+        outfit.items.append(session.get(models.WardrobeItem, 10))
+        session.add(outfit)
+        session.add(models.Feedback(id=30, outfit_id=20, user_id=1, rating=5))
+        session.commit()
+        yield session
+    engine.dispose()
+
+
+def _record_statement_threads(engine):
+    threads = []
+    event.listen(engine, "before_cursor_execute", lambda *args: threads.append(threading.get_ident()))
+    return threads
+
+
+def test_occasion_recommendations_keep_the_request_session_off_worker_threads(db, monkeypatch):
+    seen_sessions = []
+
+    def fake_match(worker_db, user_id, **kwargs):
+        seen_sessions.append(worker_db)
+        return worker_db.query(models.Outfit).filter(models.Outfit.user_id == user_id)\
+            .options(recommendation_services.selectinload(models.Outfit.items),
+                     recommendation_services.selectinload(models.Outfit.feedbacks))\
+            .all()
+
+    monkeypatch.setattr(recommendation_services, "find_ai_matched_outfits_for_occasion", fake_match)
+    threads = _record_statement_threads(db.get_bind())
+
+    recommendations = asyncio.run(recommendation_services.recommend_outfits_for_occasion_service(
+        db, SimpleNamespace(id=1), SimpleNamespace(name="work", notes=None)
+    ))
+
+    assert seen_sessions and seen_sessions[0] is not db
+    assert threading.get_ident() not in threads
+    assert [outfit.item_ids for outfit in recommendations] == [[10]]
+    assert [feedback.rating for feedback in recommendations[0].feedbacks] == [5]
+
+
+def test_wardrobe_recommendations_query_items_on_a_worker_session(db):
+    threads = _record_statement_threads(db.get_bind())
+
+    suggestions = asyncio.run(recommendation_services.get_wardrobe_recommendations_service(db, SimpleNamespace(id=1)))
+
+    assert threads and threading.get_ident() not in threads
+    # The user owns Tops, so it is not suggested as a missing essential
+    assert not any("'Tops'" in suggestion for suggestion in suggestions.itemsToAcquire)
+    assert any("'Shoes'" in suggestion for suggestion in suggestions.itemsToAcquire)
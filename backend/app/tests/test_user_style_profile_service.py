@@ -0,0 +1,206 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from .. import model as models
+from ..services.user_style_profile_service import (
+    _bulk_update_profile_lists,
+    _dedupe_recent_list,
+    _insert_ignoring_conflict,
+    _update_json_counter_field,
+    _update_json_dict_field,
+    _update_json_list_field,
+    get_or_create_user_style_profile,
+    sync_user_profile_to_style_profile,
+    update_style_profile_from_item_interaction,
+    update_style_profile_from_outfit_history,
+)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def test_list_field_round_trips_through_json_text():
+    updated = _update_json_list_field('["navy", "black"]', ["red", "", "navy"])
+
+    assert isinstance(updated, str)
+    assert json.loads(updated) == ["black", "red", "navy"]
+    assert json.loads(_update_json_list_field("not json", ["red"])) == ["red"]
+    assert json.loads(_update_json_list_field(updated, ["navy"], add=False)) == ["black", "red"]
+
+
+def test_list_field_returns_the_same_text_when_nothing_changes():
+    current = '["navy", "black"]'
+
+    assert _update_json_list_field(current, [None, ""]) is current
+    assert _update_json_list_field(current, ["Black"], normalize=True) is current
+    assert _update_json_list_field(current, ["red"], add=False) is current
+    assert _update_json_list_field(None, []) == "[]"
+
+
+def test_list_field_moves_repeats_to_the_recent_end_and_trims_oldest():
+    updated = _update_json_list_field('["a", "b", "c"]', ["b", "d", "a", "b"], max_items=3)
+
+    assert json.loads(updated) == ["d", "a", "b"]
+
+
+def test_counter_field_counts_preferences_and_evicts_the_least_frequent():
+    updated = _update_json_counter_field('["navy", "black"]', ["Navy", "red", "", "navy"], max_items=3, normalize=True)
+    assert json.loads(updated) == {"black": 1, "red": 1, "navy": 3}
+
+    # Past max_items the lowest count goes first, the least recent among equal counts
+    updated = _update_json_counter_field(updated, ["teal"], max_items=3)
+    assert json.loads(updated) == {"red": 1, "navy": 3, "teal": 1}
+
+    updated = _update_json_counter_field(updated, ["navy", "red", "olive"], add=False)
+    assert json.loads(updated) == {"navy": 2, "teal": 1}
+    assert _update_json_counter_field(updated, ["olive"], add=False) is updated
+    assert _update_json_counter_field(None, [None]) == "{}"
+
+
+def test_counter_field_keeps_new_items_when_older_counts_are_higher():
+    updated = _update_json_counter_field('{"navy": 4, "black": 2, "red": 3}', ["teal"], max_items=3)
+    assert json.loads(updated) == {"navy": 4, "red": 3, "teal": 1}
+
+    # The next new item displaces the lowest count that this update did not bump
+    updated = _update_json_counter_field(updated, ["olive", "red"], max_items=3)
+    assert json.loads(updated) == {"navy": 4, "olive": 1, "red": 4}
+
+
+def test_dict_field_updates_sub_lists_and_merges():
+    updated = _update_json_dict_field('{"formal": ["navy"]}', {}, sub_key_to_update="formal", items_to_add=["black"])
+    assert json.loads(updated) == {"formal": ["navy", "black"]}
+
+    merged = _update_json_dict_field(updated, {"formal": ["white"], "season": "fall"})
+    assert json.loads(merged) == {"formal": ["navy", "black", "white"], "season": "fall"}
+    assert json.loads(_update_json_dict_field('{"formal": "navy"}', {}, "formal", ["black"])) == {"formal": ["black"]}
+
+
+def test_dedupe_recent_list_works_on_python_lists():
+    current = ["a", "b"]
+
+    assert _dedupe_recent_list(current, ["B", "c"], max_items=2, normalize=True) == ["b", "c"]
+    assert _dedupe_recent_list(current, ["b", None]) is current
+    assert _dedupe_recent_list(current, ["a"], add=False) == ["b"]
+
+
+def test_bulk_update_only_assigns_columns_with_items():
+    untouched = '["tweed"]'
+    profile = SimpleNamespace(
+        preferred_colors='["navy"]', preferred_categories=None, preferred_brands='["acme"]', style_keywords=untouched,
+    )
+
+    _bulk_update_profile_lists(profile, colors=["Red"], categories=["tops"], brands=["acme"], keywords=[])
+    assert json.loads(profile.preferred_colors) == {"navy": 1, "red": 1}
+    assert json.loads(profile.preferred_categories) == {"tops": 1}
+    assert json.loads(profile.preferred_brands) == {"acme": 2}
+    assert profile.style_keywords is untouched
+
+    colors = profile.preferred_colors
+    _bulk_update_profile_lists(profile, colors=[None], keywords=[None, ""])
+    assert profile.preferred_colors is colors
+
+    _bulk_update_profile_lists(profile, brands=["ACME"], keywords=["denim"], add=False)
+    assert json.loads(profile.preferred_brands) == {"acme": 1}
+    assert profile.style_keywords is untouched
+
+
+def test_get_or_create_inserts_once_and_tolerates_existing_rows(db):
+    created = get_or_create_user_style_profile(db, 7)
+    assert json.loads(created.preferred_colors) == {}
+    assert created.last_updated is not None
+
+    # A row created concurrently makes the insert a no-op rather than an IntegrityError
+    db.execute(_insert_ignoring_conflict(db, models.UserStyleProfile, "user_id", user_id=7))
+    assert get_or_create_user_style_profile(db, 7).id == created.id
+    assert db.query(models.UserStyleProfile).count() == 1
+
+
+def test_mysql_insert_tolerates_only_duplicate_keys():
+    from sqlalchemy.dialects import mysql
+
+    mysql_db = SimpleNamespace(get_bind=lambda: SimpleNamespace(dialect=mysql.dialect()))
+    statement = _insert_ignoring_conflict(mysql_db, models.UserStyleProfile, "user_id", user_id=7)
+    sql = str(statement.compile(dialect=mysql.dialect()))
+
+    assert "IGNORE" not in sql
+    assert "ON DUPLICATE KEY UPDATE user_id = %s" in sql
+
+
+def test_outfit_history_reads_item_columns_in_one_query(db):
+    items = [
+        models.WardrobeItem(user_id=1, name=f"item {i}", category=category, brand="Acme", dominant_color_name=color,
+                            style_features={"identified_styles": ["Smart"], "raw_keywords": [f"kw{i}"]})
+        for i, (category, color) in enumerate([("Tops", "Navy"), ("Pants", "Black"), ("Shoes", "Navy")])
+    ]
+    db.add(models.Outfit(id=3, user_id=1, name="office", items=items))
+    db.add(models.Outfit(id=4, user_id=1, name="empty"))
+    db.commit()
+    db.expunge_all()
+
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    profile = update_style_profile_from_outfit_history(db, 1, 3, SimpleNamespace(notes=None))
+
+    # outfit items, the profile lookup, its creation and re-read
+    assert len(statements) == 4
+    assert json.loads(profile.preferred_colors) == {"black": 1, "navy": 2}
+    assert list(json.loads(profile.preferred_categories)) == ["tops", "pants", "shoes"]
+    assert json.loads(profile.style_keywords) == {"kw0": 1, "kw1": 1, "smart": 3, "kw2": 1}
+    assert update_style_profile_from_outfit_history(db, 2, 3, SimpleNamespace(notes=None)) is None
+    assert update_style_profile_from_outfit_history(db, 1, 4, SimpleNamespace(notes=None)) is profile
+
+
+def test_profile_updates_stamp_last_updated_in_sql(db):
+    profile = get_or_create_user_style_profile(db, 5)
+    db.commit()
+
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    _bulk_update_profile_lists(profile, colors=["navy"])
+    db.commit()
+
+    updates = [statement for statement in statements if statement.startswith("UPDATE")]
+    assert len(updates) == 1
+    assert "last_updated=CURRENT_TIMESTAMP" in updates[0]
+    assert profile.last_updated is not None
+
+
+def test_item_interactions_count_item_preferences(db):
+    db.add(models.WardrobeItem(id=8, user_id=1, name="blazer", category="Outerwear", brand=None, dominant_color_name="Navy",
+                               style_features={"identified_styles": ["Smart"], "raw_keywords": "not a list"}))
+    db.commit()
+
+    update_style_profile_from_item_interaction(db, 1, 8, "favorite")
+    profile = update_style_profile_from_item_interaction(db, 1, 8, "favorite")
+    assert json.loads(profile.preferred_colors) == {"navy": 2}
+    assert json.loads(profile.style_keywords) == {"smart": 2}
+    assert json.loads(profile.preferred_brands) == {}
+
+    update_style_profile_from_item_interaction(db, 1, 8, "unfavorite")
+    assert json.loads(profile.preferred_categories) == {"outerwear": 1}
+    assert update_style_profile_from_item_interaction(db, 2, 8, "favorite") is None
+
+
+def test_sync_merges_profile_colors_into_learned_counts(db):
+    db.add(models.UserProfile(user_id=1, preferred_colors=["navy", "teal", "navy"], preferred_styles=["Classic"]))
+    style_profile = get_or_create_user_style_profile(db, 1)
+    style_profile.preferred_colors = json.dumps({"navy": 3, "black": 2})
+
+    sync_user_profile_to_style_profile(db, 1)
+    assert json.loads(style_profile.preferred_colors) == {"navy": 3, "black": 2, "teal": 1}
+    assert json.loads(style_profile.style_keywords) == {"classic": 1}
+
+    # Syncing again leaves the color counts alone
+    synced_colors = style_profile.preferred_colors
+    sync_user_profile_to_style_profile(db, 1)
+    assert style_profile.preferred_colors is synced_colors
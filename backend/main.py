@@ -4,8 +4,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 import os
+import asyncio
 import logging
-import tensorflow as tf
+
+# Disable oneDNN optimizations if desired; set before any app module pulls in TensorFlow
+os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0"
+
 from app.db import database
 from app.db.database import Base
 from app import models
@@ -27,9 +31,6 @@ from app.routers import (
     occasion_recommendations,  # Added occasion recommendations router
 )
 
-# Disable oneDNN optimizations if desired
-os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0"
-
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
@@ -50,38 +51,48 @@ async def lifespan(app: FastAPI):
         model_manager = get_model_manager()
         logging.info("Preloading AI models...")
         
-        # Preload models in background
-        for model_name in ["mobilenet_v2", "efficientdet_lite0"]:
-            try:
-                model = model_manager.get_model(model_name)
-                if model is not None:
-                    logging.info(f"Model {model_name} preloaded successfully")
-                else:
-                    logging.warning(f"Failed to preload model {model_name}")
-            except Exception as e:
-                logging.error(f"Error preloading model {model_name}: {e}")
+        # Loads run concurrently on the manager's loader threads; waiting on them keeps the event loop free
+        model_manager.preload()
+        model_names = ["mobilenet_v2", "efficientdet_lite0"]
+        results = await asyncio.gather(
+            *(asyncio.to_thread(model_manager.get_model, model_name) for model_name in model_names),
+            return_exceptions=True,
+        )
+        for model_name, result in zip(model_names, results):
+            if isinstance(result, Exception):
+                logging.error(f"Error preloading model {model_name}: {result}")
+            elif result is not None:
+                logging.info(f"Model {model_name} preloaded successfully")
+            else:
+                logging.warning(f"Failed to preload model {model_name}")
         
         logging.info("AI models preloading completed")
     except Exception as e:
         logging.error(f"Error during model preloading: {e}")
     
     yield
+    
+    # Release the color analysis and model loader worker threads on shutdown
+    from app.services.color_detector import shutdown_color_executor
+    shutdown_color_executor()
+    try:
+        from app.services.model_manager import get_model_manager
+        get_model_manager().shutdown()
+    except Exception as e:
+        logging.error(f"Error shutting down model loader: {e}")
 
 app = FastAPI(lifespan=lifespan)
 
 # CORS configuration
 origins = [
-    "http://localhost:3000",
-    "http://localhost:5713",
-    "http://127.0.0.1:3000",
-    "http://127.0.0.1:5713",
     "https://digital-wardrobe-system.vercel.app",
-    "*",  # Allow all origins for development
 ]
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
+    # Local dev servers on any port; compiled once at startup. A "*" origin can't be combined with credentials.
+    allow_origin_regex=r"https?://(localhost|127\.0\.0\.1)(:\d+)?",
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -11,7 +11,19 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.db.database import engine, Base
 from app.model import WardrobeItem, OutfitRecommendation, UserStyleProfile
-from sqlalchemy import text
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+def _index_names(conn, table_name):
+    """Names of the indexes on a table, read from the dialect's catalog"""
+    return {index["name"] for index in inspect(conn).get_indexes(table_name)}
+
+def _has_unique_key(conn, table_name, column_names):
+    """Whether a unique index or unique constraint covers exactly these columns, whatever its name"""
+    inspector = inspect(conn)
+    unique_keys = [index["column_names"] for index in inspector.get_indexes(table_name) if index.get("unique")]
+    unique_keys += [constraint["column_names"] for constraint in inspector.get_unique_constraints(table_name)]
+    return any(list(key) == list(column_names) for key in unique_keys)
 
 def run_migration():
     """Run the database migration for ML features."""
@@ -22,38 +34,74 @@ def run_migration():
         Base.metadata.create_all(bind=engine)
         print("✓ Database tables created/updated successfully")
         
-        # Add new columns to existing WardrobeItem table if they don't exist
-        with engine.connect() as conn:
-            try:
-                # Check if columns exist and add them if they don't
-                result = conn.execute(text("PRAGMA table_info(wardrobe_items)"))
-                existing_columns = [row[1] for row in result.fetchall()]
-                
-                new_columns = [
-                    ("dominant_color_rgb", "TEXT"),
-                    ("dominant_color_hex", "VARCHAR(7)"),
-                    ("dominant_color_name", "VARCHAR(50)"),
-                    ("ai_classification", "TEXT"),
-                    ("color_properties", "TEXT"),
-                    ("style_features", "TEXT")
-                ]
-                
+        # JSON documents are JSONB on Postgres, matching the model's JSONDocument type
+        is_postgres = engine.dialect.name == "postgresql"
+        json_type = "JSONB" if is_postgres else "TEXT"
+
+        new_columns = [
+            ("dominant_color_rgb", json_type),
+            ("dominant_color_hex", "VARCHAR(7)"),
+            ("dominant_color_name", "VARCHAR(50)"),
+            ("ai_classification", json_type),
+            ("color_properties", json_type),
+            ("style_features", json_type)
+        ]
+
+        # Postgres and SQLite run all of this DDL in one transaction that commits or rolls back as a whole.
+        # MySQL commits each ALTER/CREATE INDEX implicitly, so a failed run can leave earlier steps applied;
+        # every step checks what already exists, so rerunning the script finishes a partial migration.
+        with engine.begin() as conn:
+            if is_postgres:
+                # ADD COLUMN IF NOT EXISTS is idempotent, so no existence pre-query is needed
+                additions = ", ".join(
+                    f"ADD COLUMN IF NOT EXISTS {column_name} {column_type}" for column_name, column_type in new_columns
+                )
+                conn.execute(text(f"ALTER TABLE wardrobe_items {additions}"))
+                print("✓ ML columns are in place on wardrobe_items")
+
+                # Tables created before the switch to JSONB still have JSON columns; json -> jsonb always casts cleanly.
+                # Only columns that hold dicts/lists are converted, and only when they are not JSONB yet (the ALTER rewrites the table)
+                jsonb_columns = ["dominant_color_rgb", "ai_classification", "color_properties", "style_features"]
+                column_types = {column["name"]: column["type"] for column in inspect(conn).get_columns("wardrobe_items")}
+                pending = [name for name in jsonb_columns if not isinstance(column_types.get(name), JSONB)]
+                if pending:
+                    alterations = ", ".join(f"ALTER COLUMN {name} TYPE JSONB USING {name}::jsonb" for name in pending)
+                    conn.execute(text(f"ALTER TABLE wardrobe_items {alterations}"))
+                print("✓ ML JSON columns of wardrobe_items are JSONB")
+            else:
+                # The inspector reads the dialect's own catalog (PRAGMA on SQLite, information_schema elsewhere)
+                existing_columns = {column["name"] for column in inspect(conn).get_columns("wardrobe_items")}
                 for column_name, column_type in new_columns:
                     if column_name not in existing_columns:
                         conn.execute(text(f"ALTER TABLE wardrobe_items ADD COLUMN {column_name} {column_type}"))
                         print(f"✓ Added column {column_name} to wardrobe_items")
                     else:
                         print(f"- Column {column_name} already exists in wardrobe_items")
-                
-                conn.commit()
-                
-            except Exception as e:
-                print(f"Note: Column addition failed (this is normal if columns already exist): {e}")
+
+            # create_all only creates indexes for new tables; add them to existing ones.
+            # MySQL has no CREATE INDEX IF NOT EXISTS, so the catalog is checked first.
+            if "ix_wardrobeitem_user_cat_season" not in _index_names(conn, "wardrobe_items"):
+                conn.execute(text(
+                    "CREATE INDEX ix_wardrobeitem_user_cat_season ON wardrobe_items (user_id, category, season)"
+                ))
+                print("✓ Created index ix_wardrobeitem_user_cat_season")
+            else:
+                print("- Index ix_wardrobeitem_user_cat_season already exists")
+
+            # Same name create_all gives UserStyleProfile.user_id (unique=True, index=True). Profile creation's
+            # ON CONFLICT (user_id) needs it, and profile tables from before it was declared may lack it.
+            # A table created by create_all on MySQL may already enforce it under another name.
+            if not _has_unique_key(conn, "user_style_profiles", ["user_id"]):
+                conn.execute(text("CREATE UNIQUE INDEX ix_user_style_profiles_user_id ON user_style_profiles (user_id)"))
+                print("✓ Created unique index ix_user_style_profiles_user_id")
+            else:
+                print("- user_style_profiles.user_id is already unique")
         
         print("✓ ML features migration completed successfully!")
         
     except Exception as e:
         print(f"✗ Migration failed: {e}")
+        print("  Steps that completed before the error may be committed (MySQL); rerun the migration once it is fixed.")
         return False
     
     return True